@@ -1,14 +1,37 @@
 """Computes election results using single transferable vote."""
 
+import concurrent.futures
 import copy
+import hashlib
+import io
+import math
+import multiprocessing
 import random
 import string
+import time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 __author__ = "Devin Gund"
 __copyright__ = "Copyright 2017, Carnegie Mellon University Undergraduate Student Senate"
 __credits__ = ["Sushain Cherivirala"]
 __license__ = "GPLv3"
 __status__ = "Production"
+__version__ = "1.1.0"
+
+# Default maximum number of recounts when searching for a margin witness
+DEFAULT_MARGIN_RECOUNTS = 100
+
+# Number of pairs of ranked Candidates counted at a time by NumPy in a
+# pairwise comparison
+PAIRWISE_CHUNK_PAIRS = 1 << 22
+
+# Relative difference within which votes are considered to meet a threshold,
+# covering the rounding of tallies and thresholds summed in different orders
+THRESHOLD_TOLERANCE = 1e-9
 
 
 class Candidate:
@@ -95,12 +118,14 @@ class Ballot:
     """Ballot consisting of ranked candidates and a vote value
 
     The vote value of the ballot is awarded to the most preferred candidate that
-    has not been eliminated.
+    has not been eliminated. Counting an election does not modify its Ballots;
+    the preferred active rank of each Ballot is tracked by the count instead.
 
     Attributes:
         candidates: List of Candidates ordered by preferred rank.
         vote_value: Value of the Ballot's vote. Defaults to 1.0.
-        _preferred_active_rank: Integer rank of the preferred active candidate.
+        _preferred_active_rank: Integer rank of the preferred active candidate,
+            from which counting starts.
     """
 
     def __init__(self, candidates=None, starting_rank=0, vote_value=1.0):
@@ -196,6 +221,39 @@ class Ballot:
         self._preferred_active_rank = 0
 
 
+class _BallotBucket:
+    """Ballots counted for the same Candidate with the same vote value.
+
+    A surplus transfer updates the shared vote value of the bucket once rather
+    than the vote value of every Ballot in it. The rank of each Ballot's
+    preferred active Candidate is kept in the bucket rather than on the Ballot,
+    so that counting never modifies the Ballots.
+
+    Attributes:
+        ballots: List of Ballots in the bucket.
+        ranks: List of the integer ranks of the preferred active Candidates of
+            the Ballots, in the same order as the Ballots.
+        candidate: Candidate the Ballots are counted for, or None if they have
+            not yet been assigned to a Candidate.
+        vote_value: Float value of the vote of each Ballot in the bucket.
+    """
+
+    def __init__(self, candidate, vote_value, ballots=None, ranks=None):
+        """Initializes _BallotBucket with a Candidate, vote value, and Ballots.
+
+        Args:
+            candidate: Candidate the Ballots are counted for, or None.
+            vote_value: Float value of the vote of each Ballot in the bucket.
+            ballots: List of Ballots in the bucket. Defaults to an empty list.
+            ranks: List of the integer ranks of the preferred active
+                Candidates of the Ballots. Defaults to an empty list.
+        """
+        self.candidate = candidate
+        self.vote_value = vote_value
+        self.ballots = ballots if ballots is not None else list()
+        self.ranks = ranks if ranks is not None else list()
+
+
 class VoteTracker:
     """Vote Tracker for assigning votes to Candidates.
 
@@ -244,10 +302,31 @@ class VoteTracker:
         Returns:
             String containing the printable representation of the VoteTracker.
         """
-        description = 'VoteTracker for {} votes:'.format(self.votes_cast)
-        for candidate in sorted(self._votes_for_candidate, key=self._votes_for_candidate.get, reverse=True):
-            description += '\n{}: {}'.format(candidate, self._votes_for_candidate[candidate])
-        return description
+        description = io.StringIO()
+        self.write_description(description)
+        return description.getvalue()
+
+    def write_description(self, f):
+        """Writes a printable long-form user representation of the VoteTracker.
+
+        Args:
+            f: Writable text file object to write the representation to.
+        """
+        votes_for_candidate = self._votes_for_candidate
+        f.write('VoteTracker for {} votes:'.format(self.votes_cast))
+        f.write(''.join(['\n{}: {}'.format(candidate, votes_for_candidate[candidate])
+                         for candidate in sorted(votes_for_candidate, key=votes_for_candidate.get, reverse=True)]))
+
+    def as_dict(self):
+        """Returns the votes for each Candidate as a serializable dict.
+
+        Returns:
+            Dict mapping Candidate uids to float values of votes, ordered from
+                most to fewest votes.
+        """
+        votes_for_candidate = self._votes_for_candidate
+        return {candidate.uid: votes_for_candidate[candidate]
+                for candidate in sorted(votes_for_candidate, key=votes_for_candidate.get, reverse=True)}
 
     def cast_vote_for_candidate(self, candidate, vote_value):
         """Casts the vote for the Candidate, updating the stored vote totals.
@@ -297,6 +376,9 @@ class VoteTracker:
     def candidates_reaching_threshold(self, candidates, threshold):
         """Returns the Candidate(s) with vote values meeting the threshold.
 
+        Vote values within THRESHOLD_TOLERANCE of the threshold meet it, so that
+        a vote value equal to the threshold is not rounded below it.
+
         Args:
             candidates: Set of Candidates to check.
             threshold: Float value of the vote threshold.
@@ -305,6 +387,7 @@ class VoteTracker:
             Set of Candidates meeting the vote threshold.
         """
         candidates_reaching_threshold = set()
+        threshold -= abs(threshold) * THRESHOLD_TOLERANCE
 
         # Cycle through candidates and find those meeting the vote threshold
         for candidate in candidates:
@@ -316,26 +399,93 @@ class VoteTracker:
     def candidates_with_fewest_votes(self, candidates):
         """Returns the Candidate(s) with the fewest votes.
 
+        Vote values within THRESHOLD_TOLERANCE of the fewest votes are tied with
+        them, so that equal vote values rounded differently remain tied.
+
         Args:
             candidates: Set of Candidates to check.
 
         Returns:
             Set of Candidates with the fewest votes.
         """
-        candidates_with_fewest_votes = set()
-        fewest_votes = -1
+        if not candidates:
+            return set()
 
-        # Cycle through candidates and find those with the fewest votes
-        for candidate in candidates:
-            is_fewest_votes_unset = (fewest_votes == -1)
-            candidate_votes = self.votes_for_candidate(candidate)
-            if candidate_votes <= fewest_votes or is_fewest_votes_unset:
-                if candidate_votes < fewest_votes or is_fewest_votes_unset:
-                    fewest_votes = candidate_votes
-                    candidates_with_fewest_votes.clear()
-                candidates_with_fewest_votes.add(candidate)
+        # Find the fewest votes, and the candidates tied with them
+        fewest_votes = min(self.votes_for_candidate(candidate) for candidate in candidates)
+        fewest_votes += abs(fewest_votes) * THRESHOLD_TOLERANCE
+        return {candidate for candidate in candidates
+                if self.votes_for_candidate(candidate) <= fewest_votes}
+
+
+class Timings:
+    """Timing and counter instrumentation for an election computation.
+
+    Attributes:
+        durations: Dict mapping phase names to float seconds spent in each
+            phase, in the order the phases were first recorded.
+        counters: Dict mapping counter names to integer counts.
+    """
 
-        return candidates_with_fewest_votes
+    def __init__(self, durations=None, counters=None):
+        """Initializes Timings with phase durations and counters.
+
+        Args:
+            durations: Dict mapping phase names to float seconds spent.
+            counters: Dict mapping counter names to integer counts.
+        """
+        self.durations = durations if durations is not None else dict()
+        self.counters = counters if counters is not None else dict()
+
+    def __repr__(self):
+        """Returns a printable system representation of the Timings.
+
+        Returns:
+            String containing the printable representation of the Timings.
+        """
+        return 'Timings(durations={!r}, counters={!r})'.format(
+                self.durations, self.counters)
+
+    def description(self):
+        """Returns a printable long-form user representation of the Timings.
+
+        Returns:
+            String containing the printable representation of the Timings.
+        """
+        lines = ['{}: {:.6f}s'.format(phase, seconds)
+                 for phase, seconds in self.durations.items()]
+        lines.extend('{}: {}'.format(counter, count)
+                     for counter, count in self.counters.items())
+        return '\n'.join(lines)
+
+    def add_duration(self, phase, seconds):
+        """Adds time spent in a phase.
+
+        Args:
+            phase: String representing the name of the phase.
+            seconds: Float value of the seconds spent in the phase.
+        """
+        self.durations[phase] = self.durations.get(phase, 0.0) + seconds
+
+    def increment(self, counter, amount=1):
+        """Increments a counter.
+
+        Args:
+            counter: String representing the name of the counter.
+            amount: Integer value to add to the counter. Defaults to 1.
+        """
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def update(self, other):
+        """Adds the durations and counters of another Timings to this one.
+
+        Args:
+            other: Timings to accumulate.
+        """
+        for phase, seconds in other.durations.items():
+            self.add_duration(phase, seconds)
+        for counter, count in other.counters.items():
+            self.increment(counter, count)
 
 
 class ElectionRound:
@@ -348,11 +498,20 @@ class ElectionRound:
         random_tiebreak_occured: Boolean indicating if a random tiebreak
                 occurred or not in this round.
         vote_tracker: VoteTracker for counting votes in this round.
+        votes_exhausted: Float value of the votes on Ballots exhausted by the
+            end of this round's count.
+        transfers: Dict mapping each Candidate elected or eliminated in an
+            earlier round to a dict mapping the Candidates (or None, for
+            exhaustion) that received its Ballots in this round's count to the
+            float value of the votes transferred.
+        timings: Timings recorded for this round, or None if timings were not
+            recorded.
     """
 
     def __init__(self, candidates_elected=None, candidates_eliminated=None,
                  threshold=0, random_tiebreak_occurred=False,
-                 vote_tracker=None):
+                 vote_tracker=None, votes_exhausted=0.0, transfers=None,
+                 timings=None):
         """Initializes ElectionRound with threshold, Candidate, and vote data.
 
         Args:
@@ -362,12 +521,23 @@ class ElectionRound:
             random_tiebreak_occured: Boolean indicating if a random tiebreak
                 occurred or not in this round.
             vote_tracker: VoteTracker for counting votes in this round.
+            votes_exhausted: Float value of the votes on Ballots exhausted by
+                the end of this round's count.
+            transfers: Dict mapping each Candidate elected or eliminated in an
+                earlier round to a dict mapping the Candidates (or None, for
+                exhaustion) that received its Ballots in this round's count to
+                the float value of the votes transferred.
+            timings: Timings recorded for this round, or None if timings were
+                not recorded.
         """
         self.threshold = threshold
         self.candidates_elected = (candidates_elected if candidates_elected is not None else set())
         self.candidates_eliminated = (candidates_eliminated if candidates_eliminated is not None else set())
         self.random_tiebreak_occurred = random_tiebreak_occurred
         self.vote_tracker = (vote_tracker if vote_tracker is not None else VoteTracker())
+        self.votes_exhausted = votes_exhausted
+        self.transfers = transfers if transfers is not None else dict()
+        self.timings = timings
 
     def __repr__(self):
         """Returns a printable system representation of the ElectionRound.
@@ -385,21 +555,67 @@ class ElectionRound:
         Returns:
             String containing the printable representation of the ElectionRound.
         """
-        description = 'ElectionRound with threshold {}:\n'.format(self.threshold)
-        description += self.vote_tracker.decription()
+        description = io.StringIO()
+        self.write_description(description)
+        return description.getvalue()
+
+    def write_description(self, f):
+        """Writes a printable long-form user representation of the
+            ElectionRound.
+
+        Args:
+            f: Writable text file object to write the representation to.
+        """
+        f.write('ElectionRound with threshold {}:\n'.format(self.threshold))
+        self.vote_tracker.write_description(f)
         if len(self.candidates_elected) > 0:
-            summary_elected = '\nCandidates elected in this round:'
-            for candidate in self.candidates_elected:
-                summary_elected += ' {},'.format(candidate)
-            description += summary_elected[:-1]
+            f.write('\nCandidates elected in this round: ')
+            f.write(', '.join(str(candidate) for candidate in self.candidates_elected))
         if len(self.candidates_eliminated) > 0:
-            summary_eliminated = '\nCandidates eliminated in this round:'
-            for candidate in self.candidates_eliminated:
-                summary_eliminated += ' {},'.format(candidate)
-            description += summary_eliminated[:-1]
+            f.write('\nCandidates eliminated in this round: ')
+            f.write(', '.join(str(candidate) for candidate in self.candidates_eliminated))
         if self.random_tiebreak_occurred:
-            description += '\nA random tiebreak occurred in this round'
-        return description
+            f.write('\nA random tiebreak occurred in this round')
+
+    def as_dict(self):
+        """Returns a serializable dict representation of the ElectionRound.
+
+        Returns:
+            Dict containing the threshold, tallies, Candidates elected and
+                eliminated (by uid), random tiebreak flag, votes exhausted, and
+                vote transfers (see transfer_links()).
+        """
+        return {
+            'threshold': self.threshold,
+            'tallies': self.vote_tracker.as_dict(),
+            'elected': sorted(candidate.uid for candidate in self.candidates_elected),
+            'eliminated': sorted(candidate.uid for candidate in self.candidates_eliminated),
+            'random_tiebreak_occurred': self.random_tiebreak_occurred,
+            'votes_exhausted': self.votes_exhausted,
+            'transfers': self.transfer_links(),
+        }
+
+    def transfer_links(self):
+        """Returns the vote transfers counted in this round as a list of links.
+
+        Returns:
+            List of dicts, each containing the uid of the Candidate the votes
+                were transferred from ('from'), the uid of the Candidate they
+                were transferred to or None for exhaustion ('to'), and the
+                float value of the votes transferred ('votes'). Ordered by
+                uids, with exhaustion last.
+        """
+        links = list()
+        for source in sorted(self.transfers, key=lambda candidate: candidate.uid):
+            transfers_from_candidate = self.transfers[source]
+            for target in sorted(transfers_from_candidate,
+                                 key=lambda candidate: (candidate is None, candidate.uid if candidate is not None else '')):
+                links.append({
+                    'from': source.uid,
+                    'to': target.uid if target is not None else None,
+                    'votes': transfers_from_candidate[target],
+                })
+        return links
 
 
 class ElectionResults:
@@ -413,11 +629,13 @@ class ElectionResults:
         random_alphanumeric: String containing the random alphanumeric used for
             final tiebreaks.
         seats: Number of vacant seats before the election.
+        timings: Timings recorded for the whole election, or None if timings
+            were not recorded.
     """
 
     def __init__(self, ballots, candidates_elected,
                  election_rounds, random_alphanumeric,
-                 seats, name=''):
+                 seats, name='', timings=None):
         """Initializes ElectionResults with election results and data.
 
         Args:
@@ -428,6 +646,8 @@ class ElectionResults:
                 for final tiebreaks.
             seats: Number of vacant seats before the election.
             name: String representing the name of the election.
+            timings: Timings recorded for the whole election, or None if
+                timings were not recorded.
         """
         self.ballots = ballots
         self.candidates_elected = candidates_elected
@@ -435,6 +655,7 @@ class ElectionResults:
         self.name = name
         self.random_alphanumeric = random_alphanumeric
         self.seats = seats
+        self.timings = timings
 
     def __repr__(self):
         """Returns a printable system representation of the ElectionResults.
@@ -454,233 +675,2155 @@ class ElectionResults:
             String containing the printable representation of the
                 ElectionResults.
         """
-        description = 'Results for election {}:\n'.format(self.name)
+        description = io.StringIO()
+        self.write_description(description)
+        return description.getvalue()
+
+    def write_description(self, f):
+        """Writes a printable long-form user representation of the
+            ElectionResults, one ElectionRound at a time.
+
+        Args:
+            f: Writable text file object to write the representation to.
+        """
+        f.write('Results for election {}:\n'.format(self.name))
         if len(self.candidates_elected) > 0:
-            summary_elected = 'Elected:'
-            for candidate in self.candidates_elected:
-                summary_elected += ' {},'.format(candidate)
-            description += summary_elected[:-1]
+            f.write('Elected: ')
+            f.write(', '.join(str(candidate) for candidate in self.candidates_elected))
+
+        for round_index in range(len(self.election_rounds)):
+            f.write('\nRound {}:\n'.format(round_index))
+            self.election_rounds[round_index].write_description(f)
+
+    def as_dict(self, include_rounds=True):
+        """Returns a serializable dict representation of the ElectionResults.
+
+        Args:
+            include_rounds: Boolean indicating if the serialized ElectionRounds
+                should be included. Defaults to True.
+
+        Returns:
+            Dict containing the election configuration, the Candidates
+                (mapping uids to names), the Candidates elected (by uid), and
+                optionally the serialized ElectionRounds.
+        """
+        candidates = set(self.candidates_elected)
+        for election_round in self.election_rounds:
+            candidates.update(election_round.vote_tracker.candidates())
+        results = {
+            'name': self.name,
+            'seats': self.seats,
+            'random_alphanumeric': self.random_alphanumeric,
+            'candidates': {candidate.uid: candidate.name
+                           for candidate in sorted(candidates, key=lambda candidate: candidate.uid)},
+            'candidates_elected': sorted(candidate.uid for candidate in self.candidates_elected),
+        }
+        if include_rounds:
+            results['rounds'] = [election_round.as_dict()
+                                 for election_round in self.election_rounds]
+        return results
+
+    def timings_description(self):
+        """Returns a printable long-form representation of the recorded
+            Timings for the election and each round.
 
+        Returns:
+            String containing the printable representation of the Timings, or
+                an explanatory message if timings were not recorded.
+        """
+        if self.timings is None:
+            return 'No timings were recorded for election {}'.format(self.name)
+
+        description = 'Timings for election {}:\n{}'.format(
+                self.name, self.timings.description())
         for round_index in range(len(self.election_rounds)):
-            round_description = self.election_rounds[round_index].description()
-            summary_round = '\nRound {}:\n{}'.format(round_index, round_description)
-            description += summary_round
+            timings = self.election_rounds[round_index].timings
+            if timings is not None:
+                description += '\nRound {}:\n{}'.format(
+                        round_index, timings.description())
         return description
 
 
-class Election:
-    """Election configuration and computation.
+class ElectionSummary(ElectionResults):
+    """Lightweight election results and data for all rounds.
+
+    Unlike ElectionResults, the Ballots are not retained; only their count and
+    hash are kept, so the summary is cheap to hold and to print.
 
     Attributes:
-        ballots: List of all Ballots.
-        seats: Number of vacant seats before the election.
-        can_eliminate_no_confidence: Boolean indicating if No Confidence may be
-            eliminated in the election.
-        can_random_tiebreak: Boolean indicating if random elimination may be
-            used for final tiebreaks. Otherwise, the election is halted.
-        name: String representing the name of the election. Defaults to an empty
-            string.
+        ballot_count: Integer number of Ballots cast in the election.
+        ballots_hash: String hex digest identifying the Ballots. See
+            ballots_hash().
+        candidates_elected: Set of Candidates elected.
+        election_rounds: List of ElectionRounds.
+        name: String representing the name of the election.
         random_alphanumeric: String containing the random alphanumeric used for
             final tiebreaks.
+        seats: Number of vacant seats before the election.
+        timings: Timings recorded for the whole election, or None if timings
+            were not recorded.
     """
 
-    def __init__(self, ballots, seats, can_eliminate_no_confidence=True,
-                 can_random_tiebreak=True, name='', random_alphanumeric=None):
-        """Initializes Election with ballots, seats, and configuration data.
+    def __init__(self, ballot_count, ballots_hash, candidates_elected,
+                 election_rounds, random_alphanumeric,
+                 seats, name='', timings=None):
+        """Initializes ElectionSummary with election results and data.
 
         Args:
-            ballots: List of all Ballots.
+            ballot_count: Integer number of Ballots cast in the election.
+            ballots_hash: String hex digest identifying the Ballots.
+            candidates_elected: Set of Candidates elected.
+            election_rounds: List of ElectionRounds.
+            random_alphanumeric: String containing the random alphanumeric used
+                for final tiebreaks.
             seats: Number of vacant seats before the election.
-            can_eliminate_no_confidence: Boolean indicating if No Confidence may
-                be eliminated in the election.
-            can_random_tiebreak: Boolean indicating if random elimination may be
-                used for final tiebreaks. Otherwise, the election is halted.
             name: String representing the name of the election.
-            random_alphanumeric: String containing the rcandom alphanumeric used
-                for final tiebreaks.
+            timings: Timings recorded for the whole election, or None if
+                timings were not recorded.
         """
-        self.ballots = ballots
-        self.can_eliminate_no_confidence = can_eliminate_no_confidence
-        self.can_random_tiebreak = can_random_tiebreak
-        self.seats = seats
-        self.name = name
-        self.random_alphanumeric = random_alphanumeric
+        super().__init__(None, candidates_elected, election_rounds,
+                         random_alphanumeric, seats, name=name,
+                         timings=timings)
+        self.ballot_count = ballot_count
+        self.ballots_hash = ballots_hash
 
-    def droop_quota(self, seats, votes):
-        """Calculates the Droop Quota as the vote threshold.
+    def __repr__(self):
+        """Returns a printable system representation of the ElectionSummary.
 
-        This threshold is the minimum number of votes a candidate must receive
-        in order to be elected outright.
+        The representation is bounded by the number of candidates, and lists
+        only the number of ElectionRounds rather than their tallies.
 
-        Args:
-            seats_vacant: Integer value of the seats vacant.
-            votes: Float value of the value of votes cast.
-        Returns: An int representing the vote quota
+        Returns:
+            String containing the printable representation of the
+            ElectionSummary.
         """
-        return (float(votes) / (float(seats) + 1.0)) + 1.0
+        return ('ElectionSummary(name={!r}, seats={!r}, ballot_count={!r}, ballots_hash={!r}, '
+                'random_alphanumeric={!r}, candidates_elected={!r}, election_rounds=<{} rounds>)').format(
+                    self.name, self.seats, self.ballot_count, self.ballots_hash, self.random_alphanumeric, self.candidates_elected, len(self.election_rounds))
 
-    def compute_results(self):
-        """Run the election using the single transferable vote algorithm.
+    def as_dict(self, include_rounds=True):
+        """Returns a serializable dict representation of the ElectionSummary.
+
+        Args:
+            include_rounds: Boolean indicating if the serialized ElectionRounds
+                should be included. Defaults to True.
 
         Returns:
-            ElectionResults containing the election results and data.
+            Dict containing the ElectionResults representation along with the
+                ballot count and hash.
         """
+        results = super().as_dict(include_rounds=include_rounds)
+        results['ballot_count'] = self.ballot_count
+        results['ballots_hash'] = self.ballots_hash
+        return results
 
-        election_rounds = list()
-        current_round = 0
 
-        ballots_active = copy.deepcopy(self.ballots)
-        ballots_exhausted = list()
+def ballots_hash(ballots):
+    """Returns a hash identifying a collection of Ballots.
 
-        candidates_elected = set()
-        candidates_eliminated = set()
+    The hash depends on the rankings, vote values, and starting ranks of the
+    Ballots, but not on their order.
 
-        ##########
-        # Generate random alphanumeric (if none provided)
-        ##########
-        tiebreak_alphanumeric = self.random_alphanumeric
-        if tiebreak_alphanumeric is None:
-            alphanumeric = string.printable
-            tiebreak_alphanumeric = ''.join(random.sample(alphanumeric,
-                                                          len(alphanumeric)))
-        ##########
-        # STV Algorithm
-        ##########
-        while len(candidates_elected) < self.seats:
-            current_round += 1
-            vote_tracker = VoteTracker()
-            ballots_for_candidate = dict()
+    Args:
+        ballots: List of Ballots.
 
-            election_round = ElectionRound(vote_tracker=vote_tracker)
-            election_rounds.append(election_round)
+    Returns:
+        String containing the SHA-256 hex digest of the Ballots.
+    """
+    ballot_counts = dict()
+    for ballot in ballots:
+        key = repr(ballot)
+        ballot_counts[key] = ballot_counts.get(key, 0) + 1
 
-            ##########
-            # Count and assign votes from ballots
-            ##########
-            ballots_to_exhaust = list()
-            for ballot in ballots_active:
-                # Determine preferred active candidate.
-                while True:
-                    # If no preferred candidate, ballot is exhausted, break.
-                    # If candidate has not been elected or eliminated, break.
-                    candidate = ballot.preferred_active_candidate()
-                    if (candidate is None or
-                            candidate not in candidates_elected and
-                            candidate not in candidates_eliminated):
-                        break
+    digest = hashlib.sha256()
+    for key in sorted(ballot_counts):
+        digest.update('{}\t{}\n'.format(ballot_counts[key], key).encode('utf-8'))
+    return digest.hexdigest()
 
-                    # Otherwise, remove the candidate from the ballot.
-                    ballot.eliminate_preferred_candidate()
 
-                # Ensure that vote tracker contains every active candidate
-                for candidate in ballot.candidates:
-                    if (candidate not in candidates_elected and
-                            candidate not in candidates_eliminated):
-                        vote_tracker.cast_vote_for_candidate(candidate, 0.0)
+def ballots_without_candidates(ballots, candidates):
+    """Returns Ballots with the given Candidates withdrawn.
 
-                # If ballot has no active candidates, it is exhausted.
-                candidate = ballot.preferred_active_candidate()
-                if candidate is None:
-                    ballots_to_exhaust.append(ballot)
+    Later-ranked Candidates move up in place of the withdrawn Candidates.
 
-                # If ballot has no value, it is exhausted.
-                elif ballot.vote_value <= 0.0:
-                    ballots_to_exhaust.append(ballot)
+    Args:
+        ballots: List of Ballots.
+        candidates: Set of Candidates to withdraw.
 
-                # Otherwise, record the ballot and cast its vote.
-                else:
-                    # Add vote to vote tracker.
-                    vote_tracker.cast_vote_for_candidate(candidate,
-                                                         ballot.vote_value)
+    Returns:
+        List of new Ballots, with the same vote values, ranking only the
+            Candidates not withdrawn.
+    """
+    return [Ballot(candidates=[candidate for candidate in ballot.candidates
+                               if candidate not in candidates],
+                   vote_value=ballot.vote_value)
+            for ballot in ballots]
 
-                    # Add ballot to ballot tracker.
-                    if candidate not in ballots_for_candidate:
-                        ballots_for_candidate[candidate] = []
-                    ballots_for_candidate[candidate].append(ballot)
 
-            # Remove exhausted ballots.
-            for ballot in ballots_to_exhaust:
-                ballots_active.remove(ballot)
-            ballots_exhausted.extend(ballots_to_exhaust)
+class PairwiseComparison:
+    """Head-to-head comparison of every pair of Candidates.
 
-            # End election if no candidates remain.
-            if len(vote_tracker.candidates()) == 0:
-                break
+    A Ballot prefers a Candidate over another if it ranks the Candidate higher,
+    or ranks the Candidate and not the other.
 
-            # If remaining candidates less than or equal to remaining seats
-            # elect candidates whose votes exceed that of No Confidence.
-            seats_vacant = self.seats - len(candidates_elected)
-            if len(vote_tracker.candidates()) <= seats_vacant:
-                # Determine the number of votes for No Confidence.
-                nc_vote = 0
-                for candidate in vote_tracker.candidates():
-                    if isinstance(candidate, NoConfidence):
-                        nc_vote = vote_tracker.votes_for_candidate(candidate)
-                        break
+    Attributes:
+        candidates: List of Candidates compared, ordered by uid.
+        _index_for_candidate: Dict mapping Candidates to their index in
+            candidates.
+        _preferences: List of lists of float values, where _preferences[i][j]
+            is the value of votes preferring candidates[i] over candidates[j].
+    """
 
-                # Elect all candidates with more votes than No Confidence and end election.
-                candidates_to_elect = vote_tracker.candidates_reaching_threshold(vote_tracker.candidates(), nc_vote)
-                candidates_elected.update(candidates_to_elect)
-                election_round.candidates_elected = candidates_to_elect
-                break
+    def __init__(self, candidates, preferences):
+        """Initializes PairwiseComparison with Candidates and preferences.
 
-            ##########
-            # Calculate threshold
-            ##########
-            # Threshold changes per round based on votes cast and seats vacant.
-            threshold = self.droop_quota(seats_vacant, vote_tracker.votes_cast)
-            election_round.threshold = threshold
+        Args:
+            candidates: List of Candidates compared, ordered by uid.
+            preferences: List of lists of float values, where
+                preferences[i][j] is the value of votes preferring
+                candidates[i] over candidates[j].
+        """
+        self.candidates = candidates
+        self._index_for_candidate = {candidate: index for index, candidate in enumerate(candidates)}
+        self._preferences = preferences
 
-            ##########
-            # If winners, transfer surplus, move to next round.
-            ##########
-            candidates_to_elect = vote_tracker.candidates_reaching_threshold(vote_tracker.candidates(), threshold)
-            candidates_elected.update(candidates_to_elect)
-            election_round.candidates_elected = candidates_to_elect
+    def __repr__(self):
+        """Returns a printable system representation of the
+            PairwiseComparison.
 
-            if len(candidates_to_elect) > 0:
-                no_confidence_elected = False
-                for candidate in candidates_to_elect:
-                    # Calculate vote surplus
-                    votes = vote_tracker.votes_for_candidate(candidate)
-                    surplus = votes - threshold
+        Returns:
+            String containing the printable representation of the
+            PairwiseComparison.
+        """
+        return 'PairwiseComparison(candidates={!r}, preferences={!r})'.format(
+                self.candidates, self._preferences)
 
-                    # Assign fractional value to ballots.
-                    vote_multiplier = surplus / votes
-                    for ballot in ballots_for_candidate[candidate]:
-                        ballot.vote_value *= vote_multiplier
+    def description(self):
+        """Returns a printable long-form user representation of the
+            PairwiseComparison.
 
-                    # Check if elected candidate is No Confidence.
-                    if isinstance(candidate, NoConfidence):
-                        no_confidence_elected = True
+        Returns:
+            String containing the printable representation of the
+            PairwiseComparison.
+        """
+        condorcet_winner = self.condorcet_winner()
+        condorcet_loser = self.condorcet_loser()
+        lines = ['Condorcet winner: {}'.format(condorcet_winner if condorcet_winner is not None else 'None'),
+                 'Condorcet loser: {}'.format(condorcet_loser if condorcet_loser is not None else 'None')]
+        for i in range(len(self.candidates)):
+            for j in range(i + 1, len(self.candidates)):
+                lines.append('{} vs {}: {} - {}'.format(
+                        self.candidates[i], self.candidates[j],
+                        self._preferences[i][j], self._preferences[j][i]))
+        return '\n'.join(lines)
+
+    def preferences(self, candidate, other_candidate):
+        """Returns the value of votes preferring a Candidate over another.
 
-                # If No Confidence was elected, end the election.
-                if no_confidence_elected:
-                    break
+        Args:
+            candidate: Candidate preferred.
+            other_candidate: Candidate compared against.
 
-                # Move on to the next round after transferring surplus.
-                continue
+        Returns:
+            Float value of the votes preferring candidate over other_candidate.
+        """
+        return self._preferences[self._index_for_candidate[candidate]][self._index_for_candidate[other_candidate]]
 
-            ##########
-            # Eliminate loser, transfer votes
-            ##########
-            # Find the candidate(s) (excluding No Confidence) with the fewest
-            # votes in the current round.
-            candidates_eligible_to_eliminate = set()
-            candidates_to_eliminate = set()
-            for candidate in vote_tracker.candidates():
-                if self.can_eliminate_no_confidence or not isinstance(candidate, NoConfidence):
-                    candidates_eligible_to_eliminate.add(candidate)
+    def condorcet_winner(self):
+        """Returns the Candidate preferred over every other Candidate.
 
-            candidates_to_eliminate = vote_tracker.candidates_with_fewest_votes(candidates_eligible_to_eliminate)
+        Returns:
+            Candidate winning every head-to-head comparison, or None.
+        """
+        preferences = self._preferences
+        for i in range(len(self.candidates)):
+            if all(preferences[i][j] > preferences[j][i]
+                   for j in range(len(self.candidates)) if j != i):
+                return self.candidates[i]
+        return None
 
-            # If multiple candidates have the fewest votes in a round, and their
-            # combined vote total is less than that of the next-highest
-            # candidate, eliminate all of the tied candidates. Otherwise, a
-            # tiebreak is required to select the candidate to eliminate.
-            tiebreak_required = False
-            if len(candidates_to_eliminate) > 1:
-                tied_combined_vote_value = len(candidates_to_eliminate) * vote_tracker.votes_for_candidate(next(iter(candidates_to_eliminate)))
+    def condorcet_loser(self):
+        """Returns the Candidate with every other Candidate preferred over it.
+
+        Returns:
+            Candidate losing every head-to-head comparison, or None.
+        """
+        preferences = self._preferences
+        for i in range(len(self.candidates)):
+            if all(preferences[i][j] < preferences[j][i]
+                   for j in range(len(self.candidates)) if j != i):
+                return self.candidates[i]
+        return None
+
+
+def _pairwise_counts(rankings, weights, candidate_count):
+    """Returns the value of votes ranking each Candidate, and of votes ranking
+        each Candidate below another.
+
+    Each ranking costs time quadratic in its length.
+
+    Args:
+        rankings: List of distinct rankings, each a list of Candidate indices
+            ordered by preferred rank without repeats.
+        weights: List of the float value of votes of each ranking.
+        candidate_count: Integer number of Candidates.
+
+    Returns:
+        Tuple of a list of float values, where the ith is the value of votes
+            ranking Candidate i, and a list of lists of float values, where
+            [i][j] is the value of votes ranking Candidate j above Candidate i.
+    """
+    ranked = [0.0] * candidate_count
+    ranked_below = [[0.0] * candidate_count for _ in range(candidate_count)]
+    for indices, weight in zip(rankings, weights):
+        for rank, i in enumerate(indices):
+            ranked[i] += weight
+            ranked_below_for_candidate = ranked_below[i]
+            for j in indices[:rank]:
+                ranked_below_for_candidate[j] += weight
+    return ranked, ranked_below
+
+
+def _pairwise_counts_numpy(rankings, weights, candidate_count):
+    """Returns the value of votes ranking each Candidate, and of votes ranking
+        each Candidate below another, using NumPy. See _pairwise_counts().
+
+    Rankings of the same length are stacked into a matrix, a chunk at a time,
+    and every pair of rank positions of the chunk is counted at once by
+    numpy.bincount, so Python only loops over the lengths and chunks.
+
+    Args:
+        rankings: List of distinct rankings, each a list of Candidate indices
+            ordered by preferred rank without repeats.
+        weights: List of the float value of votes of each ranking.
+        candidate_count: Integer number of Candidates.
+
+    Returns:
+        Tuple of a list of float values, where the ith is the value of votes
+            ranking Candidate i, and a list of lists of float values, where
+            [i][j] is the value of votes ranking Candidate j above Candidate i.
+    """
+    rankings_for_length = dict()
+    for indices, weight in zip(rankings, weights):
+        if indices:
+            length_rankings, length_weights = rankings_for_length.setdefault(len(indices), (list(), list()))
+            length_rankings.append(indices)
+            length_weights.append(weight)
+
+    ranked = numpy.zeros(candidate_count)
+    ranked_below = numpy.zeros(candidate_count * candidate_count)
+    for length, (length_rankings, length_weights) in rankings_for_length.items():
+        upper_ranks, lower_ranks = numpy.triu_indices(length, 1)
+        chunk_size = max(1, PAIRWISE_CHUNK_PAIRS // max(1, len(upper_ranks)))
+        for start in range(0, len(length_rankings), chunk_size):
+            matrix = numpy.array(length_rankings[start:start + chunk_size], dtype=numpy.intp)
+            chunk_weights = numpy.array(length_weights[start:start + chunk_size], dtype=float)
+            ranked += numpy.bincount(matrix.ravel(), weights=numpy.repeat(chunk_weights, length),
+                                     minlength=candidate_count)
+            pair_keys = (matrix[:, lower_ranks] * candidate_count + matrix[:, upper_ranks]).ravel()
+            ranked_below += numpy.bincount(pair_keys, weights=numpy.repeat(chunk_weights, len(upper_ranks)),
+                                           minlength=candidate_count * candidate_count)
+    return ranked.tolist(), ranked_below.reshape(candidate_count, candidate_count).tolist()
+
+
+def pairwise_comparison(ballots):
+    """Returns the head-to-head comparison of every pair of Candidates ranked.
+
+    Identical rankings are aggregated first, so the work is proportional to the
+    number of distinct rankings rather than the number of Ballots. A Candidate
+    is preferred over another by the votes ranking it, less the votes ranking
+    the other above it. Counting the pairs ranked one above the other costs
+    time quadratic in the length of each distinct ranking: if numpy is
+    installed, the pairs are counted by vectorized NumPy operations, and
+    otherwise by a Python loop over each pair of ranks of each distinct
+    ranking. Repeated Candidates on a Ballot count at their highest rank.
+
+    Args:
+        ballots: List of Ballots, weighted by their vote values.
+
+    Returns:
+        PairwiseComparison of every Candidate ranked on the Ballots.
+    """
+    weight_for_ranking = dict()
+    for ballot in ballots:
+        ranking = tuple(dict.fromkeys(ballot.candidates))
+        weight_for_ranking[ranking] = weight_for_ranking.get(ranking, 0.0) + ballot.vote_value
+
+    candidates = set()
+    for ranking in weight_for_ranking:
+        candidates.update(ranking)
+    candidates = sorted(candidates, key=lambda candidate: candidate.uid)
+    index_for_candidate = {candidate: index for index, candidate in enumerate(candidates)}
+
+    rankings = [[index_for_candidate[candidate] for candidate in ranking] for ranking in weight_for_ranking]
+    weights = list(weight_for_ranking.values())
+    if numpy is not None:
+        ranked, ranked_below = _pairwise_counts_numpy(rankings, weights, len(candidates))
+    else:
+        ranked, ranked_below = _pairwise_counts(rankings, weights, len(candidates))
+
+    preferences = [[ranked[i] - ranked_below[i][j] if i != j else 0.0
+                    for j in range(len(candidates))]
+                   for i in range(len(candidates))]
+    return PairwiseComparison(candidates, preferences)
+
+
+class SeatSweep:
+    """Results of an election for each of several seat counts.
+
+    Attributes:
+        results_for_seats: Dict mapping integer seat counts to the
+            ElectionSummary of the election for that many seats, in increasing
+            order of seats.
+        shared_rounds: Integer number of leading rounds, eliminating Candidates
+            without electing any, that are the same for every seat count and
+            were counted once.
+    """
+
+    def __init__(self, results_for_seats, shared_rounds=0):
+        """Initializes SeatSweep with the results for each seat count.
+
+        Args:
+            results_for_seats: Dict mapping integer seat counts to
+                ElectionSummaries.
+            shared_rounds: Integer number of leading rounds counted once for
+                every seat count. Defaults to 0.
+        """
+        self.results_for_seats = {seats: results_for_seats[seats] for seats in sorted(results_for_seats)}
+        self.shared_rounds = shared_rounds
+
+    def __repr__(self):
+        """Returns a printable system representation of the SeatSweep.
+
+        Returns:
+            String containing the printable representation of the SeatSweep.
+        """
+        return 'SeatSweep(results_for_seats={!r}, shared_rounds={!r})'.format(
+                self.results_for_seats, self.shared_rounds)
+
+    def candidates(self):
+        """Returns the Candidates elected for any seat count.
+
+        Returns:
+            List of Candidates, ordered by the fewest seats they are elected
+                for and then by uid.
+        """
+        candidates = list()
+        for results in self.results_for_seats.values():
+            candidates.extend(sorted(set(results.candidates_elected).difference(candidates),
+                                     key=lambda candidate: candidate.uid))
+        return candidates
+
+    def description(self):
+        """Returns a printable long-form user representation of the SeatSweep,
+            as a table marking the Candidates elected for each seat count.
+
+        Returns:
+            String containing the printable representation of the SeatSweep.
+        """
+        candidates = self.candidates()
+        labels = [str(candidate) for candidate in candidates]
+        label_width = max([len('Candidate')] + [len(label) for label in labels])
+        column_widths = [max(len(str(seats)), 1) for seats in self.results_for_seats]
+
+        lines = ['  '.join(['Candidate'.ljust(label_width)] + [str(seats) for seats in self.results_for_seats])]
+        for candidate, label in zip(candidates, labels):
+            cells = [('X' if candidate in results.candidates_elected else '').ljust(width)
+                     for results, width in zip(self.results_for_seats.values(), column_widths)]
+            lines.append('  '.join([label.ljust(label_width)] + cells).rstrip())
+        return '\n'.join(lines)
+
+    def as_dict(self):
+        """Returns the Candidates elected for each seat count as JSON-
+            serializable data.
+
+        Returns:
+            Dict containing the shared rounds and a list of the seats and uids
+                of the Candidates elected for each seat count.
+        """
+        return {'shared_rounds': self.shared_rounds,
+                'results': [{'seats': seats,
+                             'candidates_elected': sorted(candidate.uid for candidate in results.candidates_elected)}
+                            for seats, results in self.results_for_seats.items()]}
+
+
+class WithdrawalAnalysis:
+    """Results of an election with each of several Candidates withdrawn in
+        turn.
+
+    Attributes:
+        results: ElectionSummary of the election without withdrawals.
+        results_for_withdrawn: Dict mapping each withdrawn Candidate to the
+            ElectionSummary of the election with that Candidate withdrawn, in
+            order of uid.
+    """
+
+    def __init__(self, results, results_for_withdrawn):
+        """Initializes WithdrawalAnalysis with the results of each election.
+
+        Args:
+            results: ElectionSummary of the election without withdrawals.
+            results_for_withdrawn: Dict mapping each withdrawn Candidate to the
+                ElectionSummary of the election with that Candidate withdrawn.
+        """
+        self.results = results
+        self.results_for_withdrawn = {candidate: results_for_withdrawn[candidate]
+                                      for candidate in sorted(results_for_withdrawn, key=lambda candidate: candidate.uid)}
+
+    def __repr__(self):
+        """Returns a printable system representation of the WithdrawalAnalysis.
+
+        Returns:
+            String containing the printable representation of the
+                WithdrawalAnalysis.
+        """
+        return 'WithdrawalAnalysis(results={!r}, results_for_withdrawn={!r})'.format(
+                self.results, self.results_for_withdrawn)
+
+    def changes(self, candidate):
+        """Returns the changes to the elected Candidates when a Candidate
+            withdraws, apart from the withdrawn Candidate itself.
+
+        Args:
+            candidate: Withdrawn Candidate.
+
+        Returns:
+            Tuple of the set of Candidates elected only with the Candidate
+                withdrawn, and the set of Candidates elected only without.
+        """
+        candidates_elected = set(self.results.candidates_elected)
+        candidates_elected_withdrawn = set(self.results_for_withdrawn[candidate].candidates_elected)
+        candidates_elected.discard(candidate)
+        return (candidates_elected_withdrawn.difference(candidates_elected),
+                candidates_elected.difference(candidates_elected_withdrawn))
+
+    def withdrawals_changing_results(self):
+        """Returns the withdrawn Candidates whose withdrawal changes the other
+            Candidates elected.
+
+        Returns:
+            List of withdrawn Candidates, in order of uid.
+        """
+        return [candidate for candidate in self.results_for_withdrawn if any(self.changes(candidate))]
+
+    def description(self):
+        """Returns a printable long-form user representation of the
+            WithdrawalAnalysis.
+
+        Returns:
+            String containing the printable representation of the
+                WithdrawalAnalysis.
+        """
+        def candidates_description(candidates):
+            return ', '.join(str(candidate) for candidate in sorted(candidates, key=lambda candidate: candidate.uid))
+
+        lines = ['Elected: {}'.format(candidates_description(self.results.candidates_elected))]
+        for candidate in self.results_for_withdrawn:
+            gained, lost = self.changes(candidate)
+            changes = list()
+            if gained:
+                changes.append('elects {}'.format(candidates_description(gained)))
+            if lost:
+                changes.append('does not elect {}'.format(candidates_description(lost)))
+            lines.append('Withdrawing {}: {}'.format(candidate, ', '.join(changes) or 'no change'))
+        return '\n'.join(lines)
+
+
+class MarginAnalysis:
+    """Estimate of the fewest changed Ballots that would alter the Candidates
+        elected.
+
+    Attributes:
+        results: ElectionSummary of the election.
+        lower_bound: Integer number of Ballots that must be changed, at least,
+            before the Candidates elected can change.
+        lower_bound_round: Integer index of the first ElectionRound whose
+            decision may change with lower_bound Ballots changed, or None if
+            no decision can change.
+        witness: List of tuples of the integer index of a changed Ballot, the
+            Ballot, and the Ballot replacing it, which together change the
+            Candidates elected, or None if no witness was found.
+        witness_results: ElectionSummary of the election with the witness
+            applied, or None if no witness was found.
+    """
+
+    def __init__(self, results, lower_bound, lower_bound_round=None,
+                 witness=None, witness_results=None):
+        """Initializes MarginAnalysis with the bounds and witness.
+
+        Args:
+            results: ElectionSummary of the election.
+            lower_bound: Integer number of Ballots that must be changed, at
+                least, before the Candidates elected can change.
+            lower_bound_round: Integer index of the first ElectionRound whose
+                decision may change with lower_bound Ballots changed, or None.
+            witness: List of tuples of the integer index of a changed Ballot,
+                the Ballot, and the Ballot replacing it, or None.
+            witness_results: ElectionSummary of the election with the witness
+                applied, or None.
+        """
+        self.results = results
+        self.lower_bound = lower_bound
+        self.lower_bound_round = lower_bound_round
+        self.witness = witness
+        self.witness_results = witness_results
+
+    def __repr__(self):
+        """Returns a printable system representation of the MarginAnalysis.
+
+        Returns:
+            String containing the printable representation of the
+                MarginAnalysis.
+        """
+        return ('MarginAnalysis(results={!r}, lower_bound={!r}, lower_bound_round={!r}, '
+                'upper_bound={!r}, witness_results={!r})').format(
+                    self.results, self.lower_bound, self.lower_bound_round,
+                    self.upper_bound, self.witness_results)
+
+    @property
+    def upper_bound(self):
+        """Integer number of Ballots changed by the witness, or None."""
+        return len(self.witness) if self.witness is not None else None
+
+    def description(self):
+        """Returns a printable long-form user representation of the
+            MarginAnalysis.
+
+        Returns:
+            String containing the printable representation of the
+                MarginAnalysis.
+        """
+        def candidates_description(candidates):
+            return ', '.join(str(candidate) for candidate in candidates)
+
+        def sorted_candidates(candidates):
+            return sorted(candidates, key=lambda candidate: candidate.uid)
+
+        lines = ['Elected: {}'.format(candidates_description(sorted_candidates(self.results.candidates_elected)))]
+        if self.lower_bound_round is None:
+            lines.append('No ballot changes can alter the candidates elected')
+        else:
+            lines.append('At least {} ballots must change (round {} is the closest decision)'.format(
+                    self.lower_bound, self.lower_bound_round + 1))
+        if self.witness is None:
+            lines.append('No ballot changes altering the candidates elected were found')
+            return '\n'.join(lines)
+
+        candidates_elected = set(self.results.candidates_elected)
+        candidates_elected_witness = set(self.witness_results.candidates_elected)
+        gained = candidates_elected_witness.difference(candidates_elected)
+        lost = candidates_elected.difference(candidates_elected_witness)
+        changes = list()
+        if gained:
+            changes.append('elects {}'.format(candidates_description(sorted_candidates(gained))))
+        if lost:
+            changes.append('does not elect {}'.format(candidates_description(sorted_candidates(lost))))
+        lines.append('Changing {} ballots {}:'.format(len(self.witness), ', '.join(changes)))
+
+        # Group the changed Ballots by their rankings before and after.
+        ballot_count_for_change = dict()
+        for _, ballot, changed_ballot in self.witness:
+            change = (candidates_description(ballot.candidates), candidates_description(changed_ballot.candidates))
+            ballot_count_for_change[change] = ballot_count_for_change.get(change, 0) + 1
+        for (ranking, changed_ranking), ballot_count in ballot_count_for_change.items():
+            lines.append('\t{} x {} -> {}'.format(ballot_count, ranking, changed_ranking))
+        return '\n'.join(lines)
+
+
+def _elimination_run_votes(buckets, candidates_inactive, round_for_candidate, round_count):
+    """Returns the votes of Candidates in a run of rounds that eliminate
+        Candidates without electing any, for other orders of elimination.
+
+    No surplus is transferred during the run, so the votes of each Candidate
+    depend only on which Candidates have been eliminated, not on the order in
+    which they were.
+
+    Args:
+        buckets: List of _BallotBuckets of the active Ballots at the start of
+            the run, which are only read.
+        candidates_inactive: Set of Candidates elected or eliminated before the
+            run.
+        round_for_candidate: Dict mapping each Candidate eliminated in the run
+            to the integer index of its round, counted from the start of the
+            run.
+        round_count: Integer number of rounds in the run.
+
+    Returns:
+        Tuple of two dicts mapping keys to lists of float votes, one for each
+            round of the run. The first maps each Candidate eliminated in the
+            run to its votes once the Candidates eliminated up to and in the
+            round, except itself, are eliminated. The second maps tuples of a
+            Candidate and a Candidate eliminated in the run to the votes of
+            the first Candidate after the round reached through the second.
+    """
+    # Changes in the count of Ballots per vote value, by round, for each key.
+    ballot_count_changes = dict()
+
+    def add_ballots(key, first_round, last_round, vote_value, ballot_count):
+        if first_round >= last_round:
+            return
+        changes = ballot_count_changes.setdefault(key, [dict() for _ in range(round_count + 1)])
+        changes[first_round][vote_value] = changes[first_round].get(vote_value, 0) + ballot_count
+        changes[last_round][vote_value] = changes[last_round].get(vote_value, 0) - ballot_count
+
+    for bucket in buckets:
+        # Only Ballots for Candidates eliminated in the run are reassigned.
+        if bucket.candidate not in round_for_candidate or bucket.vote_value <= 0.0:
+            continue
+        for ballot, rank in zip(bucket.ballots, bucket.ranks):
+            # The Ballot reaches each Candidate once every Candidate ranked
+            # before it is eliminated, which is after the latest of their
+            # rounds.
+            candidates_passed = list()
+            latest_round = -1
+            for candidate in ballot.candidates[rank:]:
+                if candidate in candidates_inactive or candidate in candidates_passed:
+                    continue
+                candidate_round = round_for_candidate.get(candidate, round_count)
+                for candidate_passed in candidates_passed:
+                    add_ballots((candidate, candidate_passed), latest_round, candidate_round, bucket.vote_value, 1)
+                if candidate_round == round_count:
+                    break
+                add_ballots(candidate, max(latest_round, candidate_round), round_count, bucket.vote_value, 1)
+                candidates_passed.append(candidate)
+                latest_round = max(latest_round, candidate_round)
+
+    votes_for_key = dict()
+    for key, changes in ballot_count_changes.items():
+        ballot_count_for_vote_value = dict()
+        votes = list()
+        for round_changes in changes[:round_count]:
+            _add_ballot_counts(ballot_count_for_vote_value, round_changes)
+            votes.append(_sum_votes(ballot_count_for_vote_value))
+        votes_for_key[key] = votes
+    return ({key: votes for key, votes in votes_for_key.items() if not isinstance(key, tuple)},
+            {key: votes for key, votes in votes_for_key.items() if isinstance(key, tuple)})
+
+
+def _elimination_segments(election_rounds, seats, can_eliminate_no_confidence, buckets_for_run):
+    """Returns how far each run of consecutive eliminations can be reordered
+        without changing the Candidates it eliminates.
+
+    A segment of consecutive rounds of a run eliminates the same Candidates in
+    any order as long as each of them, at its most votes with the others of the
+    segment eliminated, has fewer votes than any other Candidate had at the
+    start of the segment, and no Candidate can reach the threshold before the
+    segment ends. The count after the segment is then unchanged.
+
+    Args:
+        election_rounds: List of ElectionRounds of the election.
+        seats: Number of vacant seats before the election.
+        can_eliminate_no_confidence: Boolean indicating if No Confidence may be
+            eliminated in the election.
+        buckets_for_run: Dict mapping the integer index of the first round of
+            each run to copies of the _BallotBuckets of the active Ballots at
+            its start.
+
+    Returns:
+        Dict mapping the integer index of each round of a run to a list of
+            tuples of the float margin of the Candidates eliminated, the float
+            margin of the threshold, and the integer index of the last round,
+            for each segment starting at the round.
+    """
+    segments_for_round = dict()
+    seats_vacant = seats
+    candidates_inactive = set()
+    for round_index, election_round in enumerate(election_rounds):
+        if round_index in buckets_for_run:
+            last_round_index = round_index
+            while (last_round_index + 1 < len(election_rounds) and
+                   election_rounds[last_round_index + 1].candidates_eliminated and
+                   not election_rounds[last_round_index + 1].candidates_elected):
+                last_round_index += 1
+            run_rounds = election_rounds[round_index:last_round_index + 1]
+            round_for_candidate = {candidate: run_round_index
+                                   for run_round_index, run_round in enumerate(run_rounds)
+                                   for candidate in run_round.candidates_eliminated}
+            votes_for_candidate, votes_for_candidate_through = _elimination_run_votes(
+                    buckets_for_run[round_index], candidates_inactive, round_for_candidate, len(run_rounds))
+
+            for first_index, first_round in enumerate(run_rounds):
+                segments = list()
+                candidates_segment = set()
+                for last_index, last_round in enumerate(run_rounds[first_index:], first_index):
+                    candidates_segment.update(last_round.candidates_eliminated)
+                    most_votes_segment = max(votes_for_candidate.get(candidate, [0.0] * len(run_rounds))[last_index]
+                                             for candidate in candidates_segment)
+
+                    # Every other Candidate keeps at least its votes from the
+                    # start of the segment.
+                    fewest_votes_other = min([first_round.vote_tracker.votes_for_candidate(candidate)
+                                              for candidate in first_round.vote_tracker.candidates()
+                                              if candidate not in candidates_segment and
+                                              (can_eliminate_no_confidence or not isinstance(candidate, NoConfidence))],
+                                             default=math.inf)
+
+                    # Every Candidate has at most its votes after the segment,
+                    # less those reached through the Candidate still standing,
+                    # against a threshold at least the threshold after it.
+                    threshold_margin = -math.inf
+                    if round_index + last_index + 1 < len(election_rounds):
+                        next_vote_tracker = election_rounds[round_index + last_index + 1].vote_tracker
+                        if len(next_vote_tracker.candidates()) >= seats_vacant:
+                            most_votes = max([most_votes_segment] + [
+                                next_vote_tracker.votes_for_candidate(candidate) -
+                                min(votes_for_candidate_through.get((candidate, candidate_segment), [0.0] * len(run_rounds))[last_index]
+                                    for candidate_segment in candidates_segment)
+                                for candidate in next_vote_tracker.candidates()])
+                            threshold_margin = next_vote_tracker.votes_cast / (seats_vacant + 1) + 1 - most_votes
+
+                    segments.append((fewest_votes_other - most_votes_segment, threshold_margin,
+                                     round_index + last_index))
+                segments_for_round[round_index + first_index] = segments
+
+        candidates_inactive.update(election_round.candidates_elected)
+        candidates_inactive.update(election_round.candidates_eliminated)
+        seats_vacant -= len(election_round.candidates_elected)
+    return segments_for_round
+
+
+def _round_decision_may_change(election_rounds, seats, can_eliminate_no_confidence, vote_value_changed,
+                               segments_for_round=None):
+    """Returns the first round whose decision may change when Ballots worth a
+        total vote value are changed.
+
+    Until a decision changes, every round counts the unchanged Ballots the same
+    way. The total difference between the two counts' Ballots starts at twice
+    the value changed, which leaves one Candidate for another, and grows only
+    by the difference between the thresholds when a surplus is transferred. A
+    decision may change once the tallies it compares could cross within that
+    difference.
+    An elimination that may change is skipped if the segment of eliminations
+    it starts eliminates the same Candidates in any order within that
+    difference, since the count after the segment is then unchanged.
+
+    Args:
+        election_rounds: List of ElectionRounds of the election.
+        seats: Number of vacant seats before the election.
+        can_eliminate_no_confidence: Boolean indicating if No Confidence may be
+            eliminated in the election.
+        vote_value_changed: Float value of the votes on the changed Ballots.
+        segments_for_round: Dict returned by _elimination_segments, or None to
+            skip no eliminations. Defaults to None.
+
+    Returns:
+        Integer index of the ElectionRound, or None if every decision stands.
+    """
+    if segments_for_round is None:
+        segments_for_round = dict()
+    difference = 2.0 * vote_value_changed
+    seats_vacant = seats
+    round_index = 0
+    while round_index < len(election_rounds):
+        election_round = election_rounds[round_index]
+        vote_tracker = election_round.vote_tracker
+        candidates = vote_tracker.candidates()
+        if not candidates:
+            return None
+
+        # The remaining Candidates are compared against No Confidence.
+        if len(candidates) <= seats_vacant:
+            for candidate in candidates:
+                if isinstance(candidate, NoConfidence):
+                    nc_vote = vote_tracker.votes_for_candidate(candidate)
+                    if any(abs(vote_tracker.votes_for_candidate(other_candidate) - nc_vote) <= difference
+                           for other_candidate in candidates if other_candidate != candidate):
+                        return round_index
+            return None
+
+        # The threshold moves with the votes cast.
+        threshold = election_round.threshold
+        threshold_difference = difference / (seats_vacant + 1)
+        if any(abs(vote_tracker.votes_for_candidate(candidate) - threshold) <= difference + threshold_difference
+               for candidate in candidates):
+            return round_index
+
+        # A surplus is transferred at a multiplier of one less the threshold
+        # over the votes, so the difference between the transferred Ballots
+        # grows only by the difference between the thresholds.
+        if election_round.candidates_elected:
+            difference += len(election_round.candidates_elected) * threshold_difference
+            seats_vacant -= len(election_round.candidates_elected)
+            round_index += 1
+            continue
+
+        # Tied Candidates eliminated together, or by a random tiebreak, may be
+        # separated.
+        elimination_may_change = (len(election_round.candidates_eliminated) != 1 or
+                                  election_round.random_tiebreak_occurred)
+        if not elimination_may_change:
+            candidate_eliminated = next(iter(election_round.candidates_eliminated))
+            fewest_votes = vote_tracker.votes_for_candidate(candidate_eliminated)
+            elimination_may_change = any(
+                    candidate != candidate_eliminated and
+                    (can_eliminate_no_confidence or not isinstance(candidate, NoConfidence)) and
+                    vote_tracker.votes_for_candidate(candidate) - fewest_votes <= difference
+                    for candidate in candidates)
+        if not elimination_may_change:
+            round_index += 1
+            continue
+
+        # Skip a segment of eliminations reordered within the difference.
+        for elimination_margin, threshold_margin, last_round_index in segments_for_round.get(round_index, ()):
+            if elimination_margin > difference and threshold_margin > difference + threshold_difference:
+                round_index = last_round_index + 1
+                break
+        else:
+            return round_index
+    return None
+
+
+def _margin_swaps(results, can_eliminate_no_confidence):
+    """Returns the swaps of two Candidates on Ballots most likely to alter the
+        Candidates elected, from the closest decisions of the election.
+
+    Args:
+        results: ElectionSummary of the election.
+        can_eliminate_no_confidence: Boolean indicating if No Confidence may be
+            eliminated in the election.
+
+    Returns:
+        List of tuples of the float margin of the decision, the Candidate to
+            move down the Ballots, and the Candidate to move up, ordered by
+            margin.
+    """
+    margin_for_swap = dict()
+
+    def add_swap(margin, candidate, other_candidate):
+        swap = (candidate, other_candidate)
+        if candidate != other_candidate and margin < margin_for_swap.get(swap, math.inf):
+            margin_for_swap[swap] = margin
+
+    votes_for_candidate = dict()
+    for election_round in results.election_rounds:
+        vote_tracker = election_round.vote_tracker
+        candidates = sorted(vote_tracker.candidates(),
+                            key=lambda candidate: (-vote_tracker.votes_for_candidate(candidate), candidate.uid))
+        for candidate in candidates:
+            votes_for_candidate[candidate] = vote_tracker.votes_for_candidate(candidate)
+        if not candidates:
+            continue
+
+        # Candidates compared against No Confidence.
+        if election_round.threshold == 0:
+            for candidate in candidates:
+                if isinstance(candidate, NoConfidence):
+                    nc_vote = vote_tracker.votes_for_candidate(candidate)
+                    for other_candidate in candidates:
+                        margin = vote_tracker.votes_for_candidate(other_candidate) - nc_vote
+                        if other_candidate in election_round.candidates_elected:
+                            add_swap(margin, other_candidate, candidate)
+                        else:
+                            add_swap(-margin, candidate, other_candidate)
+            continue
+
+        # Candidates compared against the threshold, who trade votes with the
+        # strongest Candidate on the other side of it.
+        candidates_not_elected = [candidate for candidate in candidates
+                                  if candidate not in election_round.candidates_elected]
+        if election_round.candidates_elected and candidates_not_elected:
+            for candidate in election_round.candidates_elected:
+                add_swap(vote_tracker.votes_for_candidate(candidate) - election_round.threshold,
+                         candidate, candidates_not_elected[0])
+        elif len(candidates) > 1:
+            add_swap(election_round.threshold - vote_tracker.votes_for_candidate(candidates[0]),
+                     candidates[1], candidates[0])
+
+        # Candidates eliminated, who trade votes with the next fewest.
+        candidates_eligible = [candidate for candidate in candidates
+                               if candidate not in election_round.candidates_eliminated and
+                               (can_eliminate_no_confidence or not isinstance(candidate, NoConfidence))]
+        if candidates_eligible:
+            for candidate in election_round.candidates_eliminated:
+                add_swap(vote_tracker.votes_for_candidate(candidates_eligible[-1]) -
+                         vote_tracker.votes_for_candidate(candidate), candidates_eligible[-1], candidate)
+
+    # Every Candidate elected against every Candidate not, by their last votes.
+    for candidate in results.candidates_elected:
+        for other_candidate in votes_for_candidate:
+            if other_candidate not in results.candidates_elected:
+                add_swap(votes_for_candidate.get(candidate, 0) - votes_for_candidate[other_candidate],
+                         candidate, other_candidate)
+
+    return sorted(((max(margin, 0.0),) + swap for swap, margin in margin_for_swap.items()),
+                  key=lambda margin_swap: (margin_swap[0], margin_swap[1].uid, margin_swap[2].uid))
+
+
+def _swapped_ballot(ballot, candidate, other_candidate):
+    """Returns a Ballot with two Candidates swapped.
+
+    Args:
+        ballot: Ballot ranking the Candidate.
+        candidate: Candidate to move down the Ballot.
+        other_candidate: Candidate to move up the Ballot, in place of the
+            Candidate if it is not ranked.
+
+    Returns:
+        New Ballot, with the same vote value and starting rank.
+    """
+    candidates = list()
+    for ranked_candidate in ballot.candidates:
+        if ranked_candidate == candidate:
+            candidates.append(other_candidate)
+        elif ranked_candidate == other_candidate:
+            candidates.append(candidate)
+        else:
+            candidates.append(ranked_candidate)
+    return Ballot(candidates=candidates, starting_rank=ballot._preferred_active_rank, vote_value=ballot.vote_value)
+
+
+def _sum_votes(ballot_count_for_vote_value):
+    """Returns the total value of votes from a count of Ballots per vote value.
+
+    The total is correctly rounded and independent of the order in which the
+    counts were gathered, so that counts merged from any number of shards sum
+    to exactly the same value.
+
+    Args:
+        ballot_count_for_vote_value: Dict mapping float vote values to integer
+            counts of Ballots with that vote value.
+
+    Returns:
+        Float value of the votes.
+    """
+    return math.fsum(vote_value * ballot_count
+                     for vote_value, ballot_count in ballot_count_for_vote_value.items())
+
+
+def _add_ballot_counts(ballot_count_for_vote_value, other_ballot_count_for_vote_value):
+    """Adds one count of Ballots per vote value to another.
+
+    Args:
+        ballot_count_for_vote_value: Dict mapping float vote values to integer
+            counts of Ballots, updated in place.
+        other_ballot_count_for_vote_value: Dict mapping float vote values to
+            integer counts of Ballots to add.
+    """
+    for vote_value, ballot_count in other_ballot_count_for_vote_value.items():
+        ballot_count_for_vote_value[vote_value] = ballot_count_for_vote_value.get(vote_value, 0) + ballot_count
+
+
+class _RoundCount:
+    """Ballot counts gathered from a _BallotStore in a round of voting.
+
+    Votes are kept as integer counts of Ballots per vote value, so that counts
+    from several stores can be merged exactly before being summed.
+
+    Attributes:
+        ballot_counts_for_candidate: Dict mapping Candidates to dicts mapping
+            vote values to counts of Ballots counted for the Candidate.
+        ballots_listing_candidate: Dict mapping Candidates to the number of
+            active Ballots listing them at the start of the count.
+        exhausted_ballot_counts: Dict mapping vote values to counts of Ballots
+            exhausted in the count.
+        transferred_ballot_counts: Dict mapping each Candidate elected or
+            eliminated in an earlier round to a dict mapping the Candidates (or
+            None, for exhaustion) that received its Ballots to dicts mapping
+            vote values to counts of Ballots.
+        ballots_scanned: Integer number of Ballots assigned to a Candidate.
+        pointer_advances: Integer number of ranks advanced past on Ballots.
+        ballots_exhausted: Integer number of Ballots exhausted.
+    """
+
+    def __init__(self):
+        """Initializes an empty _RoundCount."""
+        self.ballot_counts_for_candidate = dict()
+        self.ballots_listing_candidate = dict()
+        self.exhausted_ballot_counts = dict()
+        self.transferred_ballot_counts = dict()
+        self.ballots_scanned = 0
+        self.pointer_advances = 0
+        self.ballots_exhausted = 0
+
+    def update(self, other):
+        """Merges the counts of another _RoundCount into this one.
+
+        Args:
+            other: _RoundCount to merge.
+        """
+        for candidate, ballot_counts in other.ballot_counts_for_candidate.items():
+            _add_ballot_counts(self.ballot_counts_for_candidate.setdefault(candidate, dict()), ballot_counts)
+        for candidate, ballot_count in other.ballots_listing_candidate.items():
+            self.ballots_listing_candidate[candidate] = self.ballots_listing_candidate.get(candidate, 0) + ballot_count
+        _add_ballot_counts(self.exhausted_ballot_counts, other.exhausted_ballot_counts)
+        for source, transferred_ballot_counts in other.transferred_ballot_counts.items():
+            transfers_from_candidate = self.transferred_ballot_counts.setdefault(source, dict())
+            for target, ballot_counts in transferred_ballot_counts.items():
+                _add_ballot_counts(transfers_from_candidate.setdefault(target, dict()), ballot_counts)
+        self.ballots_scanned += other.ballots_scanned
+        self.pointer_advances += other.pointer_advances
+        self.ballots_exhausted += other.ballots_exhausted
+
+
+class _BallotStore:
+    """Ballots and their counting state for a single election computation.
+
+    Ballots are grouped into _BallotBuckets sharing a Candidate and a vote
+    value, which persist across rounds. Only Ballots for Candidates elected or
+    eliminated in the previous round are reassigned in each count. The Ballots
+    themselves are only read, so any number of _BallotStores may count the
+    same Ballots at once.
+
+    Attributes:
+        _ballots_listing_candidate: Dict mapping Candidates to the number of
+            active Ballots listing them, in order of first appearance.
+        _buckets_for_candidate: Dict mapping Candidates to lists of
+            _BallotBuckets counted for them.
+        _buckets_to_redistribute: List of _BallotBuckets whose Ballots must be
+            reassigned in the next count.
+        _buckets_tiebreak: List of copies of the _BallotBuckets of the active
+            Ballots advanced during a forward tiebreak, or None outside of a
+            forward tiebreak.
+    """
+
+    def __init__(self, ballots):
+        """Initializes _BallotStore with Ballots.
+
+        Args:
+            ballots: List of Ballots.
+        """
+        # Count the active ballots listing each candidate, so that every
+        # candidate still on a ballot is tracked even without votes.
+        self._ballots_listing_candidate = dict()
+        for ballot in ballots:
+            for candidate in ballot.candidates:
+                self._ballots_listing_candidate[candidate] = self._ballots_listing_candidate.get(candidate, 0) + 1
+
+        # All ballots begin unassigned, grouped only by their initial vote
+        # value.
+        buckets_for_vote_value = dict()
+        for ballot in ballots:
+            if ballot.vote_value not in buckets_for_vote_value:
+                buckets_for_vote_value[ballot.vote_value] = _BallotBucket(None, ballot.vote_value)
+            buckets_for_vote_value[ballot.vote_value].ballots.append(ballot)
+            buckets_for_vote_value[ballot.vote_value].ranks.append(ballot._preferred_active_rank)
+        self._buckets_for_candidate = dict()
+        self._buckets_to_redistribute = list(buckets_for_vote_value.values())
+        self._buckets_tiebreak = None
+
+    def candidates(self):
+        """Returns the Candidates listed on the Ballots.
+
+        Returns:
+            List of Candidates in order of first appearance on the Ballots.
+        """
+        return list(self._ballots_listing_candidate)
+
+    def count(self, candidates_elected, candidates_eliminated):
+        """Assigns Ballots to their preferred active Candidates and counts
+            them.
+
+        Args:
+            candidates_elected: Set of Candidates elected so far.
+            candidates_eliminated: Set of Candidates eliminated so far.
+
+        Returns:
+            _RoundCount of the Ballots.
+        """
+        self._buckets_tiebreak = None
+        round_count = _RoundCount()
+        transfers = round_count.transferred_ballot_counts
+        buckets_for_candidate = self._buckets_for_candidate
+
+        # Only ballots for candidates elected or eliminated in the previous
+        # round need to be reassigned; all others keep their candidate.
+        for candidate in list(buckets_for_candidate):
+            if candidate in candidates_elected or candidate in candidates_eliminated:
+                self._buckets_to_redistribute.extend(buckets_for_candidate.pop(candidate))
+
+        ballots_to_exhaust = list()
+        for bucket in self._buckets_to_redistribute:
+            transferred_from = bucket.candidate
+            vote_value = bucket.vote_value
+            buckets_for_destination = dict()
+            round_count.ballots_scanned += len(bucket.ballots)
+            for ballot, rank in zip(bucket.ballots, bucket.ranks):
+                # Determine preferred active candidate.
+                ranked_candidates = ballot.candidates
+                while True:
+                    # If no preferred candidate, ballot is exhausted, break.
+                    # If candidate has not been elected or eliminated, break.
+                    candidate = ranked_candidates[rank] if rank < len(ranked_candidates) else None
+                    if (candidate is None or
+                            candidate not in candidates_elected and
+                            candidate not in candidates_eliminated):
+                        break
+
+                    # Otherwise, advance past the candidate.
+                    rank += 1
+                    round_count.pointer_advances += 1
+
+                # Record the transfer of the ballot's vote value from the
+                # elected or eliminated candidate it previously counted towards
+                # to its new preferred candidate (None if it is exhausted).
+                if transferred_from is not None:
+                    transferred_ballot_counts = transfers.setdefault(transferred_from, dict()).setdefault(candidate, dict())
+                    transferred_ballot_counts[vote_value] = transferred_ballot_counts.get(vote_value, 0) + 1
+
+                # If ballot has no active candidates, it is exhausted.
+                # If ballot has no value, it is exhausted.
+                if candidate is None or vote_value <= 0.0:
+                    ballots_to_exhaust.append(ballot)
+                    round_count.exhausted_ballot_counts[vote_value] = round_count.exhausted_ballot_counts.get(vote_value, 0) + 1
+
+                # Otherwise, move the ballot to the bucket of its candidate.
+                else:
+                    if candidate not in buckets_for_destination:
+                        destination = _BallotBucket(candidate, vote_value)
+                        buckets_for_destination[candidate] = destination
+                        buckets_for_candidate.setdefault(candidate, list()).append(destination)
+                    buckets_for_destination[candidate].ballots.append(ballot)
+                    buckets_for_destination[candidate].ranks.append(rank)
+        self._buckets_to_redistribute = list()
+
+        # Count the ballots of each bucket.
+        for candidate, buckets in buckets_for_candidate.items():
+            ballot_counts = round_count.ballot_counts_for_candidate.setdefault(candidate, dict())
+            for bucket in buckets:
+                ballot_counts[bucket.vote_value] = ballot_counts.get(bucket.vote_value, 0) + len(bucket.ballots)
+
+        # Remove exhausted ballots.
+        round_count.ballots_listing_candidate = dict(self._ballots_listing_candidate)
+        for ballot in ballots_to_exhaust:
+            for candidate in ballot.candidates:
+                self._ballots_listing_candidate[candidate] -= 1
+        round_count.ballots_exhausted = len(ballots_to_exhaust)
+
+        return round_count
+
+    def transfer_surplus(self, vote_multiplier_for_candidate):
+        """Multiplies the vote value of the Ballots for elected Candidates.
+
+        Args:
+            vote_multiplier_for_candidate: Dict mapping Candidates to the float
+                fraction of their Ballots' vote value to transfer.
+
+        Returns:
+            Integer number of Ballots whose vote value was multiplied.
+        """
+        ballots_transferred = 0
+        for candidate, vote_multiplier in vote_multiplier_for_candidate.items():
+            for bucket in self._buckets_for_candidate.get(candidate, ()):
+                bucket.vote_value *= vote_multiplier
+                ballots_transferred += len(bucket.ballots)
+        return ballots_transferred
+
+    def copy_buckets(self):
+        """Copies the _BallotBuckets of the active Ballots, as last counted.
+
+        Returns:
+            List of copies of the _BallotBuckets, which may be advanced without
+                changing the counting state.
+        """
+        return [_BallotBucket(bucket.candidate, bucket.vote_value, list(bucket.ballots), list(bucket.ranks))
+                for buckets in self._buckets_for_candidate.values()
+                for bucket in buckets]
+
+    def begin_tiebreak(self):
+        """Copies the active Ballots to be advanced in a forward tiebreak.
+
+        Returns:
+            Integer number of active Ballots.
+        """
+        self._buckets_tiebreak = self.copy_buckets()
+        return sum(len(bucket.ballots) for bucket in self._buckets_tiebreak)
+
+    def count_tiebreak(self, candidates_elected, candidates_eliminated,
+                       can_eliminate_no_confidence):
+        """Advances the forward tiebreak Ballots to their next rank and counts
+            them.
+
+        Args:
+            candidates_elected: Set of Candidates elected so far.
+            candidates_eliminated: Set of Candidates eliminated so far.
+            can_eliminate_no_confidence: Boolean indicating if No Confidence
+                may be eliminated in the election.
+
+        Returns:
+            Tuple of a dict mapping Candidates to dicts mapping vote values to
+                counts of Ballots counted for the Candidate, and the integer
+                number of forward tiebreak Ballots remaining active.
+        """
+        ballot_counts_for_candidate = dict()
+        ballots_active_tiebreak = 0
+        for bucket in self._buckets_tiebreak:
+            ballots_active = list()
+            ranks_active = list()
+            for ballot, rank in zip(bucket.ballots, bucket.ranks):
+                ranked_candidates = ballot.candidates
+
+                # Determine preferred active candidate.
+                candidate = ranked_candidates[rank] if rank < len(ranked_candidates) else None
+                if can_eliminate_no_confidence or not isinstance(candidate, NoConfidence):
+                    rank += 1
+
+                while True:
+                    # Update ballots
+                    candidate = ranked_candidates[rank] if rank < len(ranked_candidates) else None
+                    if (candidate is None or
+                            candidate not in candidates_elected and
+                            candidate not in candidates_eliminated):
+                        break
+
+                    # Otherwise, advance past the candidate.
+                    rank += 1
+
+                # If ballot is exhausted, remove it.
+                # Remove No Confidence ballots if not eligible to be
+                # eliminated.
+                if candidate is None or not can_eliminate_no_confidence and isinstance(candidate, NoConfidence):
+                    continue
+
+                # Otherwise, keep the ballot and count its vote.
+                ballots_active.append(ballot)
+                ranks_active.append(rank)
+                ballot_counts = ballot_counts_for_candidate.setdefault(candidate, dict())
+                ballot_counts[bucket.vote_value] = ballot_counts.get(bucket.vote_value, 0) + 1
+            bucket.ballots = ballots_active
+            bucket.ranks = ranks_active
+            ballots_active_tiebreak += len(ballots_active)
+
+        return ballot_counts_for_candidate, ballots_active_tiebreak
+
+    def close(self):
+        """Releases the resources held by the _BallotStore."""
+        pass
+
+
+def _serve_ballot_store(connection, ballots):
+    """Serves requests for a _BallotStore of a shard of Ballots.
+
+    Runs in a worker process of a _ShardedBallotStore. Each request is a tuple
+    of a _BallotStore method name and its arguments, and is answered with the
+    return value of the method, or the exception raised. A request of None ends
+    the worker.
+
+    Args:
+        connection: multiprocessing Connection to the coordinating process.
+        ballots: List of Ballots in the shard.
+    """
+    ballot_store = _BallotStore(ballots)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        method, args = request
+        try:
+            connection.send(getattr(ballot_store, method)(*args))
+        except Exception as exception:
+            connection.send(exception)
+    connection.close()
+
+
+class _ShardedBallotStore:
+    """Ballots split into shards counted in parallel by worker processes.
+
+    Provides the same methods as _BallotStore. Each request is sent to every
+    worker, and the partial results are merged exactly, so that the election
+    is decided identically to counting with a single _BallotStore.
+
+    Attributes:
+        _connections: List of multiprocessing Connections to the workers.
+        _processes: List of worker multiprocessing Processes.
+    """
+
+    def __init__(self, ballots, processes):
+        """Initializes _ShardedBallotStore, starting its worker processes.
+
+        Args:
+            ballots: List of Ballots.
+            processes: Integer number of worker processes (and shards).
+        """
+        self._connections = list()
+        self._processes = list()
+        shard_size = -(-len(ballots) // processes)
+        for shard_start in range(0, max(len(ballots), 1), max(shard_size, 1)):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_serve_ballot_store,
+                                              args=(worker_connection, ballots[shard_start:shard_start + shard_size]),
+                                              daemon=True)
+            process.start()
+            worker_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    def _request(self, method, *args):
+        """Sends a request to every worker and returns their responses.
+
+        Args:
+            method: String name of the _BallotStore method to call.
+            args: Arguments of the method.
+
+        Returns:
+            List of the responses of the workers, in shard order.
+        """
+        for connection in self._connections:
+            connection.send((method, args))
+        responses = [connection.recv() for connection in self._connections]
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+        return responses
+
+    def candidates(self):
+        """Returns the Candidates listed on the Ballots.
+
+        Returns:
+            List of Candidates in order of first appearance on the Ballots.
+        """
+        candidates = dict()
+        for shard_candidates in self._request('candidates'):
+            candidates.update(dict.fromkeys(shard_candidates))
+        return list(candidates)
+
+    def count(self, candidates_elected, candidates_eliminated):
+        """Assigns Ballots to their preferred active Candidates and counts
+            them.
+
+        Args:
+            candidates_elected: Set of Candidates elected so far.
+            candidates_eliminated: Set of Candidates eliminated so far.
+
+        Returns:
+            _RoundCount of the Ballots of every shard.
+        """
+        round_count = _RoundCount()
+        for shard_round_count in self._request('count', candidates_elected, candidates_eliminated):
+            round_count.update(shard_round_count)
+        return round_count
+
+    def transfer_surplus(self, vote_multiplier_for_candidate):
+        """Multiplies the vote value of the Ballots for elected Candidates.
+
+        Args:
+            vote_multiplier_for_candidate: Dict mapping Candidates to the float
+                fraction of their Ballots' vote value to transfer.
+
+        Returns:
+            Integer number of Ballots whose vote value was multiplied.
+        """
+        return sum(self._request('transfer_surplus', vote_multiplier_for_candidate))
+
+    def begin_tiebreak(self):
+        """Copies the active Ballots to be advanced in a forward tiebreak.
+
+        Returns:
+            Integer number of active Ballots.
+        """
+        return sum(self._request('begin_tiebreak'))
+
+    def count_tiebreak(self, candidates_elected, candidates_eliminated,
+                       can_eliminate_no_confidence):
+        """Advances the forward tiebreak Ballots to their next rank and counts
+            them.
+
+        Args:
+            candidates_elected: Set of Candidates elected so far.
+            candidates_eliminated: Set of Candidates eliminated so far.
+            can_eliminate_no_confidence: Boolean indicating if No Confidence
+                may be eliminated in the election.
+
+        Returns:
+            Tuple of a dict mapping Candidates to dicts mapping vote values to
+                counts of Ballots counted for the Candidate, and the integer
+                number of forward tiebreak Ballots remaining active.
+        """
+        ballot_counts_for_candidate = dict()
+        ballots_active = 0
+        for shard_ballot_counts_for_candidate, shard_ballots_active in self._request(
+                'count_tiebreak', candidates_elected, candidates_eliminated, can_eliminate_no_confidence):
+            for candidate, ballot_counts in shard_ballot_counts_for_candidate.items():
+                _add_ballot_counts(ballot_counts_for_candidate.setdefault(candidate, dict()), ballot_counts)
+            ballots_active += shard_ballots_active
+        return ballot_counts_for_candidate, ballots_active
+
+    def close(self):
+        """Stops the worker processes."""
+        for connection in self._connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+        for process in self._processes:
+            process.join()
+
+
+def _compute_worker_summaries(election, ballots_digest, summary_arguments):
+    """Computes the results of an Election for several sets of arguments in a
+        worker process. See Election._compute_summary().
+
+    Args:
+        election: Election whose Ballots are counted.
+        ballots_digest: String returned by ballots_hash for the Ballots.
+        summary_arguments: List of dicts of keyword arguments to
+            Election._compute_summary().
+
+    Returns:
+        List of the ElectionSummary computed for each dict of arguments.
+    """
+    return [election._compute_summary(ballots_digest, **arguments) for arguments in summary_arguments]
+
+
+def _compute_summaries(election, ballots_digest, summary_arguments, processes=None):
+    """Computes the results of an Election for several sets of arguments,
+        optionally split across worker processes.
+
+    Each worker process is sent the Election once, with every set of
+    arguments it computes, rather than once for each set of arguments.
+
+    Args:
+        election: Election whose Ballots are counted.
+        ballots_digest: String returned by ballots_hash for the Ballots.
+        summary_arguments: List of dicts of keyword arguments to
+            Election._compute_summary().
+        processes: Integer number of worker processes to split the counts
+            across, or None to run them in this process. Defaults to None.
+
+    Returns:
+        List of the ElectionSummary computed for each dict of arguments.
+    """
+    if processes is None or processes <= 1 or len(summary_arguments) <= 1:
+        return _compute_worker_summaries(election, ballots_digest, summary_arguments)
+
+    processes = min(processes, len(summary_arguments))
+    summaries = [None] * len(summary_arguments)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_compute_worker_summaries, election, ballots_digest,
+                                   summary_arguments[worker::processes])
+                   for worker in range(processes)]
+        for worker, future in enumerate(futures):
+            summaries[worker::processes] = future.result()
+    return summaries
+
+
+class Election:
+    """Election configuration and computation.
+
+    Computing results reads the Ballots and configuration without modifying
+    them, keeping the state of each count local to the computation, so one
+    Election may be shared by threads (or asyncio tasks run in an executor)
+    computing results at the same time.
+
+    Attributes:
+        ballots: List of all Ballots.
+        seats: Number of vacant seats before the election.
+        can_eliminate_no_confidence: Boolean indicating if No Confidence may be
+            eliminated in the election.
+        can_random_tiebreak: Boolean indicating if random elimination may be
+            used for final tiebreaks. Otherwise, the election is halted.
+        name: String representing the name of the election. Defaults to an empty
+            string.
+        random_alphanumeric: String containing the random alphanumeric used for
+            final tiebreaks.
+    """
+
+    def __init__(self, ballots, seats, can_eliminate_no_confidence=True,
+                 can_random_tiebreak=True, name='', random_alphanumeric=None):
+        """Initializes Election with ballots, seats, and configuration data.
+
+        Args:
+            ballots: List of all Ballots.
+            seats: Number of vacant seats before the election.
+            can_eliminate_no_confidence: Boolean indicating if No Confidence may
+                be eliminated in the election.
+            can_random_tiebreak: Boolean indicating if random elimination may be
+                used for final tiebreaks. Otherwise, the election is halted.
+            name: String representing the name of the election.
+            random_alphanumeric: String containing the rcandom alphanumeric used
+                for final tiebreaks.
+        """
+        self.ballots = ballots
+        self.can_eliminate_no_confidence = can_eliminate_no_confidence
+        self.can_random_tiebreak = can_random_tiebreak
+        self.seats = seats
+        self.name = name
+        self.random_alphanumeric = random_alphanumeric
+
+    def droop_quota(self, seats, votes):
+        """Calculates the Droop Quota as the vote threshold.
+
+        This threshold is the minimum number of votes a candidate must receive
+        in order to be elected outright.
+
+        Args:
+            seats_vacant: Integer value of the seats vacant.
+            votes: Float value of the value of votes cast.
+        Returns: An int representing the vote quota
+        """
+        return (float(votes) / (float(seats) + 1.0)) + 1.0
+
+    def pairwise_comparison(self):
+        """Compares every pair of Candidates head-to-head on the Ballots.
+
+        Returns:
+            PairwiseComparison of every Candidate ranked on the Ballots.
+        """
+        return pairwise_comparison(self.ballots)
+
+    def compute_seat_sweep(self, seat_counts, processes=None):
+        """Run the election for each of several seat counts.
+
+        The count for the most seats is run first. Its leading rounds that
+        eliminate Candidates without electing any are the same for fewer seats,
+        whose higher thresholds elect no one either, so the other counts resume
+        after them instead of recounting them.
+
+        Args:
+            seat_counts: Iterable of integer numbers of vacant seats.
+            processes: Integer number of worker processes to run the counts
+                for the other seat counts in, or None to run them in this
+                process. Defaults to None.
+
+        Returns:
+            SeatSweep containing the ElectionSummary for each seat count.
+        """
+        seat_counts = sorted(set(seat_counts))
+        ballots_digest = ballots_hash(self.ballots)
+
+        # Every seat count shares the tiebreak alphanumeric.
+        random_alphanumeric = self.random_alphanumeric
+        if random_alphanumeric is None:
+            random_alphanumeric = ''.join(random.sample(string.printable, len(string.printable)))
+        election = Election(self.ballots, seat_counts[-1],
+                            can_eliminate_no_confidence=self.can_eliminate_no_confidence,
+                            can_random_tiebreak=self.can_random_tiebreak,
+                            name=self.name, random_alphanumeric=random_alphanumeric)
+
+        # Count the most seats, recording the rounds shared by every count.
+        shared_rounds = list()
+        sharing_rounds = True
+        election_rounds = election._iter_rounds(_BallotStore(self.ballots), time.perf_counter(), False, True,
+                                                ballots_digest=ballots_digest)
+        try:
+            while True:
+                election_round = next(election_rounds)
+                sharing_rounds = (sharing_rounds and not election_round.candidates_elected and
+                                  len(election_round.candidates_eliminated) > 0)
+                if sharing_rounds:
+                    shared_rounds.append(election_round)
+        except StopIteration as stop:
+            results_for_seats = {seat_counts[-1]: stop.value}
+
+        summaries = _compute_summaries(election, ballots_digest,
+                                       [{'seats': seats, 'shared_rounds': shared_rounds} for seats in seat_counts[:-1]],
+                                       processes=processes)
+        results_for_seats.update(zip(seat_counts[:-1], summaries))
+
+        return SeatSweep(results_for_seats, shared_rounds=len(shared_rounds))
+
+    def compute_withdrawals(self, candidates=None, processes=None):
+        """Run the election with each of several Candidates withdrawn in turn.
+
+        Every count shares the Ballots, skipping the withdrawn Candidate as if
+        eliminated before the first round rather than copying the Ballots
+        without it.
+
+        Args:
+            candidates: Iterable of Candidates to withdraw, or None for every
+                Candidate ranked on the Ballots except No Confidence. Defaults
+                to None.
+            processes: Integer number of worker processes to run the counts
+                in, or None to run them in this process. Defaults to None.
+
+        Returns:
+            WithdrawalAnalysis containing the ElectionSummary of each count.
+        """
+        ballots_digest = ballots_hash(self.ballots)
+        if candidates is None:
+            candidates = sorted(dict.fromkeys(candidate for ballot in self.ballots for candidate in ballot.candidates),
+                                key=lambda candidate: candidate.uid)
+        candidates = [candidate for candidate in candidates if not isinstance(candidate, NoConfidence)]
+
+        # Every count shares the tiebreak alphanumeric.
+        random_alphanumeric = self.random_alphanumeric
+        if random_alphanumeric is None:
+            random_alphanumeric = ''.join(random.sample(string.printable, len(string.printable)))
+        election = Election(self.ballots, self.seats,
+                            can_eliminate_no_confidence=self.can_eliminate_no_confidence,
+                            can_random_tiebreak=self.can_random_tiebreak,
+                            name=self.name, random_alphanumeric=random_alphanumeric)
+
+        results = election._compute_summary(ballots_digest)
+        summaries = _compute_summaries(election, ballots_digest,
+                                       [{'candidates_withdrawn': {candidate}} for candidate in candidates],
+                                       processes=processes)
+        results_for_withdrawn = dict(zip(candidates, summaries))
+
+        return WithdrawalAnalysis(results, results_for_withdrawn)
+
+    def compute_margin(self, max_recounts=DEFAULT_MARGIN_RECOUNTS):
+        """Estimate the fewest changed Ballots that would alter the Candidates
+            elected.
+
+        The lower bound follows from the rounds of the election: no decision
+        can change until the changed Ballots could make the tallies it compares
+        cross. The witness is searched for by swapping the two Candidates of
+        the closest decisions on more and more of the Ballots preferring one to
+        the other, recounting each time. Swaps that could not beat the best
+        witness are skipped, and each recount is done at most once.
+
+        Args:
+            max_recounts: Integer maximum number of recounts to search for a
+                witness with. Defaults to DEFAULT_MARGIN_RECOUNTS.
+
+        Returns:
+            MarginAnalysis containing the lower bound and any witness.
+        """
+        ballots_digest = ballots_hash(self.ballots)
+
+        # Every count shares the tiebreak alphanumeric.
+        random_alphanumeric = self.random_alphanumeric
+        if random_alphanumeric is None:
+            random_alphanumeric = ''.join(random.sample(string.printable, len(string.printable)))
+        election = Election(self.ballots, self.seats,
+                            can_eliminate_no_confidence=self.can_eliminate_no_confidence,
+                            can_random_tiebreak=self.can_random_tiebreak,
+                            name=self.name, random_alphanumeric=random_alphanumeric)
+
+        # Count the election, keeping the active Ballots at the start of each
+        # run of rounds that eliminate Candidates without electing any.
+        ballot_store = _BallotStore(self.ballots)
+        buckets_for_run = dict()
+        run_started = False
+        election_rounds = election._iter_rounds(ballot_store, time.perf_counter(), False, True,
+                                                ballots_digest=ballots_digest)
+        try:
+            round_index = 0
+            while True:
+                election_round = next(election_rounds)
+                eliminates_only = bool(election_round.candidates_eliminated) and not election_round.candidates_elected
+                if eliminates_only and not run_started:
+                    buckets_for_run[round_index] = ballot_store.copy_buckets()
+                run_started = eliminates_only
+                round_index += 1
+        except StopIteration as stop:
+            results = stop.value
+        segments_for_round = _elimination_segments(results.election_rounds, self.seats,
+                                                   self.can_eliminate_no_confidence, buckets_for_run)
+
+        # Find the fewest Ballots whose change may alter a decision, assuming
+        # the Ballots worth the most are changed.
+        vote_value_for_ballots_changed = [0.0]
+        for vote_value in sorted((ballot.vote_value for ballot in self.ballots), reverse=True):
+            vote_value_for_ballots_changed.append(vote_value_for_ballots_changed[-1] + vote_value)
+        lower_bound = len(self.ballots)
+        lower_bound_round = None
+        fewest_ballots_changed, most_ballots_changed = 1, len(self.ballots)
+        while fewest_ballots_changed <= most_ballots_changed:
+            ballots_changed = (fewest_ballots_changed + most_ballots_changed) // 2
+            round_index = _round_decision_may_change(results.election_rounds, self.seats,
+                                                     self.can_eliminate_no_confidence,
+                                                     vote_value_for_ballots_changed[ballots_changed],
+                                                     segments_for_round=segments_for_round)
+            if round_index is None:
+                fewest_ballots_changed = ballots_changed + 1
+            else:
+                lower_bound, lower_bound_round = ballots_changed, round_index
+                most_ballots_changed = ballots_changed - 1
+
+        # Search the swaps of the closest decisions for a witness, recounting
+        # each change of Ballots at most once.
+        witness = None
+        witness_swap = None
+        candidates_elected_for_change = dict()
+
+        def ballots_with_change(swap, ballot_indices, ballots_changed):
+            ballots = list(self.ballots)
+            for ballot_index in ballot_indices[:ballots_changed]:
+                ballots[ballot_index] = _swapped_ballot(ballots[ballot_index], *swap)
+            return Election(ballots, self.seats, can_eliminate_no_confidence=self.can_eliminate_no_confidence,
+                            can_random_tiebreak=self.can_random_tiebreak, name=self.name,
+                            random_alphanumeric=random_alphanumeric)
+
+        def alters_results(swap, ballot_indices, ballots_changed):
+            key = (swap, ballots_changed)
+            if key not in candidates_elected_for_change:
+                # The hash of the changed Ballots is not needed to compare the
+                # Candidates elected.
+                election = ballots_with_change(swap, ballot_indices, ballots_changed)
+                candidates_elected_for_change[key] = election._compute_summary(ballots_digest).candidates_elected
+            return candidates_elected_for_change[key] != results.candidates_elected
+
+        for margin, candidate, other_candidate in _margin_swaps(results, self.can_eliminate_no_confidence):
+            if len(candidates_elected_for_change) >= max_recounts or (witness is not None and len(witness) == lower_bound):
+                break
+            swap = (candidate, other_candidate)
+
+            # Ballots preferring the Candidate to the other, first choices first.
+            rank_for_ballot_index = dict()
+            for ballot_index, ballot in enumerate(self.ballots):
+                candidates = ballot.candidates[ballot._preferred_active_rank:]
+                if candidate in candidates:
+                    rank = candidates.index(candidate)
+                    if other_candidate not in candidates[:rank]:
+                        rank_for_ballot_index[ballot_index] = rank
+            ballot_indices = sorted(rank_for_ballot_index, key=lambda ballot_index: rank_for_ballot_index[ballot_index])
+
+            most_ballots_changed = len(ballot_indices)
+            if witness is not None:
+                most_ballots_changed = min(most_ballots_changed, len(witness) - 1)
+            if most_ballots_changed < lower_bound:
+                continue
+
+            if witness is not None:
+                # Prune the swap unless changing as many Ballots as could beat
+                # the witness alters the results.
+                if not alters_results(swap, ballot_indices, most_ballots_changed):
+                    continue
+                fewest_ballots_changed, ballots_changed = lower_bound, most_ballots_changed
+            else:
+                # Each swapped first choice moves its vote across the margin,
+                # so start from half the margin and double until the results
+                # change.
+                fewest_ballots_changed = lower_bound
+                ballots_changed = min(max(lower_bound, math.ceil(margin / 2)), most_ballots_changed)
+                while not alters_results(swap, ballot_indices, ballots_changed):
+                    if ballots_changed == most_ballots_changed or len(candidates_elected_for_change) >= max_recounts:
+                        ballots_changed = None
+                        break
+                    fewest_ballots_changed = ballots_changed + 1
+                    ballots_changed = min(2 * ballots_changed, most_ballots_changed)
+                if ballots_changed is None:
+                    continue
+
+            # Narrow down the fewest Ballots changed that alter the results.
+            while fewest_ballots_changed < ballots_changed and len(candidates_elected_for_change) < max_recounts:
+                middle_ballots_changed = (fewest_ballots_changed + ballots_changed) // 2
+                if alters_results(swap, ballot_indices, middle_ballots_changed):
+                    ballots_changed = middle_ballots_changed
+                else:
+                    fewest_ballots_changed = middle_ballots_changed + 1
+
+            witness = [(ballot_index, self.ballots[ballot_index], _swapped_ballot(self.ballots[ballot_index], *swap))
+                       for ballot_index in ballot_indices[:ballots_changed]]
+            witness_swap = (swap, ballot_indices)
+
+        witness_results = None
+        if witness is not None:
+            witness_results = ballots_with_change(witness_swap[0], witness_swap[1], len(witness))._compute_summary(None)
+
+        return MarginAnalysis(results, lower_bound, lower_bound_round=lower_bound_round,
+                              witness=witness, witness_results=witness_results)
+
+    def _compute_summary(self, ballots_digest, seats=None, shared_rounds=(), candidates_withdrawn=()):
+        """Run the election without recording timings, optionally for another
+            seat count, resuming after shared rounds, or with Candidates
+            withdrawn.
+
+        Args:
+            ballots_digest: String returned by ballots_hash for the Ballots.
+            seats: Number of vacant seats before the election, or None for the
+                seats of this Election. Defaults to None.
+            shared_rounds: List of leading ElectionRounds, which elected no
+                Candidates for at least as many seats, to resume the count
+                after. Defaults to no rounds.
+            candidates_withdrawn: Collection of Candidates withdrawn from the
+                election. Defaults to none.
+
+        Returns:
+            ElectionSummary containing the election results and data.
+        """
+        election = Election(self.ballots, seats if seats is not None else self.seats,
+                            can_eliminate_no_confidence=self.can_eliminate_no_confidence,
+                            can_random_tiebreak=self.can_random_tiebreak,
+                            name=self.name, random_alphanumeric=self.random_alphanumeric)
+
+        initial_rounds = list()
+        for shared_round in shared_rounds:
+            initial_round = copy.copy(shared_round)
+            initial_round.threshold = election.droop_quota(election.seats, shared_round.vote_tracker.votes_cast)
+            initial_rounds.append(initial_round)
+
+        election_rounds = election._iter_rounds(_BallotStore(self.ballots), time.perf_counter(), False, True,
+                                                initial_rounds=initial_rounds,
+                                                candidates_withdrawn=candidates_withdrawn,
+                                                ballots_digest=ballots_digest)
+        try:
+            while True:
+                next(election_rounds)
+        except StopIteration as stop:
+            return stop.value
+
+    def compute_results(self, record_timings=False, summary_only=False,
+                        processes=None):
+        """Run the election using the single transferable vote algorithm.
+
+        Args:
+            record_timings: Boolean indicating if the time spent in each phase
+                of each round, and counters of the work done, should be
+                recorded in the ElectionRounds and ElectionResults. Defaults to
+                False.
+            summary_only: Boolean indicating if an ElectionSummary, which does
+                not retain the Ballots, should be returned instead of the full
+                ElectionResults. Defaults to False.
+            processes: Integer number of worker processes to split the Ballots
+                across for counting, or None to count in this process. The
+                results are identical either way. Defaults to None.
+
+        Returns:
+            ElectionResults (or ElectionSummary) containing the election
+                results and data.
+        """
+        election_rounds = self.iter_rounds(record_timings=record_timings,
+                                           summary_only=summary_only,
+                                           processes=processes)
+        try:
+            while True:
+                next(election_rounds)
+        except StopIteration as stop:
+            return stop.value
+
+    def iter_rounds(self, record_timings=False, summary_only=False,
+                    processes=None):
+        """Run the election round by round using the single transferable vote
+            algorithm.
+
+        Each ElectionRound is yielded as soon as its Candidates elected or
+        eliminated are decided. The caller may stop iterating at any point, for
+        example once a Candidate of interest is elected, to end the election
+        early. When iteration completes, the ElectionResults are returned as
+        the value of the StopIteration (e.g. via 'yield from').
+
+        Args:
+            record_timings: Boolean indicating if the time spent in each phase
+                of each round, and counters of the work done, should be
+                recorded in the ElectionRounds and ElectionResults. Defaults to
+                False.
+            summary_only: Boolean indicating if an ElectionSummary, which does
+                not retain the Ballots, should be returned instead of the full
+                ElectionResults. Defaults to False.
+            processes: Integer number of worker processes to split the Ballots
+                across for counting, or None to count in this process. Each
+                round, the workers count their Ballots and this process merges
+                the counts exactly and decides the round, so the results are
+                identical either way. Defaults to None.
+
+        Yields:
+            ElectionRound for each round of the election, in order.
+
+        Returns:
+            ElectionResults (or ElectionSummary) containing the election
+                results and data.
+        """
+        election_start_time = time.perf_counter()
+        if processes is not None and processes > 1:
+            ballot_store = _ShardedBallotStore(self.ballots, processes)
+        else:
+            ballot_store = _BallotStore(self.ballots)
+
+        try:
+            return (yield from self._iter_rounds(ballot_store, election_start_time,
+                                                 record_timings, summary_only))
+        finally:
+            ballot_store.close()
+
+    def _iter_rounds(self, ballot_store, election_start_time, record_timings,
+                     summary_only, initial_rounds=(), candidates_withdrawn=(),
+                     ballots_digest=None):
+        """Run the election round by round, counting the Ballots of a
+            _BallotStore. See iter_rounds().
+
+        Args:
+            ballot_store: _BallotStore (or _ShardedBallotStore) of the Ballots.
+            election_start_time: Float value of time.perf_counter() when the
+                election computation began.
+            record_timings: Boolean indicating if Timings should be recorded.
+            summary_only: Boolean indicating if an ElectionSummary should be
+                returned instead of the full ElectionResults.
+            initial_rounds: List of ElectionRounds already decided, which
+                eliminated Candidates without electing any. No surplus was
+                transferred in them, so the Ballots are counted once with the
+                Candidates eliminated before the last of them to resume the
+                election. Defaults to no rounds.
+            candidates_withdrawn: Collection of Candidates withdrawn from the
+                election, which are skipped on the Ballots as if they were
+                eliminated before the first round. Ballots exhausted by their
+                withdrawal are exhausted in the first round. Defaults to none.
+            ballots_digest: String returned by ballots_hash for the Ballots, or
+                None to compute it for an ElectionSummary.
+
+        Yields:
+            ElectionRound for each round of the election, in order.
+
+        Returns:
+            ElectionResults (or ElectionSummary) containing the election
+                results and data.
+        """
+        if record_timings:
+            election_timings = Timings()
+            phase_start_time = election_start_time
+
+        election_rounds = list(initial_rounds)
+        current_round = len(election_rounds)
+
+        candidates_listed = ballot_store.candidates()
+        votes_exhausted = election_rounds[-1].votes_exhausted if election_rounds else 0.0
+
+        candidates_elected = set()
+        candidates_eliminated = set(candidates_withdrawn)
+        for election_round in election_rounds[:-1]:
+            candidates_eliminated.update(election_round.candidates_eliminated)
+        if candidates_eliminated or election_rounds:
+            round_count = ballot_store.count(candidates_elected, candidates_eliminated)
+            if not election_rounds:
+                votes_exhausted = _sum_votes(round_count.exhausted_ballot_counts)
+        if election_rounds:
+            candidates_eliminated.update(election_rounds[-1].candidates_eliminated)
+
+        ##########
+        # Generate random alphanumeric (if none provided)
+        ##########
+        tiebreak_alphanumeric = self.random_alphanumeric
+        if tiebreak_alphanumeric is None:
+            alphanumeric = string.printable
+            tiebreak_alphanumeric = ''.join(random.sample(alphanumeric,
+                                                          len(alphanumeric)))
+
+        if record_timings:
+            election_timings.add_duration('setup', time.perf_counter() - phase_start_time)
+
+        ##########
+        # STV Algorithm
+        ##########
+        while len(candidates_elected) < self.seats:
+            current_round += 1
+            vote_tracker = VoteTracker()
+
+            election_round = ElectionRound(vote_tracker=vote_tracker)
+            election_rounds.append(election_round)
+
+            if record_timings:
+                timings = Timings()
+                election_round.timings = timings
+                phase_start_time = time.perf_counter()
+
+            ##########
+            # Count and assign votes from ballots
+            ##########
+            round_count = ballot_store.count(candidates_elected, candidates_eliminated)
+
+            # Ensure that vote tracker contains every active candidate, and
+            # cast the votes for each.
+            for candidate in candidates_listed:
+                if (round_count.ballots_listing_candidate.get(candidate, 0) > 0 and
+                        candidate not in candidates_elected and
+                        candidate not in candidates_eliminated):
+                    vote_tracker.cast_vote_for_candidate(
+                            candidate, _sum_votes(round_count.ballot_counts_for_candidate.get(candidate, dict())))
+
+            # Record the exhausted votes and the transfers of votes.
+            votes_exhausted += _sum_votes(round_count.exhausted_ballot_counts)
+            election_round.votes_exhausted = votes_exhausted
+            for source, transferred_ballot_counts in round_count.transferred_ballot_counts.items():
+                election_round.transfers[source] = {target: _sum_votes(ballot_counts)
+                                                    for target, ballot_counts in transferred_ballot_counts.items()}
+
+            if record_timings:
+                timings.increment('ballots_scanned', round_count.ballots_scanned)
+                timings.increment('pointer_advances', round_count.pointer_advances)
+                timings.increment('ballots_exhausted', round_count.ballots_exhausted)
+                phase_end_time = time.perf_counter()
+                timings.add_duration('count', phase_end_time - phase_start_time)
+                phase_start_time = phase_end_time
+
+            # End election if no candidates remain.
+            if len(vote_tracker.candidates()) == 0:
+                yield election_round
+                break
+
+            # If remaining candidates less than or equal to remaining seats
+            # elect candidates whose votes exceed that of No Confidence.
+            seats_vacant = self.seats - len(candidates_elected)
+            if len(vote_tracker.candidates()) <= seats_vacant:
+                # Determine the number of votes for No Confidence.
+                nc_vote = 0
+                for candidate in vote_tracker.candidates():
+                    if isinstance(candidate, NoConfidence):
+                        nc_vote = vote_tracker.votes_for_candidate(candidate)
+                        break
+
+                # Elect all candidates with more votes than No Confidence and end election.
+                candidates_to_elect = vote_tracker.candidates_reaching_threshold(vote_tracker.candidates(), nc_vote)
+                candidates_elected.update(candidates_to_elect)
+                election_round.candidates_elected = candidates_to_elect
+                if record_timings:
+                    timings.add_duration('threshold', time.perf_counter() - phase_start_time)
+                yield election_round
+                break
+
+            ##########
+            # Calculate threshold
+            ##########
+            # Threshold changes per round based on votes cast and seats vacant.
+            threshold = self.droop_quota(seats_vacant, vote_tracker.votes_cast)
+            election_round.threshold = threshold
+
+            ##########
+            # If winners, transfer surplus, move to next round.
+            ##########
+            candidates_to_elect = vote_tracker.candidates_reaching_threshold(vote_tracker.candidates(), threshold)
+            candidates_elected.update(candidates_to_elect)
+            election_round.candidates_elected = candidates_to_elect
+
+            if record_timings:
+                phase_end_time = time.perf_counter()
+                timings.add_duration('threshold', phase_end_time - phase_start_time)
+                phase_start_time = phase_end_time
+
+            if len(candidates_to_elect) > 0:
+                no_confidence_elected = False
+                vote_multiplier_for_candidate = dict()
+                for candidate in candidates_to_elect:
+                    # Calculate vote surplus
+                    votes = vote_tracker.votes_for_candidate(candidate)
+                    # A candidate meeting the threshold within the tolerance
+                    # has no surplus.
+                    surplus = max(votes - threshold, 0.0)
+
+                    # Assign fractional value to ballots.
+                    vote_multiplier_for_candidate[candidate] = surplus / votes
+
+                    # Check if elected candidate is No Confidence.
+                    if isinstance(candidate, NoConfidence):
+                        no_confidence_elected = True
+
+                ballots_transferred = ballot_store.transfer_surplus(vote_multiplier_for_candidate)
+                if record_timings:
+                    timings.increment('transfers', ballots_transferred)
+
+                if record_timings:
+                    timings.add_duration('surplus_transfer', time.perf_counter() - phase_start_time)
+
+                yield election_round
+
+                # If No Confidence was elected, end the election.
+                if no_confidence_elected:
+                    break
+
+                # Move on to the next round after transferring surplus.
+                continue
+
+            ##########
+            # Eliminate loser, transfer votes
+            ##########
+            # Find the candidate(s) (excluding No Confidence) with the fewest
+            # votes in the current round.
+            candidates_eligible_to_eliminate = set()
+            candidates_to_eliminate = set()
+            for candidate in vote_tracker.candidates():
+                if self.can_eliminate_no_confidence or not isinstance(candidate, NoConfidence):
+                    candidates_eligible_to_eliminate.add(candidate)
+
+            candidates_to_eliminate = vote_tracker.candidates_with_fewest_votes(candidates_eligible_to_eliminate)
+
+            # If multiple candidates have the fewest votes in a round, and their
+            # combined vote total is less than that of the next-highest
+            # candidate, eliminate all of the tied candidates. Otherwise, a
+            # tiebreak is required to select the candidate to eliminate.
+            tiebreak_required = False
+            if len(candidates_to_eliminate) > 1:
+                tied_combined_vote_value = len(candidates_to_eliminate) * vote_tracker.votes_for_candidate(next(iter(candidates_to_eliminate)))
                 next_highest_candidates = vote_tracker.candidates_with_fewest_votes(candidates_eligible_to_eliminate.difference(candidates_to_eliminate))
                 if len(next_highest_candidates) > 0:
                     next_highest_vote_value = vote_tracker.votes_for_candidate(next(iter(next_highest_candidates)))
@@ -689,69 +2832,48 @@ class Election:
                 tiebreak_required = (tied_combined_vote_value >=
                                      next_highest_vote_value)
 
+            if record_timings:
+                phase_end_time = time.perf_counter()
+                timings.add_duration('elimination', phase_end_time - phase_start_time)
+                phase_start_time = phase_end_time
+
             # If there is still a tie for elimination, choose the candidate with
             # the fewest votes in the previous round. Repeat if multiple
             # candidates remain tied with the fewest votes.
             if tiebreak_required:
                 previous_round = current_round - 1
-                while(len(candidates_to_eliminate) > 1 and previous_round >= 0):
+                while (len(candidates_to_eliminate) > 1 and previous_round >= 0):
                     candidates_to_eliminate = election_rounds[previous_round].vote_tracker.candidates_with_fewest_votes(candidates_to_eliminate)
                     previous_round -= 1
 
                 tiebreak_required = len(candidates_to_eliminate) > 1
 
+                if record_timings:
+                    phase_end_time = time.perf_counter()
+                    timings.add_duration('tiebreak_backward', phase_end_time - phase_start_time)
+                    phase_start_time = phase_end_time
+
             # If there is still a tie for elimination, choose the candidate with
             # the fewest votes in ballots' next rank. Repeat is multiple
             # candidates remain tied with the fewest votes.
             if tiebreak_required:
-                ballots_active_tiebreak = copy.deepcopy(ballots_active)
-                ballots_exhausted_tiebreak = copy.deepcopy(ballots_exhausted)
-                while(len(candidates_to_eliminate) > 1 and len(ballots_active_tiebreak) > 1):
+                ballots_active_tiebreak = ballot_store.begin_tiebreak()
+                while (len(candidates_to_eliminate) > 1 and ballots_active_tiebreak > 1):
+                    ballot_counts_for_candidate, ballots_active_tiebreak = ballot_store.count_tiebreak(
+                            candidates_elected, candidates_eliminated, self.can_eliminate_no_confidence)
                     forward_vote_tracker = VoteTracker()
-                    ballots_to_exhaust_tiebreak = list()
-                    for ballot in ballots_active_tiebreak:
-                        # Determine preferred active candidate.
-                        if (self.can_eliminate_no_confidence or not isinstance(ballot.preferred_active_candidate(), NoConfidence)):
-                            ballot.eliminate_preferred_candidate()
-
-                        while True:
-                            # Update ballots
-                            candidate = ballot.preferred_active_candidate()
-                            if (candidate is None or
-                                    candidate not in candidates_elected and
-                                    candidate not in candidates_eliminated):
-                                break
-
-                            # Otherwise, remove the candidate from the ballot.
-                            ballot.eliminate_preferred_candidate()
-
-                        # Ensure that vote tracker contains every active candidate
-                        for candidate in ballot.candidates:
-                            if (candidate not in candidates_elected and
-                                    candidate not in candidates_eliminated):
-                                forward_vote_tracker.cast_vote_for_candidate(candidate, 0.0)
-
-                        candidate = ballot.preferred_active_candidate()
-                        # If ballot is exhausted, add it to exhausted ballots.
-                        if candidate is None:
-                            ballots_to_exhaust_tiebreak.append(ballot)
-                        # Remove No Confidence ballots if not eligible to be
-                        # eliminated.
-                        elif not self.can_eliminate_no_confidence and isinstance(candidate, NoConfidence):
-                            ballots_to_exhaust_tiebreak.append(ballot)
-
-                        # Otherwise, record the ballot and cast its vote.
-                        else:
-                            forward_vote_tracker.cast_vote_for_candidate(candidate, vote_value=ballot.vote_value)
-
+                    for candidate in candidates_to_eliminate:
+                        forward_vote_tracker.cast_vote_for_candidate(
+                                candidate, _sum_votes(ballot_counts_for_candidate.get(candidate, dict())))
                     candidates_to_eliminate = forward_vote_tracker.candidates_with_fewest_votes(candidates_to_eliminate)
-                    # Remove exhausted ballots
-                    for ballot in ballots_to_exhaust_tiebreak:
-                        ballots_active_tiebreak.remove(ballot)
-                    ballots_exhausted_tiebreak.extend(ballots_to_exhaust)
 
                 tiebreak_required = len(candidates_to_eliminate) > 1
 
+                if record_timings:
+                    phase_end_time = time.perf_counter()
+                    timings.add_duration('tiebreak_forward', phase_end_time - phase_start_time)
+                    phase_start_time = phase_end_time
+
             # If there is still a tie for elimination, choose a random candidate
             # according to the random tiebreak alphanumeric.
             random_tiebreak_occurred = False
@@ -760,6 +2882,7 @@ class Election:
 
                 # If random tiebreaks are not allowed, end the election.
                 if not self.can_random_tiebreak:
+                    yield election_round
                     break
 
                 # Sort the candidates by uid according to the random
@@ -772,15 +2895,35 @@ class Election:
                         candidates_to_eliminate = [candidate]
                         break
 
+                if record_timings:
+                    timings.add_duration('tiebreak_random', time.perf_counter() - phase_start_time)
+
             # Eliminate candidates_to_eliminate.
             candidates_eliminated.update(candidates_to_eliminate)
             election_round.candidates_eliminated = candidates_to_eliminate
             election_round.random_tiebreak_occurred = random_tiebreak_occurred
+            yield election_round
 
         ##########
         # Election is over; return results.
         ##########
+        if record_timings:
+            for election_round in election_rounds:
+                election_timings.update(election_round.timings)
+            election_timings.add_duration('total', time.perf_counter() - election_start_time)
+        else:
+            election_timings = None
+
+        if summary_only:
+            if ballots_digest is None:
+                ballots_digest = ballots_hash(self.ballots)
+            return ElectionSummary(len(self.ballots), ballots_digest,
+                                   candidates_elected, election_rounds,
+                                   tiebreak_alphanumeric, self.seats,
+                                   name=self.name, timings=election_timings)
+
         results = ElectionResults(self.ballots, candidates_elected,
                                   election_rounds, tiebreak_alphanumeric,
-                                  self.seats, name=self.name)
+                                  self.seats, name=self.name,
+                                  timings=election_timings)
         return results
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""Provides an on-disk cache of election results."""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import election
+from election import ballots_hash
+
+__author__ = "Devin Gund"
+__copyright__ = "Copyright 2017, Carnegie Mellon University Undergraduate Student Senate"
+__credits__ = ["Sushain Cherivirala"]
+__license__ = "GPLv3"
+__status__ = "Production"
+
+# Default maximum total size of the cache in bytes
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+# File extension of cached results
+CACHE_EXTENSION = '.results'
+
+
+class ResultsCache:
+    """Directory of ElectionResults keyed by ballots and configuration.
+
+    Each entry is stored in its own file named by its key. When the total size
+    of the entries exceeds the maximum size, the least recently used entries
+    are evicted.
+
+    Attributes:
+        directory: The filepath of the cache directory.
+        max_size: Integer maximum total size of the entries in bytes.
+    """
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        """Initializes ResultsCache, creating the directory if needed.
+
+        Args:
+            directory: The filepath of the cache directory.
+            max_size: Integer maximum total size of the entries in bytes.
+                Defaults to DEFAULT_MAX_SIZE.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(ballots, seats, random_alphanumeric=None,
+            can_eliminate_no_confidence=True, can_random_tiebreak=True):
+        """Returns the key of the results of an election.
+
+        The key depends on the Ballots regardless of their order, the
+        configuration of the election, and the version of the election engine.
+
+        Args:
+            ballots: List of Ballots.
+            seats: Number of vacant seats before the election.
+            random_alphanumeric: String containing the random alphanumeric used
+                for final tiebreaks, or None.
+            can_eliminate_no_confidence: Boolean indicating if No Confidence may
+                be eliminated in the election.
+            can_random_tiebreak: Boolean indicating if random elimination may be
+                used for final tiebreaks.
+
+        Returns:
+            String containing the SHA-256 hex digest of the key.
+        """
+        configuration = (election.__version__, ballots_hash(ballots), seats,
+                         random_alphanumeric, can_eliminate_no_confidence,
+                         can_random_tiebreak)
+        return hashlib.sha256(repr(configuration).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        """Returns the filepath of an entry.
+
+        Args:
+            key: String key of the entry.
+
+        Returns:
+            String filepath of the entry.
+        """
+        return os.path.join(self.directory, key + CACHE_EXTENSION)
+
+    def get(self, key):
+        """Returns the cached results for a key.
+
+        Args:
+            key: String key of the results.
+
+        Returns:
+            ElectionResults stored for the key, or None if there are none or
+                the entry cannot be read.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                results = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            return None
+        return results
+
+    def put(self, key, results):
+        """Stores results for a key, evicting entries beyond the maximum size.
+
+        Args:
+            key: String key of the results.
+            results: ElectionResults to store.
+        """
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                pickle.dump(results, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the total size of the
+            entries is at most the maximum size."""
+        entries = list()
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(CACHE_EXTENSION):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
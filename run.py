@@ -3,11 +3,38 @@
 """Provides an interface to input ballots and run elections."""
 
 import argparse
+import bz2
+import concurrent.futures
+import cProfile
 import csv
+import gzip
+import hashlib
+import http.client
+import io
+import itertools
+import json
+import lzma
+import os
 import re
+import socket
+import sys
+import tracemalloc
+import urllib.parse
 import urllib.request
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 from election import Ballot, Candidate, Election, NoConfidence
+from results_cache import DEFAULT_MAX_SIZE, ResultsCache
+from validation import ISSUES, POLICIES, policy_for_issue_from_specs, validate_ballots
 
 __author__ = "Devin Gund"
 __copyright__ = "Copyright 2017, Carnegie Mellon University Undergraduate Student Senate"
@@ -21,6 +48,57 @@ NC_STRING = 'No Confidence'
 # String representing the abbreviated input for No Confidence
 NC_STRING_SHORT = 'NC'
 
+# Number of allocation sites reported in a memory profile
+MEMORY_PROFILE_LIMIT = 25
+
+# Suffix of the sidecar file caching the parsed ballots of a ballot file
+SIDECAR_SUFFIX = '.ballots.json'
+
+# Version of the sidecar file format
+SIDECAR_VERSION = 2
+
+# Functions opening compressed files as text, by compression file extension
+DECOMPRESSORS = {
+    '.gz': gzip.open,
+    '.bz2': bz2.open,
+    '.xz': lzma.open,
+    '.lzma': lzma.open,
+    '.zst': zstandard.open if zstandard is not None else None,
+}
+
+# Regular expression matching the input format 'uid (name)' for a Candidate
+CANDIDATE_NAME_REGEX = re.compile(r'(.*?)\s*\((.*?)\)')
+
+# Number of lines read at a time from a ballot file
+BLOCK_LINES = 16384
+
+# Number of characters read from the head of a CSV file to sniff its dialect
+SNIFF_SIZE = 1024
+
+# Number of times a download is resumed after being interrupted
+DOWNLOAD_RETRIES = 5
+
+# Extension of ballot files in the BLT format
+BLT_EXTENSION = '.blt'
+
+# Extension of a NumPy ranking matrix
+NPY_EXTENSION = '.npy'
+
+# Extension of a NumPy bundle of a ranking matrix, weights, and candidates
+NPZ_EXTENSION = '.npz'
+
+# Rank matrix tie rule ending a ranking before Candidates sharing a rank
+TIES_TRUNCATE = 'truncate'
+
+# Rank matrix tie rule skipping Candidates sharing a rank
+TIES_SKIP = 'skip'
+
+# Rank matrix tie rule ranking Candidates sharing a rank in column order
+TIES_COLUMN = 'column'
+
+# Rank matrix tie rules
+TIE_RULES = [TIES_TRUNCATE, TIES_SKIP, TIES_COLUMN]
+
 
 def input_string_is_no_confidence(candidate_input):
     """Checks if an input string represents No Confidence.
@@ -32,8 +110,7 @@ def input_string_is_no_confidence(candidate_input):
     Returns:
         Boolean indicating if the input string represents No Confidence or not.
     """
-    return (candidate_input.lower() == NC_STRING.lower() or
-            candidate_input.lower() == NC_STRING_SHORT.lower())
+    return candidate_input.lower() in (NC_STRING.lower(), NC_STRING_SHORT.lower())
 
 
 def candidate_from_input(candidate_input):
@@ -49,9 +126,7 @@ def candidate_from_input(candidate_input):
     if input_string_is_no_confidence(candidate_input):
         return NoConfidence()
     else:
-        expr = '(.*?)\s*\((.*?)\)'
-        regex = re.compile(expr)
-        result = regex.match(candidate_input)
+        result = CANDIDATE_NAME_REGEX.match(candidate_input) if '(' in candidate_input else None
         if result is not None:
             uid = result.group(1)
             name = result.group(2)
@@ -61,6 +136,24 @@ def candidate_from_input(candidate_input):
         return Candidate(uid, name=name)
 
 
+def input_from_candidate(candidate):
+    """Returns the input string representing a Candidate.
+
+    Args:
+        candidate: Candidate to represent.
+
+    Returns:
+        String in the format 'uid' or 'uid (name)', parsed by
+            candidate_from_input() as the Candidate.
+    """
+    if isinstance(candidate, NoConfidence):
+        return NC_STRING
+    elif candidate.name is None:
+        return candidate.uid
+    else:
+        return '{} ({})'.format(candidate.uid, candidate.name)
+
+
 def ballot_from_candidate_inputs(candidate_inputs):
     """Returns a Ballot of Candidates representing the input strings.
 
@@ -82,6 +175,105 @@ def ballot_from_candidate_inputs(candidate_inputs):
     return ballot
 
 
+def ballot_from_candidate_input_row(row, candidate_for_input, strip=False):
+    """Returns a Ballot of Candidates representing a row of input strings.
+
+    Args:
+        row: List of Strings representing user input for a Candidate. The
+            expected format is 'uid' or optionally 'uid (name)'.
+        candidate_for_input: Dict mapping input strings already parsed to their
+            Candidates, or None for the empty input ending a Ballot. Input
+            strings parsed for the row are added to it.
+        strip: Boolean indicating if whitespace around the input strings should
+            be ignored. Defaults to False.
+
+    Returns:
+        Ballot representing the input Candidates.
+    """
+    candidates = list()
+    for candidate_input in row:
+        if candidate_input in candidate_for_input:
+            candidate = candidate_for_input[candidate_input]
+        else:
+            stripped_input = candidate_input.strip() if strip else candidate_input
+            candidate = candidate_from_input(stripped_input) if stripped_input else None
+            candidate_for_input[candidate_input] = candidate
+        if candidate is None:
+            break
+        candidates.append(candidate)
+    return Ballot(candidates=candidates)
+
+
+def ballots_from_candidate_input_rows(rows, strip=False):
+    """Returns Ballots of Candidates representing rows of input strings.
+
+    Each distinct input string is parsed once, and its Candidate is shared by
+    every Ballot it appears on.
+
+    Args:
+        rows: Iterable of lists of Strings representing user input for a
+            Candidate. The expected format is 'uid' or optionally 'uid (name)'.
+        strip: Boolean indicating if whitespace around the input strings should
+            be ignored. Defaults to False.
+
+    Returns:
+        List of Ballots representing the input Candidates.
+    """
+    candidate_for_input = dict()
+    return [ballot_from_candidate_input_row(row, candidate_for_input, strip=strip) for row in rows]
+
+
+def seat_counts_from_input(seat_counts_input):
+    """Returns the seat counts represented by an input string.
+
+    Args:
+        seat_counts_input: String of comma-separated seat counts or inclusive
+            ranges of seat counts, such as '10-13' or '1,3,5-7'.
+
+    Returns:
+        Sorted list of integer seat counts.
+
+    Raises:
+        ValueError: The input string is not a list of seat counts.
+    """
+    seat_counts = set()
+    for part in seat_counts_input.split(','):
+        first, _, last = part.partition('-')
+        seat_counts.update(range(int(first), int(last or first) + 1))
+    return sorted(seat_counts)
+
+
+def races_from_input(race_inputs, seats):
+    """Returns the races represented by input strings.
+
+    Args:
+        race_inputs: List of Strings, each 'name=columns' or
+            'name:seats=columns', where columns are the comma-separated
+            1-based numbers or inclusive ranges of numbers of the CSV columns
+            ranking the race's candidates, such as 'Senate:12=4-15'.
+        seats: Number of seats of races not giving their own.
+
+    Returns:
+        Dict mapping the String name of each race to a tuple of its integer
+            number of seats and the sorted list of the 0-based indices of its
+            columns.
+
+    Raises:
+        ValueError: An input string is not a race.
+    """
+    columns_for_race = dict()
+    for race_input in race_inputs:
+        race, separator, columns_input = race_input.rpartition('=')
+        name, _, race_seats = race.partition(':')
+        if not separator or not name:
+            raise ValueError('Invalid race {}. Expects NAME[:SEATS]=COLUMNS.'.format(race_input))
+        columns = [column - 1 for column in seat_counts_from_input(columns_input)]
+        if columns[0] < 0:
+            raise ValueError('Invalid race {}. Columns are numbered from 1.'.format(race_input))
+        columns_for_race[name] = (int(race_seats) if race_seats else seats, columns)
+    return columns_for_race
+
+
 def ballots_from_input():
     """Return Ballots from command-line user input.
 
@@ -127,31 +319,534 @@ def ballots_from_input():
             ballot_number += 1
 
 
-def ballots_from_csv(filename):
+def ballots_from_csv(filename, delimiter=None):
     """Return Ballots from CSV user input.
 
     Args:
         filename: The filepath of the CSV file containing the user input.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            file. Defaults to None.
 
     Returns:
         List of Ballots representing user input.
     """
-    ballots = list()
     with open(filename) as f:
-        sniffer = csv.Sniffer()
-        dialect = csv.Sniffer().sniff(f.read(1024))
-        f.seek(0)
-        has_header = sniffer.has_header(f.read(1024))
-        f.seek(0)
-        reader = csv.reader(f, dialect)
-        for row in reader:
-            if reader.line_num > 0 or not has_header:
-                ballot = ballot_from_candidate_inputs(row)
-                ballots.append(ballot)
-    f.close()
+        return ballots_from_csv_stream(f, delimiter=delimiter)
+
+
+def csv_rows_from_lines(lines, dialect):
+    """Returns the rows of CSV lines, splitting lines without quoting directly.
+
+    Lines are read in blocks. Blocks without quote or escape characters are
+    split on the delimiter, and the rest of the lines from the first block with
+    them are read with a csv.reader.
+
+    Args:
+        lines: Iterator of lines of CSV.
+        dialect: csv.Dialect of the lines.
+
+    Returns:
+        Iterator of lists of Strings in the cells of each row.
+    """
+    special_characters = {character for character in (dialect.quotechar, dialect.escapechar)
+                          if character is not None}
+    if dialect.skipinitialspace or dialect.quoting == csv.QUOTE_NONE:
+        special_characters.add(None)
+
+    for block in iter(lambda: list(itertools.islice(lines, BLOCK_LINES)), []):
+        text = ''.join(block)
+        if None in special_characters or any(character in text for character in special_characters):
+            yield from csv.reader(itertools.chain(block, lines), dialect)
+            return
+        for line in block:
+            line = line.rstrip('\r\n')
+            yield line.split(dialect.delimiter) if line else []
+
+
+def csv_rows_from_stream(f, delimiter=None):
+    """Returns the rows of CSV read from a text stream.
+
+    The stream is read once from start to end, so it need not be seekable. Its
+    dialect is sniffed from the head of the stream unless the delimiter is
+    given.
+
+    Args:
+        f: Readable text file object containing the CSV.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            stream. Defaults to None.
+
+    Returns:
+        Iterator of lists of Strings in the cells of each row.
+    """
+    if delimiter is None:
+        head = f.read(SNIFF_SIZE)
+        dialect = csv.Sniffer().sniff(head)
+        lines = itertools.chain(io.StringIO(head + f.readline()), f)
+    else:
+        dialect = csv.excel()
+        dialect.delimiter = delimiter
+        lines = iter(f)
+    return csv_rows_from_lines(lines, dialect)
+
+
+def ballots_from_csv_stream(f, delimiter=None):
+    """Return Ballots from CSV user input read from a text stream.
+
+    Args:
+        f: Readable text file object containing the user input.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            stream. Defaults to None.
+
+    Returns:
+        List of Ballots representing user input.
+    """
+    return ballots_from_candidate_input_rows(csv_rows_from_stream(f, delimiter=delimiter))
+
+
+def vote_value_from_input(vote_value_input):
+    """Returns the vote value represented by an input string.
+
+    Args:
+        vote_value_input: String of a non-negative number, such as '12' or
+            '0.5'.
+
+    Returns:
+        Float value of the vote.
+
+    Raises:
+        ValueError: The input string is not a non-negative number.
+    """
+    vote_value = float(vote_value_input)
+    if not vote_value >= 0.0:
+        raise ValueError('Invalid vote value {}.'.format(vote_value_input))
+    return vote_value
+
+
+def input_from_vote_value(vote_value):
+    """Returns the input string representing a vote value.
+
+    Args:
+        vote_value: Float value of the vote.
+
+    Returns:
+        String of the vote value, without a fractional part if it is whole.
+    """
+    return str(int(vote_value)) if float(vote_value).is_integer() else repr(float(vote_value))
+
+
+def aggregate_rankings(ballots):
+    """Returns the total vote value of each distinct ranking of Ballots.
+
+    Args:
+        ballots: List of Ballots.
+
+    Returns:
+        Tuple of the list of Candidates ranked on the Ballots, in order of
+            first appearance, and a dict mapping each distinct ranking, as a
+            tuple of indices into the Candidates, to the float total vote
+            value of the Ballots ranking them so, in order of first
+            appearance.
+    """
+    candidate_indices = dict()
+    candidates = list()
+    vote_value_for_ranking = dict()
+    for ballot in ballots:
+        ranking = list()
+        for candidate in ballot.candidates:
+            if candidate not in candidate_indices:
+                candidate_indices[candidate] = len(candidates)
+                candidates.append(candidate)
+            ranking.append(candidate_indices[candidate])
+        ranking = tuple(ranking)
+        vote_value_for_ranking[ranking] = vote_value_for_ranking.get(ranking, 0.0) + ballot.vote_value
+    return candidates, vote_value_for_ranking
+
+
+def ballots_from_weighted_csv_stream(f, delimiter=','):
+    """Return Ballots from weighted CSV user input read from a text stream.
+
+    Each row is 'count,rank1,rank2,...', and is read as a single Ballot with
+    the count as its vote value rather than as count Ballots.
+
+    Args:
+        f: Readable text file object containing the user input.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            stream. Defaults to a comma, as written by write_weighted_csv().
+
+    Returns:
+        List of Ballots representing user input.
+
+    Raises:
+        ValueError: A row does not begin with a count.
+    """
+    candidate_for_input = dict()
+    ballots = list()
+    for row in csv_rows_from_stream(f, delimiter=delimiter):
+        if row:
+            ballot = ballot_from_candidate_input_row(row[1:], candidate_for_input)
+            ballot.vote_value = vote_value_from_input(row[0])
+            ballots.append(ballot)
+    return ballots
+
+
+def write_weighted_csv(f, ballots):
+    """Writes Ballots as weighted CSV, with a row 'count,rank1,rank2,...' for
+        each distinct ranking.
+
+    Args:
+        f: Writable text file object to write the CSV to.
+        ballots: List of Ballots.
+    """
+    candidates, vote_value_for_ranking = aggregate_rankings(ballots)
+    candidate_inputs = [input_from_candidate(candidate) for candidate in candidates]
+    writer = csv.writer(f, lineterminator='\n')
+    for ranking, vote_value in vote_value_for_ranking.items():
+        writer.writerow([input_from_vote_value(vote_value)] + [candidate_inputs[index] for index in ranking])
+
+
+def blt_from_stream(f):
+    """Returns the ballots, seats, and title of a BLT file read from a text
+        stream.
+
+    A BLT file begins with a line of the numbers of candidates and seats, and
+    optionally a line of the negated numbers of withdrawn candidates. Each
+    ballot line follows, with a weight, the numbers of the candidates in
+    order of preferred rank, and 0, and a line of 0 ends them. A quoted line
+    naming each candidate and one titling the election end the file. Withdrawn
+    candidates are left off the Ballots.
+
+    Args:
+        f: Readable text file object containing the BLT file.
+
+    Returns:
+        Tuple of the list of Ballots, each with the weight of its line as its
+            vote value, the integer number of seats, and the String title of
+            the election.
+
+    Raises:
+        ValueError: The file is not in the BLT format.
+    """
+    lines = (line.strip() for line in f)
+    lines = (line for line in lines if line and not line.startswith('#'))
+    try:
+        candidate_count, seats = map(int, next(lines).split())
+
+        rankings = list()
+        candidates_withdrawn = set()
+        for line in lines:
+            tokens = line.split()
+            if tokens[0].startswith('-'):
+                candidates_withdrawn.update(-int(token) for token in tokens)
+                continue
+            if tokens[0].startswith('('):
+                tokens = tokens[1:]
+            if tokens == ['0']:
+                break
+            ranking = [int(token) for token in tokens[1:-1] if token != '-']
+            if tokens[-1] != '0' or not all(1 <= number <= candidate_count for number in ranking):
+                raise ValueError('Invalid ballot line {}'.format(line))
+            rankings.append((vote_value_from_input(tokens[0]), ranking))
+
+        candidates = [candidate_from_input(next(lines).strip('"')) for _ in range(candidate_count)]
+        title = next(lines, '').strip('"')
+    except (StopIteration, ValueError) as error:
+        raise ValueError('Invalid BLT file: {}'.format(str(error) or 'unexpected end of file'))
+
+    ballots = list()
+    for vote_value, ranking in rankings:
+        ballots.append(Ballot(candidates=[candidates[number - 1] for number in ranking
+                                          if number not in candidates_withdrawn],
+                              vote_value=vote_value))
+    return ballots, seats, title
+
+
+def ballots_from_blt_stream(f):
+    """Return Ballots from a BLT file read from a text stream. See
+        blt_from_stream().
+
+    Args:
+        f: Readable text file object containing the BLT file.
+
+    Returns:
+        List of Ballots representing user input.
+    """
+    ballots, _, _ = blt_from_stream(f)
+    return ballots
+
+
+def write_blt(f, ballots, seats, title=''):
+    """Writes Ballots as a BLT file, with a line for each distinct ranking.
+
+    Args:
+        f: Writable text file object to write the BLT file to.
+        ballots: List of Ballots.
+        seats: Number of seats of the election.
+        title: String title of the election. Defaults to an empty string.
+    """
+    candidates, vote_value_for_ranking = aggregate_rankings(ballots)
+    f.write('{} {}\n'.format(len(candidates), seats))
+    for ranking, vote_value in vote_value_for_ranking.items():
+        f.write(' '.join([input_from_vote_value(vote_value)] + [str(index + 1) for index in ranking] + ['0']))
+        f.write('\n')
+    f.write('0\n')
+    for candidate in candidates:
+        f.write('"{}"\n'.format(input_from_candidate(candidate)))
+    f.write('"{}"\n'.format(title))
+
+
+def ballots_from_numpy(filename):
+    """Return Ballots from a NumPy ranking matrix.
+
+    Each row of the integer matrix is a Ballot, with the index of the
+    Candidate of each rank in order of preferred rank. A negative index ends
+    the ranking, so shorter rankings are padded with -1. An .npy file holds
+    the matrix alone and is memory-mapped, and its Candidates are numbered
+    from 1. An .npz file holds the matrix as 'rankings', and may hold the
+    float vote value of each row as 'weights' and the Candidate of each index
+    as 'candidates'. Each distinct row is ranked once, and its ranking is
+    shared by every Ballot with that row.
+
+    Args:
+        filename: The filepath of the .npy or .npz file.
+
+    Returns:
+        List of Ballots representing the rankings.
+
+    Raises:
+        ValueError: The numpy package is not installed, or the file does not
+            hold a valid ranking matrix.
+    """
+    _, extension = os.path.splitext(filename.lower())
+    if numpy is None:
+        raise ValueError('Reading {} files requires the numpy package.'.format(extension))
+
+    weights = None
+    candidates = None
+    if extension == NPZ_EXTENSION:
+        with numpy.load(filename, allow_pickle=False) as bundle:
+            if 'rankings' not in bundle.files:
+                raise ValueError('Invalid ranking matrix: {} has no rankings'.format(filename))
+            rankings = bundle['rankings']
+            if 'weights' in bundle.files:
+                weights = bundle['weights']
+            if 'candidates' in bundle.files:
+                candidates = [candidate_from_input(str(candidate_input))
+                              for candidate_input in bundle['candidates'].tolist()]
+    else:
+        rankings = numpy.load(filename, mmap_mode='r', allow_pickle=False)
+
+    if rankings.ndim != 2 or not numpy.issubdtype(rankings.dtype, numpy.integer):
+        raise ValueError('Invalid ranking matrix: expected a 2-D integer matrix, '
+                         'found {}-D {}'.format(rankings.ndim, rankings.dtype))
+    if weights is not None and weights.shape != (rankings.shape[0],):
+        raise ValueError('Invalid ranking matrix: expected {} weights, '
+                         'found {}'.format(rankings.shape[0], weights.size))
+    if rankings.shape[0] == 0:
+        return list()
+
+    distinct_rankings, row_rankings = numpy.unique(rankings, axis=0, return_inverse=True)
+    if candidates is None:
+        candidates = [candidate_from_input(str(number))
+                      for number in range(1, int(distinct_rankings.max(initial=-1)) + 2)]
+    if distinct_rankings.size and distinct_rankings.max() >= len(candidates):
+        raise ValueError('Invalid ranking matrix: candidate index {} of {} '
+                         'candidates'.format(distinct_rankings.max(), len(candidates)))
+
+    ranking_for_row = list()
+    for row in distinct_rankings.tolist():
+        ranking = list()
+        for index in row:
+            if index < 0:
+                break
+            ranking.append(candidates[index])
+        ranking_for_row.append(ranking)
+
+    row_rankings = row_rankings.reshape(-1).tolist()
+    if weights is None:
+        return [Ballot(candidates=ranking_for_row[row]) for row in row_rankings]
+    return [Ballot(candidates=ranking_for_row[row], vote_value=vote_value)
+            for row, vote_value in zip(row_rankings, weights.astype(float).tolist())]
+
+
+def write_numpy(f, ballots):
+    """Writes Ballots as an .npz bundle, with a row of the ranking matrix and
+        a weight for each distinct ranking. See ballots_from_numpy().
+
+    Args:
+        f: Writable binary file object to write the bundle to.
+        ballots: List of Ballots.
+
+    Raises:
+        ValueError: The numpy package is not installed.
+    """
+    if numpy is None:
+        raise ValueError('Writing {} files requires the numpy package.'.format(NPZ_EXTENSION))
+    candidates, vote_value_for_ranking = aggregate_rankings(ballots)
+    rank_count = max(map(len, vote_value_for_ranking), default=0)
+    rankings = numpy.full((len(vote_value_for_ranking), rank_count), -1, dtype=numpy.int32)
+    for row, ranking in enumerate(vote_value_for_ranking):
+        rankings[row, :len(ranking)] = ranking
+    numpy.savez(f, rankings=rankings,
+                weights=numpy.array(list(vote_value_for_ranking.values()), dtype=float),
+                candidates=numpy.array([input_from_candidate(candidate) for candidate in candidates], dtype=str))
+
+
+def ranking_from_rank_cells(candidates, cells, ties=TIES_TRUNCATE):
+    """Returns the ranking of Candidates given a rank in the cells of a row of
+        a rank matrix.
+
+    Blank cells leave their Candidates unranked, and gaps between ranks are
+    ignored.
+
+    Args:
+        candidates: List of the Candidates of the columns.
+        cells: List of Strings in the cells of the row, each blank or an
+            integer rank.
+        ties: String tie rule for Candidates sharing a rank, one of
+            TIE_RULES. Defaults to TIES_TRUNCATE.
+
+    Returns:
+        List of Candidates ordered by preferred rank.
+
+    Raises:
+        ValueError: A cell is neither blank nor an integer.
+    """
+    columns_for_rank = dict()
+    for column, cell in enumerate(cells[:len(candidates)]):
+        cell = cell.strip()
+        if cell:
+            columns_for_rank.setdefault(int(cell), list()).append(column)
+
+    ranking = list()
+    for rank in sorted(columns_for_rank):
+        columns = columns_for_rank[rank]
+        if len(columns) > 1 and ties == TIES_TRUNCATE:
+            break
+        elif len(columns) > 1 and ties == TIES_SKIP:
+            continue
+        ranking.extend(candidates[column] for column in columns)
+    return ranking
+
+
+def ballots_from_rank_matrix_rows(rows, ties=TIES_TRUNCATE):
+    """Returns Ballots from the rows of a rank matrix.
+
+    The first row names the Candidate of each column, and every other row
+    gives a rank to each Candidate. Each distinct row is ranked once, and its
+    ranking is shared by every Ballot with that row.
+
+    Args:
+        rows: Iterable of lists of Strings in the cells of each row.
+        ties: String tie rule for Candidates sharing a rank, one of
+            TIE_RULES. Defaults to TIES_TRUNCATE.
+
+    Returns:
+        List of Ballots representing the rankings.
+
+    Raises:
+        ValueError: The tie rule is unknown, or a cell is neither blank nor an
+            integer.
+    """
+    if ties not in TIE_RULES:
+        raise ValueError('Invalid tie rule {}. Accepts {}.'.format(ties, ', '.join(TIE_RULES)))
+    rows = iter(rows)
+    candidates = [candidate_from_input(candidate_input.strip()) for candidate_input in next(rows, [])]
+
+    ranking_for_row = dict()
+    ballots = list()
+    for row_index, row in enumerate(rows, start=2):
+        row = tuple(row)
+        if row not in ranking_for_row:
+            try:
+                ranking_for_row[row] = ranking_from_rank_cells(candidates, row, ties=ties)
+            except ValueError:
+                raise ValueError('Invalid rank in row {}: {}'.format(row_index, ','.join(row)))
+        ballots.append(Ballot(candidates=ranking_for_row[row]))
     return ballots
 
 
+def ballots_from_rank_matrix_stream(f, delimiter=None, ties=TIES_TRUNCATE):
+    """Return Ballots from a CSV rank matrix read from a text stream, with one
+        column per Candidate. See ballots_from_rank_matrix_rows().
+
+    Args:
+        f: Readable text file object containing the user input.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            stream. Defaults to None.
+        ties: String tie rule for Candidates sharing a rank, one of
+            TIE_RULES. Defaults to TIES_TRUNCATE.
+
+    Returns:
+        List of Ballots representing user input.
+    """
+    return ballots_from_rank_matrix_rows(csv_rows_from_stream(f, delimiter=delimiter), ties=ties)
+
+
+def ballots_for_races_from_csv_stream(f, columns_for_race, delimiter=None, skip_header=False):
+    """Return the Ballots of several races from CSV user input read from a
+        text stream in a single pass.
+
+    Each row holds a voter's rankings for every race, each race in its own
+    group of columns. A voter leaving every column of a race blank casts no
+    Ballot in that race.
+
+    Args:
+        f: Readable text file object containing the user input.
+        columns_for_race: Dict mapping the String name of each race to the list
+            of the 0-based indices of the columns ranking its candidates, in
+            order of preferred rank.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            stream. Defaults to None.
+        skip_header: Boolean indicating if the first row is a header rather
+            than a voter's rankings. Defaults to False.
+
+    Returns:
+        Dict mapping the String name of each race to its list of Ballots.
+    """
+    ballots_for_race = {race: list() for race in columns_for_race}
+    candidate_for_input_for_race = {race: dict() for race in columns_for_race}
+    rows = csv_rows_from_stream(f, delimiter=delimiter)
+    if skip_header:
+        next(rows, None)
+    for row in rows:
+        for race, columns in columns_for_race.items():
+            race_row = [row[column] if column < len(row) else '' for column in columns]
+            if any(race_row):
+                ballots_for_race[race].append(ballot_from_candidate_input_row(race_row,
+                                                                              candidate_for_input_for_race[race]))
+    return ballots_for_race
+
+
+def ballots_for_races_from_file(filename, columns_for_race, delimiter=None, skip_header=False):
+    """Return the Ballots of several races from CSV file user input, read in a
+        single pass. See ballots_for_races_from_csv_stream().
+
+    Compressed files are decompressed while they are read, as by
+    ballots_from_file().
+
+    Args:
+        filename: The filepath of the CSV file containing the user input.
+        columns_for_race: Dict mapping the String name of each race to the list
+            of the 0-based indices of the columns ranking its candidates.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            file. Defaults to None.
+        skip_header: Boolean indicating if the first row is a header. Defaults
+            to False.
+
+    Returns:
+        Dict mapping the String name of each race to its list of Ballots.
+    """
+    uncompressed_filename, extension = os.path.splitext(filename.lower())
+    if extension not in DECOMPRESSORS:
+        uncompressed_filename = filename.lower()
+    if not uncompressed_filename.endswith('.csv'):
+        raise ValueError('Invalid filetype. Races are read from .csv, optionally '
+                         'compressed as {}.'.format(', '.join(DECOMPRESSORS)))
+    with open_ballot_file(filename) as f:
+        return ballots_for_races_from_csv_stream(f, columns_for_race, delimiter=delimiter,
+                                                 skip_header=skip_header)
+
+
 def ballots_from_txt(filename):
     """Return Ballots from TXT user input.
 
@@ -161,59 +856,493 @@ def ballots_from_txt(filename):
     Returns:
         List of Ballots representing user input.
     """
-    ballots = list()
     with open(filename) as f:
-        for line in f:
-            if len(line.strip()) > 0:
-                candidate_inputs = [candidate_input.strip()
-                                    for candidate_input in line.split(',')]
-                ballot = ballot_from_candidate_inputs(candidate_inputs)
-                ballots.append(ballot)
-    f.close()
+        return ballots_from_txt_stream(f)
+
+
+def ballots_from_txt_stream(f):
+    """Return Ballots from TXT user input read from a text stream.
+
+    Args:
+        f: Readable text file object containing the user input.
+
+    Returns:
+        List of Ballots representing user input.
+    """
+    rows = (line.split(',')
+            for block in iter(lambda: list(itertools.islice(f, BLOCK_LINES)), [])
+            for line in block if not line.isspace())
+    return ballots_from_candidate_input_rows(rows, strip=True)
+
+
+def open_ballot_file(filename):
+    """Opens a ballot file as text, decompressing it while it is read if its
+        extension is that of a compressed file.
+
+    Args:
+        filename: The filepath of the ballot file.
+
+    Returns:
+        Readable text file object of the (decompressed) ballot file.
+
+    Raises:
+        ValueError: The compression of the file cannot be read.
+    """
+    _, extension = os.path.splitext(filename.lower())
+    if extension not in DECOMPRESSORS:
+        return open(filename)
+    elif DECOMPRESSORS[extension] is None:
+        raise ValueError('Reading {} files requires the zstandard package.'.format(extension))
+    else:
+        return DECOMPRESSORS[extension](filename, 'rt')
+
+
+def file_signature(filename):
+    """Returns the size, modification time, and hash of a file.
+
+    Args:
+        filename: The filepath of the file.
+
+    Returns:
+        Dict containing the size in bytes, the modification time in
+            nanoseconds, and the SHA-256 hex digest of the file.
+    """
+    stat = os.stat(filename)
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            'sha256': digest.hexdigest()}
+
+
+def write_ballots_sidecar(filename, signature, ballots):
+    """Writes the sidecar file caching the parsed Ballots of a ballot file.
+
+    The sidecar contains a table of the Candidates and each distinct ranking of
+    Candidates and vote value with the number of Ballots ranking them so, in
+    order of first appearance.
+
+    Args:
+        filename: The filepath of the sidecar file.
+        signature: Dict identifying the ballot file and the options it is
+            parsed with, such as one returned by file_signature.
+        ballots: List of Ballots parsed from the ballot file.
+    """
+    candidate_indices = dict()
+    candidates = list()
+    ranking_counts = dict()
+    for ballot in ballots:
+        ranking = list()
+        for candidate in ballot.candidates:
+            key = repr(candidate)
+            if key not in candidate_indices:
+                candidate_indices[key] = len(candidates)
+                candidates.append([candidate.uid, candidate.name,
+                                   isinstance(candidate, NoConfidence)])
+            ranking.append(candidate_indices[key])
+        ranking = (tuple(ranking), ballot.vote_value)
+        ranking_counts[ranking] = ranking_counts.get(ranking, 0) + 1
+
+    sidecar = {'version': SIDECAR_VERSION,
+               'source': signature,
+               'candidates': candidates,
+               'rankings': [[count, list(ranking), vote_value]
+                            for (ranking, vote_value), count in ranking_counts.items()]}
+    temporary_filename = '{}.{}.tmp'.format(filename, os.getpid())
+    with open(temporary_filename, 'w') as f:
+        json.dump(sidecar, f, separators=(',', ':'))
+    os.replace(temporary_filename, filename)
+
+
+def ballots_from_sidecar(filename, signature):
+    """Returns Ballots from the sidecar file of a ballot file.
+
+    Args:
+        filename: The filepath of the sidecar file.
+        signature: Dict identifying the ballot file and the options it is
+            parsed with, such as one returned by file_signature.
+
+    Returns:
+        List of Ballots cached in the sidecar file, or None if the sidecar
+            file is missing, unreadable, or does not match the ballot file.
+    """
+    try:
+        with open(filename) as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get('version') != SIDECAR_VERSION or sidecar.get('source') != signature:
+        return None
+
+    candidates = [NoConfidence() if no_confidence else Candidate(uid, name=name)
+                  for uid, name, no_confidence in sidecar['candidates']]
+    ballots = list()
+    for count, ranking, vote_value in sidecar['rankings']:
+        ranked_candidates = [candidates[index] for index in ranking]
+        ballots.extend(Ballot(candidates=list(ranked_candidates), vote_value=vote_value)
+                       for _ in range(count))
     return ballots
 
 
-def ballots_from_file(filename):
+def ballots_from_file(filename, use_sidecar=False, delimiter=None, rank_matrix_ties=None,
+                      weighted=False):
     """Return Ballots from file user input.
 
+    If requested, the parsed Ballots are cached in a sidecar file next to the
+    ballot file. Later loads read the sidecar file instead of parsing the
+    ballot file for as long as the size, modification time, and hash of the
+    ballot file match.
+    Ballots loaded from the sidecar file are grouped by ranking, which does not
+    affect the election results.
+
+    Files compressed with gzip (.gz), bzip2 (.bz2), or xz (.xz, .lzma) are
+    decompressed while they are parsed, as are Zstandard (.zst) files if the
+    zstandard package is installed.
+
+    NumPy ranking matrices (.npy, .npz) are read directly with
+    ballots_from_numpy() rather than parsed, and are not cached in a sidecar
+    file.
+
     Args:
-        filename: The filepath of the CSV or TXT file containing the user input.
+        filename: The filepath of the CSV, TXT, BLT, or NumPy file containing
+            the user input, such as 'ballots.csv' or 'ballots.csv.gz'.
+        use_sidecar: Boolean indicating if the sidecar file should be read and
+            written. Defaults to False.
+        delimiter: String delimiting cells of a CSV file, or None to sniff the
+            dialect of the file. Defaults to None.
+        rank_matrix_ties: String tie rule of a CSV file that is a rank matrix,
+            with one column per Candidate, or None for a CSV file with one
+            column per rank. See ballots_from_rank_matrix_rows(). Defaults to
+            None.
+        weighted: Boolean indicating if each row of a CSV file begins with the
+            count of Ballots ranking its Candidates. See
+            ballots_from_weighted_csv_stream(). Defaults to False.
 
     Returns:
         List of Ballots representing user input.
     """
-    if filename.lower().endswith('.csv'):
-        return ballots_from_csv(filename)
-    elif filename.lower().endswith('.txt'):
-        return ballots_from_txt(filename)
+    uncompressed_filename, extension = os.path.splitext(filename.lower())
+    if extension in (NPY_EXTENSION, NPZ_EXTENSION):
+        return ballots_from_numpy(filename)
+    if extension not in DECOMPRESSORS:
+        uncompressed_filename = filename.lower()
+    if uncompressed_filename.endswith('.csv') and rank_matrix_ties is not None:
+        def parse_stream(f):
+            return ballots_from_rank_matrix_stream(f, delimiter=delimiter, ties=rank_matrix_ties)
+    elif uncompressed_filename.endswith('.csv') and weighted:
+        def parse_stream(f):
+            return ballots_from_weighted_csv_stream(f, delimiter=delimiter if delimiter is not None else ',')
+    elif uncompressed_filename.endswith('.csv'):
+        def parse_stream(f):
+            return ballots_from_csv_stream(f, delimiter=delimiter)
+    elif uncompressed_filename.endswith('.txt'):
+        parse_stream = ballots_from_txt_stream
+    elif uncompressed_filename.endswith(BLT_EXTENSION):
+        parse_stream = ballots_from_blt_stream
     else:
-        raise ValueError('Invalid filetype. Accepts .csv, .txt.')
+        raise ValueError('Invalid filetype. Accepts .csv, .txt, {}, optionally '
+                         'compressed as {}, or {}, {}.'.format(BLT_EXTENSION, ', '.join(DECOMPRESSORS),
+                                                               NPY_EXTENSION, NPZ_EXTENSION))
+
+    def parse():
+        """Returns Ballots parsed from the ballot file."""
+        with open_ballot_file(filename) as f:
+            return parse_stream(f)
+
+    if not use_sidecar:
+        return parse()
+
+    sidecar_filename = filename + SIDECAR_SUFFIX
+    signature = dict(file_signature(filename), delimiter=delimiter)
+    if rank_matrix_ties is not None:
+        signature['rank_matrix_ties'] = rank_matrix_ties
+    if weighted:
+        signature['weighted'] = weighted
+    ballots = ballots_from_sidecar(sidecar_filename, signature)
+    if ballots is None:
+        ballots = parse()
+        try:
+            write_ballots_sidecar(sidecar_filename, signature, ballots)
+        except OSError as error:
+            print('Could not write ballot cache {}: {}'.format(sidecar_filename, error),
+                  file=sys.stderr)
+    return ballots
 
 
-def ballots_from_url(url):
+class ResumableDownload(io.RawIOBase):
+    """Binary stream of the body of an HTTP response, resumed when interrupted.
+
+    If the connection fails before the whole body is read, the download is
+    resumed from the last byte read with an HTTP range request. The range is
+    conditioned on the ETag or Last-Modified of the first response, so a body
+    that changed in the meantime is not spliced together.
+
+    Attributes:
+        url: String URL being downloaded.
+        content_encoding: String Content-Encoding of the body, or None.
+        length: Integer length of the body in bytes, or None if unknown.
+        position: Integer number of bytes of the body read.
+        _progress: Function called with the bytes read and the length after
+            each read, or None.
+        _retries: Integer number of times the download may still be resumed.
+        _headers: Dict of headers sent with each request.
+        _validator: String ETag or Last-Modified of the first response, or
+            None.
+        _response: http.client.HTTPResponse being read.
+    """
+
+    def __init__(self, url, progress=None, retries=DOWNLOAD_RETRIES):
+        """Initializes ResumableDownload, sending the first request.
+
+        Args:
+            url: String URL to download.
+            progress: Function called with the bytes read and the length (or
+                None) after each read. Defaults to None.
+            retries: Integer number of times the download may be resumed.
+                Defaults to DOWNLOAD_RETRIES.
+        """
+        super().__init__()
+        self.url = url
+        self.position = 0
+        self._progress = progress
+        self._retries = retries
+        self._headers = {'Accept-Encoding': 'gzip'}
+        self._response = urllib.request.urlopen(urllib.request.Request(url, headers=self._headers))
+        self._validator = self._response.headers.get('ETag', self._response.headers.get('Last-Modified'))
+        self.content_encoding = self._response.headers.get('Content-Encoding')
+        content_length = self._response.headers.get('Content-Length')
+        self.length = int(content_length) if content_length is not None else None
+
+    def readable(self):
+        """Returns True, as the download is readable."""
+        return True
+
+    def readinto(self, b):
+        """Reads bytes of the body into a buffer, resuming if interrupted.
+
+        Args:
+            b: Writable bytes-like object to read into.
+
+        Returns:
+            Integer number of bytes read, or 0 at the end of the body.
+        """
+        while True:
+            try:
+                count = self._response.readinto(b)
+            except (http.client.IncompleteRead, ConnectionError, socket.timeout):
+                count = 0
+            else:
+                if count > 0 or self.length is None or self.position >= self.length:
+                    break
+            self._resume()
+
+        self.position += count
+        if self._progress is not None and count > 0:
+            self._progress(self.position, self.length)
+        return count
+
+    def _resume(self):
+        """Requests the rest of the body after the bytes read.
+
+        Raises:
+            IOError: The download cannot be resumed.
+        """
+        self._response.close()
+        if self._retries <= 0:
+            raise IOError('Download of {} interrupted after {} bytes'.format(self.url, self.position))
+        self._retries -= 1
+
+        headers = dict(self._headers, Range='bytes={}-'.format(self.position))
+        if self._validator is not None:
+            headers['If-Range'] = self._validator
+        self._response = urllib.request.urlopen(urllib.request.Request(self.url, headers=headers))
+        if self._response.status != http.client.PARTIAL_CONTENT:
+            self._response.close()
+            raise IOError('Server did not resume download of {} after {} bytes'.format(self.url, self.position))
+
+    def close(self):
+        """Closes the download."""
+        if not self.closed:
+            self._response.close()
+        super().close()
+
+
+def ballots_from_url(url, progress=None, delimiter=None):
     """Returns Ballots from URL pointing to CSV file.
 
+    Rows are parsed while the file is downloaded. The file is decompressed if
+    it is served with gzip Content-Encoding or its URL ends in .gz, and the
+    download is resumed with range requests if it is interrupted.
+
     Args:
         url: The URL to a CSV file containing the user input.
+        progress: Function called with the bytes downloaded and the total
+            bytes (or None if unknown) as the download progresses. Defaults to
+            None.
+        delimiter: String delimiting cells, or None to sniff the dialect of the
+            file. Defaults to None.
 
     Returns:
         List of Ballots representing user input.
     """
+    with ResumableDownload(url, progress=progress) as download:
+        stream = io.BufferedReader(download)
+        if download.content_encoding == 'gzip' or urllib.parse.urlsplit(url).path.endswith('.gz'):
+            stream = gzip.GzipFile(fileobj=stream)
+        with io.TextIOWrapper(stream, encoding='utf-8') as f:
+            return ballots_from_csv_stream(f, delimiter=delimiter)
+
+
+def print_download_progress(position, length):
+    """Prints the progress of a download to stderr on a single line.
+
+    Args:
+        position: Integer number of bytes downloaded.
+        length: Integer total number of bytes, or None if unknown.
+    """
+    if length:
+        message = 'Downloaded {} of {} bytes ({:.0%})'.format(position, length, position / length)
+    else:
+        message = 'Downloaded {} bytes'.format(position)
+    sys.stderr.write('\r' + message)
+    if position == length:
+        sys.stderr.write('\n')
+    sys.stderr.flush()
 
-    filename, _ = urllib.request.urlretrieve(url)
-    return ballots_from_csv(filename)
 
+def write_round_record(f, round_index, election_round):
+    """Writes an ElectionRound as a single-line JSON record.
 
-def parse_args():
+    Args:
+        f: Writable text file object to write the record to.
+        round_index: Integer index of the ElectionRound.
+        election_round: ElectionRound to write.
+    """
+    record = {'type': 'round', 'round': round_index}
+    record.update(election_round.as_dict())
+    f.write(json.dumps(record))
+    f.write('\n')
+    f.flush()
+
+
+def write_results_record(f, results):
+    """Writes ElectionResults, without their rounds, as a single-line JSON
+        record.
+
+    Args:
+        f: Writable text file object to write the record to.
+        results: ElectionResults to write.
+    """
+    record = {'type': 'results'}
+    record.update(results.as_dict(include_rounds=False))
+    f.write(json.dumps(record))
+    f.write('\n')
+
+
+def write_results_json(f, results):
+    """Writes ElectionResults as a single JSON document.
+
+    Args:
+        f: Writable text file object to write the document to.
+        results: ElectionResults to write.
+    """
+    json.dump(results.as_dict(), f)
+    f.write('\n')
+
+
+def write_transfers_csv(f, results):
+    """Writes the vote transfers of each ElectionRound as CSV links.
+
+    Each row contains the round, the uid of the Candidate the votes were
+    transferred from, the uid of the Candidate they were transferred to (or
+    'exhausted'), and the value of the votes, suitable for a Sankey diagram.
+
+    Args:
+        f: Writable text file object to write the CSV to.
+        results: ElectionResults to write.
+    """
+    writer = csv.writer(f)
+    writer.writerow(['round', 'from', 'to', 'votes'])
+    for round_index, election_round in enumerate(results.election_rounds):
+        for link in election_round.transfer_links():
+            writer.writerow([round_index, link['from'],
+                             link['to'] if link['to'] is not None else 'exhausted',
+                             link['votes']])
+
+
+def call_with_profiling(function, profile_filename=None,
+                        memory_profile_filename=None):
+    """Calls the function, optionally profiling its time and memory use.
+
+    Args:
+        function: Function taking no arguments to call.
+        profile_filename: The filepath to write cProfile stats to, or None to
+            skip time profiling.
+        memory_profile_filename: The filepath to write the top tracemalloc
+            allocation sites to, or None to skip memory profiling.
+
+    Returns:
+        The return value of the function.
+    """
+    if memory_profile_filename is not None:
+        tracemalloc.start()
+    profiler = None
+    if profile_filename is not None:
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        return function()
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_filename)
+
+        if memory_profile_filename is not None:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, cProfile.__file__),
+                tracemalloc.Filter(False, tracemalloc.__file__)))
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(memory_profile_filename, 'w') as f:
+                f.write('Current: {} B, peak: {} B\n'.format(current, peak))
+                f.write('Top {} allocation sites:\n'.format(MEMORY_PROFILE_LIMIT))
+                for statistic in snapshot.statistics('lineno')[:MEMORY_PROFILE_LIMIT]:
+                    f.write('{}\n'.format(statistic))
+
+
+def profile_filename_for_stage(prefix, stage, extension):
+    """Returns the filepath of a profile for a stage of the election.
+
+    Args:
+        prefix: String prefix of the profile filepaths, or None.
+        stage: String representing the profiled stage of the election.
+        extension: String file extension of the profile.
+
+    Returns:
+        String filepath of the profile, or None if no prefix was given.
+    """
+    if prefix is None:
+        return None
+    return '{}.{}.{}'.format(prefix, stage, extension)
+
+
+def parse_args(argv=None):
     """Parses command-line election arguments.
 
+    Args:
+        argv: List of String arguments, or None for the arguments the program
+            was run with. Defaults to None.
+
     Returns:
         argparse.Namespace containing election arguments.
     """
     description = ('Configure and run an election. Ballots ranking candidates '
-                   'may be imported from a CSV or TXT file, or manual input if '
-                   'no file is specified. The expected input format for a '
-                   'candidate is \'uid\' or optionally \'uid (name)\'.')
+                   'may be imported from a CSV, TXT, BLT, or NumPy file, or '
+                   'manual input if no file is specified. The expected input '
+                   'format for a candidate is \'uid\' or optionally \'uid '
+                   '(name)\'.')
     parser = argparse.ArgumentParser(description=description)
     required_group = parser.add_argument_group('required arguments')
 
@@ -233,9 +1362,26 @@ def parse_args():
                         help='No Confidence cannot be eliminated',
                         action='store_true')
 
+    # Delimiter of CSV ballot files
+    parser.add_argument('-d', '--delimiter',
+                        help='Delimiter of CSV ballots, instead of detecting '
+                             'the CSV dialect')
+
+    # Output format of election results
+    parser.add_argument('-f', '--format', choices=['text', 'json', 'ndjson'],
+                        default='text',
+                        help='Output format of election results. json and '
+                             'ndjson include every round, and print other '
+                             'reports to stderr')
+
     # Name of Election
     parser.add_argument('-n', '--name', help='Name of election', default='')
 
+    # Number of worker processes to count ballots with
+    parser.add_argument('-p', '--processes', type=int,
+                        help='Number of worker processes to split ballots '
+                             'across for counting')
+
     # Disallow random tiebreaks, ending the election instead
     parser.add_argument('-r', '--disallow-random-tiebreak',
                         help='Halt election instead of using random tiebreak',
@@ -246,41 +1392,340 @@ def parse_args():
                         help='Verbose printing of election results',
                         action='store_true')
 
-    args = parser.parse_args()
+    # Printing of the head-to-head comparison of every pair of candidates
+    parser.add_argument('--pairwise',
+                        help='Print the head-to-head comparison of every pair '
+                             'of candidates and any Condorcet winner or loser',
+                        action='store_true')
+
+    # Seat counts to compare the candidates elected for
+    parser.add_argument('--sweep', metavar='SEATS',
+                        help='Also count for each of SEATS (e.g. 10-13 or '
+                             '1,3,5-7) and print a table of the candidates '
+                             'elected for each seat count')
+
+    # Recounts with each candidate withdrawn
+    parser.add_argument('--withdrawals',
+                        help='Also count with each candidate withdrawn in '
+                             'turn and print which withdrawals change the '
+                             'candidates elected',
+                        action='store_true')
+
+    # Rank matrix ballot files, with one column per candidate
+    parser.add_argument('--rank-matrix', metavar='TIES', nargs='?',
+                        const=TIES_TRUNCATE, choices=TIE_RULES,
+                        help='Read a CSV ballot file with a header row of '
+                             'candidates and a rank in each cell. Candidates '
+                             'sharing a rank end the ranking, are skipped, or '
+                             'are ranked in column order for TIES ({}, default '
+                             '{})'.format(', '.join(TIE_RULES), TIES_TRUNCATE))
+
+    # Weighted CSV ballot files, with a count of ballots in each row
+    parser.add_argument('--weighted',
+                        help='Read each row of a CSV ballot file as '
+                             'count,rank1,rank2,... and count it as that many '
+                             'ballots',
+                        action='store_true')
+
+    # File to write the ballots to
+    parser.add_argument('--write-ballots', metavar='FILE',
+                        help='Write the ballots, with identical rankings '
+                             'combined, to FILE in the BLT format if it ends '
+                             'in {}, as a NumPy bundle if it ends in {}, or as '
+                             'weighted CSV otherwise'.format(BLT_EXTENSION, NPZ_EXTENSION))
+
+    # Races ranked in groups of columns of a single CSV file
+    parser.add_argument('--race', metavar='NAME[:SEATS]=COLUMNS',
+                        action='append',
+                        help='Count the race NAME ranked in the CSV COLUMNS '
+                             '(e.g. 1-3 or 2,4,6) of the ballots, with SEATS '
+                             'seats or else --seats. May be repeated to read '
+                             'several races from the file in a single pass and '
+                             'count them in parallel across --processes')
+
+    # Header row of multi-race ballot files
+    parser.add_argument('--header',
+                        help='Skip the header row of the ballots of --race',
+                        action='store_true')
+
+    # Estimate of the fewest ballot changes altering the results
+    parser.add_argument('--margin',
+                        help='Also estimate the fewest changed ballots that '
+                             'would alter the candidates elected, and print a '
+                             'lower bound and a witness',
+                        action='store_true')
+
+    # File to write vote transfers to
+    parser.add_argument('--transfers', metavar='FILE',
+                        help='Write the vote transfers of each round to FILE '
+                             'as CSV')
+
+    # Printing of download progress
+    parser.add_argument('--progress',
+                        help='Print the progress of downloading ballots from '
+                             'a URL',
+                        action='store_true')
+
+    # Disable the sidecar file caching parsed ballots next to the ballot file
+    parser.add_argument('--no-ballot-cache',
+                        help='Always parse the ballot file instead of reading '
+                             'or writing its cached parsed ballots',
+                        action='store_true')
+
+    # Candidates standing in the election
+    parser.add_argument('--candidates', metavar='UIDS',
+                        help='Comma-separated uids of the candidates standing '
+                             'in the election, validating that ballots rank '
+                             'no others')
+
+    # Policies for ballots breaking the ranking rules
+    parser.add_argument('--validate', metavar='[ISSUE=]POLICY',
+                        action='append',
+                        help='Validate ballots, and apply POLICY ({}) to '
+                             'ballots with ISSUE ({}), or with any issue. May '
+                             'be repeated. Prints a summary of the issues '
+                             'found'.format(', '.join(POLICIES), ', '.join(ISSUES)))
+
+    # Directory caching election results between runs
+    parser.add_argument('--cache', metavar='DIR',
+                        help='Reuse results cached in DIR for the same '
+                             'ballots and options, and cache new results')
+
+    # Maximum size of the results cache
+    parser.add_argument('--cache-size', metavar='BYTES', type=int,
+                        default=DEFAULT_MAX_SIZE,
+                        help='Maximum size of the results cache, evicting '
+                             'least recently used results beyond it')
+
+    # Printing of time spent in each phase of the election
+    parser.add_argument('--timings',
+                        help='Print time spent in each phase of each round '
+                             'to stderr',
+                        action='store_true')
+
+    # cProfile stats of ballot ingestion and election computation
+    parser.add_argument('--profile', metavar='PREFIX',
+                        help='Write cProfile stats of ingestion and counting '
+                             'to PREFIX.ingest.prof and PREFIX.count.prof')
+
+    # tracemalloc top allocations of ballot ingestion and election computation
+    parser.add_argument('--memory-profile', metavar='PREFIX',
+                        help='Write top memory allocations of ingestion and '
+                             'counting to PREFIX.ingest.txt and '
+                             'PREFIX.count.txt')
+
+    args = parser.parse_args(argv)
     return args
 
 
+def compute_races_results(elections, processes=None):
+    """Computes the results of several elections, in parallel if requested.
+
+    Args:
+        elections: List of Elections.
+        processes: Integer number of worker processes to run the elections in,
+            or None to run them in this process. Defaults to None.
+
+    Returns:
+        List of the ElectionSummary of each Election, in the same order.
+    """
+    if processes is None or processes <= 1:
+        return [election.compute_results(summary_only=True) for election in elections]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(election.compute_results, summary_only=True) for election in elections]
+        return [future.result() for future in futures]
+
+
+def process_races(args):
+    """Processes command-line election arguments and runs the election of each
+        race of a multi-race ballot file.
+
+    Args:
+        argparse.Namespace containing election arguments.
+    """
+    seats_columns_for_race = races_from_input(args.race, args.seats)
+    ballots_for_race = ballots_for_races_from_file(
+        args.ballots,
+        {race: columns for race, (_, columns) in seats_columns_for_race.items()},
+        delimiter=args.delimiter,
+        skip_header=args.header)
+
+    elections = [Election(ballots_for_race[race],
+                          seats,
+                          can_eliminate_no_confidence=not (args.disallow_nc_elimination),
+                          can_random_tiebreak=not (args.disallow_random_tiebreak),
+                          name=race,
+                          random_alphanumeric=args.alphanumeric)
+                 for race, (seats, _) in seats_columns_for_race.items()]
+    results_for_race = compute_races_results(elections, processes=args.processes)
+
+    if args.format == 'json':
+        json.dump({results.name: results.as_dict() for results in results_for_race}, sys.stdout)
+        sys.stdout.write('\n')
+        return
+    for results in results_for_race:
+        if args.format == 'ndjson':
+            write_results_record(sys.stdout, results)
+        elif args.verbose:
+            results.write_description(sys.stdout)
+            print()
+        else:
+            print('{}:'.format(results.name))
+            for candidate in results.candidates_elected:
+                print(candidate)
+
+
 def process_args(args):
     """Processes command-line election arguments and runs election.
 
     Args:
         argparse.Namespace containing election arguments.
     """
-    if args.ballots is not None:
-        if args.ballots.startswith('http'):
-            ballots = ballots_from_url(args.ballots)
+    if args.race is not None:
+        if args.ballots is None:
+            raise ValueError('Races are read from a ballot file given with -b.')
+        process_races(args)
+        return
+
+    def read_ballots():
+        """Returns Ballots from the configured source."""
+        if args.ballots is not None:
+            if args.ballots.startswith('http'):
+                return ballots_from_url(args.ballots,
+                                        progress=print_download_progress if args.progress else None,
+                                        delimiter=args.delimiter)
+            else:
+                return ballots_from_file(args.ballots,
+                                         use_sidecar=not (args.no_ballot_cache),
+                                         delimiter=args.delimiter,
+                                         rank_matrix_ties=args.rank_matrix,
+                                         weighted=args.weighted)
         else:
-            ballots = ballots_from_file(args.ballots)
-    else:
-        ballots = ballots_from_input()
+            return ballots_from_input()
+
+    def ingest():
+        """Returns Ballots from the configured source, validated if requested."""
+        ballots = read_ballots()
+        if args.validate is not None or args.candidates is not None:
+            known_candidates = None
+            if args.candidates is not None:
+                known_candidates = {Candidate(uid.strip()) for uid in args.candidates.split(',')}
+            ballots, report = validate_ballots(ballots, known_candidates=known_candidates,
+                                               policy_for_issue=policy_for_issue_from_specs(args.validate or []))
+            print(report.description(), file=sys.stderr)
+        return ballots
+
+    ballots = call_with_profiling(
+        ingest,
+        profile_filename=profile_filename_for_stage(args.profile, 'ingest', 'prof'),
+        memory_profile_filename=profile_filename_for_stage(args.memory_profile, 'ingest', 'txt'))
+
+    if args.write_ballots is not None and args.write_ballots.lower().endswith(NPZ_EXTENSION):
+        with open(args.write_ballots, 'wb') as f:
+            write_numpy(f, ballots)
+    elif args.write_ballots is not None:
+        with open(args.write_ballots, 'w', newline='') as f:
+            if args.write_ballots.lower().endswith(BLT_EXTENSION):
+                write_blt(f, ballots, args.seats, title=args.name)
+            else:
+                write_weighted_csv(f, ballots)
 
     election = Election(
         ballots,
         args.seats,
-        can_eliminate_no_confidence=not(args.disallow_nc_elimination),
-        can_random_tiebreak=not(args.disallow_random_tiebreak),
+        can_eliminate_no_confidence=not (args.disallow_nc_elimination),
+        can_random_tiebreak=not (args.disallow_random_tiebreak),
         name=args.name,
         random_alphanumeric=args.alphanumeric
     )
 
-    results = election.compute_results()
+    cache = None
+    cache_key = None
+    cached_results = None
+    if args.cache is not None:
+        cache = ResultsCache(args.cache, max_size=args.cache_size)
+        cache_key = ResultsCache.key(
+            ballots,
+            args.seats,
+            random_alphanumeric=args.alphanumeric,
+            can_eliminate_no_confidence=not (args.disallow_nc_elimination),
+            can_random_tiebreak=not (args.disallow_random_tiebreak))
+        # Cached results carry no timings for this run
+        if not args.timings:
+            cached_results = cache.get(cache_key)
 
-    if args.verbose:
-        print(results.description())
+    def count():
+        """Returns the ElectionResults, writing each round as an NDJSON record
+            as soon as it is decided if requested."""
+        if cached_results is not None:
+            cached_results.name = args.name
+            if args.format == 'ndjson':
+                for round_index, election_round in enumerate(cached_results.election_rounds):
+                    write_round_record(sys.stdout, round_index, election_round)
+            return cached_results
+
+        election_rounds = election.iter_rounds(record_timings=args.timings,
+                                               summary_only=True,
+                                               processes=args.processes)
+        round_index = 0
+        try:
+            while True:
+                election_round = next(election_rounds)
+                if args.format == 'ndjson':
+                    write_round_record(sys.stdout, round_index, election_round)
+                round_index += 1
+        except StopIteration as stop:
+            return stop.value
+
+    results = call_with_profiling(
+        count,
+        profile_filename=profile_filename_for_stage(args.profile, 'count', 'prof'),
+        memory_profile_filename=profile_filename_for_stage(args.memory_profile, 'count', 'txt'))
+
+    # Results of a random tiebreak on a generated alphanumeric are not repeatable
+    random_results = (args.alphanumeric is None and
+                      any(election_round.random_tiebreak_occurred
+                          for election_round in results.election_rounds))
+    if cache is not None and cached_results is None and not random_results:
+        cache.put(cache_key, results)
+
+    if args.format == 'json':
+        write_results_json(sys.stdout, results)
+    elif args.format == 'ndjson':
+        write_results_record(sys.stdout, results)
+    elif args.verbose:
+        results.write_description(sys.stdout)
+        print()
     else:
         for candidate in results.candidates_elected:
             print(candidate)
 
+    # Reports beside the results are kept out of JSON and NDJSON output
+    report_file = sys.stdout if args.format == 'text' else sys.stderr
+
+    # Reports break ties with the alphanumeric of the results, even if generated
+    election.random_alphanumeric = results.random_alphanumeric
+
+    if args.pairwise:
+        print(election.pairwise_comparison().description(), file=report_file)
+
+    if args.sweep is not None:
+        seat_counts = seat_counts_from_input(args.sweep) + [args.seats]
+        print(election.compute_seat_sweep(seat_counts, processes=args.processes).description(), file=report_file)
+
+    if args.withdrawals:
+        print(election.compute_withdrawals(processes=args.processes).description(), file=report_file)
+
+    if args.margin:
+        print(election.compute_margin().description(), file=report_file)
+
+    if args.transfers is not None:
+        with open(args.transfers, 'w', newline='') as f:
+            write_transfers_csv(f, results)
+
+    if args.timings:
+        print(results.timings_description(), file=sys.stderr)
+
 
 if __name__ == '__main__':
     election_args = parse_args()
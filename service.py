@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+
+"""Serves election results over HTTP for ballot sets loaded once."""
+
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import sys
+import urllib.parse
+
+import election
+from election import Candidate, Election, ballots_hash
+from run import ballots_from_file, ballots_from_url
+
+__author__ = "Devin Gund"
+__copyright__ = "Copyright 2017, Carnegie Mellon University Undergraduate Student Senate"
+__credits__ = ["Sushain Cherivirala"]
+__license__ = "GPLv3"
+__status__ = "Production"
+
+# Reason phrases of the HTTP status codes used by the service
+HTTP_REASONS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+# Default maximum number of election results kept by the service
+DEFAULT_MAX_RESULTS = 256
+
+
+class HTTPError(Exception):
+    """Error answered with an HTTP error status.
+
+    Attributes:
+        status: Integer HTTP status code.
+        message: String describing the error.
+    """
+
+    def __init__(self, status, message):
+        """Initializes HTTPError with a status and message.
+
+        Args:
+            status: Integer HTTP status code.
+            message: String describing the error.
+        """
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ElectionConfiguration:
+    """Configuration of an election requested from the service.
+
+    Attributes:
+        seats: Number of vacant seats before the election.
+        random_alphanumeric: String containing the random alphanumeric used for
+            final tiebreaks, or None.
+        can_eliminate_no_confidence: Boolean indicating if No Confidence may be
+            eliminated in the election.
+        can_random_tiebreak: Boolean indicating if random elimination may be
+            used for final tiebreaks.
+        withdrawn: Frozenset of the uids of Candidates withdrawn from the
+            Ballots.
+    """
+
+    def __init__(self, query):
+        """Initializes ElectionConfiguration from a URL query.
+
+        Args:
+            query: Dict mapping query parameter names to lists of values, as
+                returned by urllib.parse.parse_qs.
+
+        Raises:
+            HTTPError: The query is invalid.
+        """
+        def value(name, default=None):
+            return query.get(name, [default])[-1]
+
+        try:
+            self.seats = int(value('seats'))
+        except (TypeError, ValueError):
+            raise HTTPError(400, 'The integer query parameter seats is required')
+        self.random_alphanumeric = value('alphanumeric')
+        self.can_eliminate_no_confidence = value('disallow_nc_elimination', '0') in ('0', 'false')
+        self.can_random_tiebreak = value('disallow_random_tiebreak', '0') in ('0', 'false')
+        self.withdrawn = frozenset(uid for uid in value('withdraw', '').split(',') if uid)
+
+    def key(self):
+        """Returns a hashable key identifying the configuration.
+
+        Returns:
+            Tuple of the configuration values.
+        """
+        return (self.seats, self.random_alphanumeric,
+                self.can_eliminate_no_confidence, self.can_random_tiebreak,
+                tuple(sorted(self.withdrawn)))
+
+
+class ElectionService:
+    """Ballot sets and cached election results served over HTTP.
+
+    Ballot sets are loaded once and kept in memory. Results are computed at
+    most once per ballot set and configuration while they are kept, in a thread
+    pool so that the service keeps answering other requests, and concurrent
+    requests for the same results share one computation. Beyond the maximum
+    number of results, the least recently requested are dropped.
+
+    Attributes:
+        max_results: Integer maximum number of results kept.
+        _ballots_for_name: Dict mapping ballot set names to lists of Ballots.
+        _ballots_hash_for_name: Dict mapping ballot set names to the hashes of
+            their Ballots.
+        _results: OrderedDict mapping (name, configuration key) tuples to
+            futures of ElectionSummaries, from least to most recently
+            requested.
+        _executor: concurrent.futures.Executor computing results.
+    """
+
+    def __init__(self, max_workers=None, max_results=DEFAULT_MAX_RESULTS):
+        """Initializes an ElectionService without ballot sets.
+
+        Args:
+            max_workers: Integer number of threads computing results, or None
+                for the concurrent.futures default.
+            max_results: Integer maximum number of results kept. Defaults to
+                DEFAULT_MAX_RESULTS.
+        """
+        self.max_results = max_results
+        self._ballots_for_name = dict()
+        self._ballots_hash_for_name = dict()
+        self._results = collections.OrderedDict()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+
+    def add_ballots(self, name, ballots):
+        """Adds a ballot set to be served, replacing any with the same name.
+
+        Args:
+            name: String representing the name of the ballot set.
+            ballots: List of Ballots.
+        """
+        self._ballots_for_name[name] = ballots
+        self._ballots_hash_for_name[name] = ballots_hash(ballots)
+        for key in [key for key in self._results if key[0] == name]:
+            del self._results[key]
+
+    def _compute_results(self, name, configuration):
+        """Computes the results of an election on a ballot set.
+
+        Args:
+            name: String representing the name of the ballot set.
+            configuration: ElectionConfiguration of the election.
+
+        Withdrawn Candidates are skipped on the shared Ballots, as in
+        Election.compute_withdrawals(), rather than copying the Ballots without
+        them.
+
+        Returns:
+            ElectionSummary containing the election results and data.
+        """
+        election = Election(self._ballots_for_name[name], configuration.seats,
+                            can_eliminate_no_confidence=configuration.can_eliminate_no_confidence,
+                            can_random_tiebreak=configuration.can_random_tiebreak,
+                            name=name,
+                            random_alphanumeric=configuration.random_alphanumeric)
+        return election._compute_summary(self._ballots_hash_for_name[name],
+                                         candidates_withdrawn={Candidate(uid) for uid in configuration.withdrawn})
+
+    async def results(self, name, configuration):
+        """Returns the results of an election on a ballot set.
+
+        If no random alphanumeric is configured, the one chosen for the first
+        computation is kept for later requests.
+
+        Args:
+            name: String representing the name of the ballot set.
+            configuration: ElectionConfiguration of the election.
+
+        Returns:
+            ElectionSummary containing the election results and data.
+
+        Raises:
+            HTTPError: The ballot set does not exist.
+        """
+        if name not in self._ballots_for_name:
+            raise HTTPError(404, 'No ballot set named {}'.format(name))
+
+        key = (name, configuration.key())
+        if key in self._results:
+            self._results.move_to_end(key)
+            results = self._results[key]
+        else:
+            loop = asyncio.get_event_loop()
+            results = loop.run_in_executor(self._executor, self._compute_results, name, configuration)
+            self._results[key] = results
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+        try:
+            return await results
+        except Exception:
+            if self._results.get(key) is results:
+                del self._results[key]
+            raise
+
+    def etag(self, name, configuration, results):
+        """Returns the entity tag of the results of an election.
+
+        The tag identifies the ballot set by its hash, so it is unchanged for
+        as long as the same Ballots and configuration are served.
+
+        Args:
+            name: String representing the name of the ballot set.
+            configuration: ElectionConfiguration of the election.
+            results: ElectionSummary of the election.
+
+        Returns:
+            String containing the quoted entity tag.
+        """
+        digest = hashlib.sha256(repr((election.__version__, self._ballots_hash_for_name[name],
+                                      configuration.key(), results.random_alphanumeric)).encode('utf-8'))
+        return '"{}"'.format(digest.hexdigest())
+
+    async def respond(self, method, target, headers):
+        """Answers an HTTP request.
+
+        Supported requests are:
+            GET /elections
+                The loaded ballot sets.
+            GET /elections/NAME?seats=N[&alphanumeric=A]
+                    [&disallow_nc_elimination=1][&disallow_random_tiebreak=1]
+                    [&withdraw=UID,...]
+                The results of an election on a ballot set. Withdrawing
+                Candidates answers what-if queries.
+            GET /elections/NAME/rounds/INDEX?...
+                A single round of the results.
+
+        Args:
+            method: String HTTP request method.
+            target: String HTTP request target.
+            headers: Dict mapping lowercase header names to values.
+
+        Returns:
+            Tuple of the integer status, a dict of response headers, and the
+                JSON-serializable response body (or None).
+
+        Raises:
+            HTTPError: The request cannot be answered.
+        """
+        if method not in ('GET', 'HEAD'):
+            raise HTTPError(405, 'Only GET and HEAD are supported')
+
+        url = urllib.parse.urlsplit(target)
+        path = [urllib.parse.unquote(part) for part in url.path.split('/') if part]
+        if path == ['elections']:
+            body = [{'name': name, 'ballot_count': len(ballots), 'ballots_hash': self._ballots_hash_for_name[name]}
+                    for name, ballots in self._ballots_for_name.items()]
+            return 200, {'Cache-Control': 'no-cache'}, body
+
+        if len(path) not in (2, 4) or path[0] != 'elections' or (len(path) == 4 and path[2] != 'rounds'):
+            raise HTTPError(404, 'Unknown path {}'.format(url.path))
+
+        name = path[1]
+        configuration = ElectionConfiguration(urllib.parse.parse_qs(url.query))
+        results = await self.results(name, configuration)
+        etag = self.etag(name, configuration, results)
+        if len(path) == 4:
+            try:
+                round_index = int(path[3])
+                body = results.election_rounds[round_index].as_dict()
+            except (ValueError, IndexError):
+                raise HTTPError(404, 'No round {} in election {}'.format(path[3], name))
+            etag = '"{}-{}"'.format(etag.strip('"'), round_index)
+        else:
+            body = results.as_dict()
+
+        response_headers = {'Cache-Control': 'no-cache', 'ETag': etag}
+        if etag in (tag.strip() for tag in headers.get('if-none-match', '').split(',')):
+            return 304, response_headers, None
+        return 200, response_headers, body
+
+    async def handle_connection(self, reader, writer):
+        """Reads an HTTP request from a connection and writes the response.
+
+        Args:
+            reader: asyncio.StreamReader of the connection.
+            writer: asyncio.StreamWriter of the connection.
+        """
+        method = 'GET'
+        request_line = list()
+        try:
+            try:
+                request_line = (await reader.readline()).decode('latin-1').split()
+                headers = dict()
+                while True:
+                    line = (await reader.readline()).decode('latin-1')
+                    if line in ('\r\n', '\n', ''):
+                        break
+                    header, _, value = line.partition(':')
+                    headers[header.strip().lower()] = value.strip()
+                if len(request_line) != 3:
+                    raise HTTPError(400, 'Malformed request line')
+                method, target, _ = request_line
+                status, response_headers, body = await self.respond(method, target, headers)
+            except HTTPError as error:
+                status, response_headers, body = error.status, dict(), {'error': error.message}
+            except Exception as error:
+                print('Could not answer request {}: {!r}'.format(' '.join(request_line), error), file=sys.stderr)
+                status, response_headers, body = 500, dict(), {'error': HTTP_REASONS[500]}
+
+            content = json.dumps(body).encode('utf-8') if body is not None else b''
+            head = ['HTTP/1.1 {} {}'.format(status, HTTP_REASONS[status]),
+                    'Content-Length: {}'.format(len(content)),
+                    'Connection: close']
+            if body is not None:
+                head.append('Content-Type: application/json')
+            head.extend('{}: {}'.format(header, value) for header, value in response_headers.items())
+            writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+            if method != 'HEAD':
+                writer.write(content)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def start(self, host='127.0.0.1', port=8000, unix_socket=None):
+        """Starts listening for requests.
+
+        Args:
+            host: String host to listen on. Defaults to 127.0.0.1.
+            port: Integer port to listen on, or 0 for any free port. Defaults
+                to 8000.
+            unix_socket: String path of a Unix socket to listen on instead of
+                the host and port, or None.
+
+        Returns:
+            asyncio.AbstractServer answering the requests.
+        """
+        if unix_socket is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+        else:
+            return await asyncio.start_server(self.handle_connection, host=host, port=port)
+
+    def serve(self, host='127.0.0.1', port=8000, unix_socket=None):
+        """Serves requests on the event loop until interrupted. See start().
+
+        Args:
+            host: String host to listen on. Defaults to 127.0.0.1.
+            port: Integer port to listen on. Defaults to 8000.
+            unix_socket: String path of a Unix socket to listen on instead of
+                the host and port, or None.
+        """
+        loop = asyncio.get_event_loop()
+        server = loop.run_until_complete(self.start(host=host, port=port, unix_socket=unix_socket))
+        try:
+            loop.run_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            loop.run_until_complete(server.wait_closed())
+            self._executor.shutdown()
+
+
+def parse_args():
+    """Parses command-line service arguments.
+
+    Returns:
+        argparse.Namespace containing service arguments.
+    """
+    description = ('Serve election results over HTTP. Ballot sets are loaded '
+                   'once, and results are cached for each configuration.')
+    parser = argparse.ArgumentParser(description=description)
+    required_group = parser.add_argument_group('required arguments')
+
+    # Ballot sets to serve (required)
+    required_group.add_argument('-b', '--ballots', action='append', required=True,
+                                metavar='[NAME=]BALLOTS',
+                                help='File/URL containing ballots, optionally '
+                                     'named (defaults to the file name without '
+                                     'extension). May be repeated')
+
+    # Host and port to listen on
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Host to listen on')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port to listen on')
+
+    # Unix socket to listen on
+    parser.add_argument('--unix-socket',
+                        help='Unix socket to listen on instead of host and port')
+
+    args = parser.parse_args()
+    return args
+
+
+def ballots_from_input(ballots_input):
+    """Returns a ballot set named by an input string, loaded from its file or
+        URL.
+
+    Only a leading name containing no '/' or ':' is split off, so that an '='
+    in the path or query string of the file or URL is kept.
+
+    Args:
+        ballots_input: String 'ballots' or 'name=ballots', where ballots is the
+            file or URL containing the ballots.
+
+    Returns:
+        Tuple of the String name of the ballot set, defaulting to the file name
+            without extension, and its list of Ballots.
+    """
+    name, separator, source = ballots_input.partition('=')
+    if not separator or '/' in name or ':' in name:
+        name, source = '', ballots_input
+
+    is_url = source.startswith('http')
+    if not name:
+        path = urllib.parse.urlsplit(source).path if is_url else source
+        name = os.path.basename(path).split('.')[0]
+    if is_url:
+        return name, ballots_from_url(source)
+    return name, ballots_from_file(source)
+
+
+def process_args(args):
+    """Processes command-line service arguments and runs the service.
+
+    Args:
+        argparse.Namespace containing service arguments.
+    """
+    service = ElectionService()
+    for ballots_input in args.ballots:
+        service.add_ballots(*ballots_from_input(ballots_input))
+
+    service.serve(host=args.host, port=args.port, unix_socket=args.unix_socket)
+
+
+if __name__ == '__main__':
+    service_args = parse_args()
+    process_args(service_args)
@@ -1,11 +1,32 @@
 #!/usr/bin/env python3
 
-"""Unit tests for election.py."""
+"""Unit tests for election.py and run.py."""
 
 from __future__ import print_function
+import asyncio
+import bz2
+import concurrent.futures
+import contextlib
+import gzip
+import http.server
+import io
+import json
+import lzma
+import os
+import pstats
+import string
+import tempfile
+import threading
 import unittest
+import unittest.mock
 
-from election import Ballot, Candidate, Election, NoConfidence
+from election import (Ballot, Candidate, Election, ElectionSummary,
+                      NoConfidence, ballots_hash, ballots_without_candidates,
+                      _pairwise_counts, _pairwise_counts_numpy)
+import results_cache
+import run
+import service
+import validation
 
 __author__ = "Devin Gund"
 __copyright__ = "Copyright 2017, Carnegie Mellon University Undergraduate Student Senate"
@@ -359,6 +380,111 @@ class TestSmallElections(unittest.TestCase):
         results = election.compute_results()
         self.assertEqual(expected_winners, results.candidates_elected)
 
+    def test_surplus_reaches_threshold_exactly(self):
+        """Tests a Candidate elected by a surplus transfer reaching exactly
+            the threshold.
+
+        Expected winners: B, C
+
+        Round 0
+            Ballots:
+                1 * [C]
+                1 * [C, A]
+                1 * [C, B, A]
+                1 * [B]
+                1 * [B, C]
+            Votes:
+                A: 0
+                B: 2
+                C: 3
+            Threshold: (5) / (2+1) + 1 = 2.667
+            Result: C is elected
+        Round 1
+            Surplus: 1/3, transferred at 1/9 per ballot
+            Votes:
+                A: 1/9
+                B: 2 + 1/9
+            Threshold: (2 + 2/9) / (1+1) + 1 = 2 + 1/9
+            Result: B is elected at exactly the threshold
+        """
+        # Setup
+        expected_winners = set(candidates_for_ids(['B', 'C']))
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['C'], 1) +
+            ballots_for_ids(['C', 'A'], 1) +
+            ballots_for_ids(['C', 'B', 'A'], 1) +
+            ballots_for_ids(['B'], 1) +
+            ballots_for_ids(['B', 'C'], 1))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        self.assertEqual(expected_winners, results.candidates_elected)
+        self.assertEqual(len(results.election_rounds), 2)
+        sharded_results = Election(seats=seats, ballots=ballots,
+                                   random_alphanumeric=tiebreak_alphanumeric).compute_results(processes=2)
+        self.assertEqual([election_round.as_dict() for election_round in sharded_results.election_rounds],
+                         [election_round.as_dict() for election_round in results.election_rounds])
+
+    def test_surplus_rounds_below_threshold(self):
+        """Tests a Candidate elected by a surplus transfer reaching exactly
+            the threshold, whose votes are rounded below the threshold.
+
+        Votes within THRESHOLD_TOLERANCE of the threshold meet it, however the
+        votes and votes cast are rounded.
+
+        Expected winners: A, B, D
+
+        Round 0
+            Ballots:
+                1 * [D, B, E, C, A]
+                2 * [A, B, D]
+                1 * [D, A, E, B]
+                1 * [B, D, C, E]
+                1 * [D, C, A, B]
+            Votes:
+                A: 2
+                B: 1
+                C: 0
+                D: 3
+                E: 0
+            Threshold: (6) / (3+1) + 1 = 2.5
+            Result: D is elected
+        Round 1
+            Surplus: 1/2, transferred at 1/6 per ballot
+            Votes:
+                A: 2 + 1/6 (rounded to 2.1666666666666665)
+                B: 1 + 1/6
+                C: 1/6
+                E: 0
+            Threshold: (3 + 1/2) / (2+1) + 1 = 2 + 1/6 (rounded to 2.166666666666667)
+            Result: A is elected at exactly the threshold
+        """
+        # Setup
+        expected_winners = set(candidates_for_ids(['A', 'B', 'D']))
+        seats = 3
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['D', 'B', 'E', 'C', 'A'], 1) +
+            ballots_for_ids(['A', 'B', 'D'], 2) +
+            ballots_for_ids(['D', 'A', 'E', 'B'], 1) +
+            ballots_for_ids(['B', 'D', 'C', 'E'], 1) +
+            ballots_for_ids(['D', 'C', 'A', 'B'], 1))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        self.assertEqual(expected_winners, results.candidates_elected)
+        self.assertEqual(results.election_rounds[1].candidates_elected, set(candidates_for_ids(['A'])))
+        self.assertLess(results.election_rounds[1].vote_tracker.votes_for_candidate(candidates_for_ids(['A'])[0]),
+                        results.election_rounds[1].threshold)
+
 
 class TestNoConfidence(unittest.TestCase):
 
@@ -603,6 +729,59 @@ class TestNoConfidence(unittest.TestCase):
 
 class TestTiebreaks(unittest.TestCase):
 
+    def test_elimination_tie_rounded_apart(self):
+        """Tests a tie to eliminate a candidate between equal votes rounded to
+            different values.
+
+        Expected winners: A, B, C
+
+        Round 0
+            Votes: A: 4, B: 2, C: 6, D: 1, E: 2
+            Result: C is elected
+        Round 1
+            Votes: A: 53/12, B: 53/24, D: 17/12, E: 53/24
+            Result: A is elected
+        Round 2
+            Votes: B: 53/24, D: 17/12, E: 53/24
+            Result: D is eliminated
+        Round 3
+            Votes: B: 29/12 (rounded to 2.416666666666667),
+                   E: 29/12 (rounded to 2.4166666666666674)
+            Result: B and E are tied in every previous round, and E has fewer
+                votes in the next rank, so E is eliminated
+        Round 4
+            Result: B is elected
+        """
+        # Setup
+        expected_winners = set(candidates_for_ids(['A', 'B', 'C']))
+        seats = 3
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['B', 'E', 'A', 'D'], 1) +
+            ballots_for_ids(['C', 'B'], 1) +
+            ballots_for_ids(['C', 'E', 'D', 'A'], 1) +
+            ballots_for_ids(['B', 'D', 'E', 'C'], 1) +
+            ballots_for_ids(['A', 'B', 'D', 'E', 'C'], 1) +
+            ballots_for_ids(['E', 'D', 'C', 'B'], 1) +
+            ballots_for_ids(['C', 'A', 'D', 'B'], 1) +
+            ballots_for_ids(['C', 'A', 'B', 'E'], 1) +
+            ballots_for_ids(['A', 'E', 'B'], 1) +
+            ballots_for_ids(['E', 'B', 'C', 'A', 'D'], 1) +
+            ballots_for_ids(['A', 'E', 'C', 'B', 'D'], 1) +
+            ballots_for_ids(['C', 'D', 'A', 'E', 'B'], 1) +
+            ballots_for_ids(['C', 'D', 'A', 'B'], 1) +
+            ballots_for_ids(['D'], 1) +
+            ballots_for_ids(['A', 'E'], 1))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        self.assertEqual(expected_winners, results.candidates_elected)
+        self.assertEqual(results.election_rounds[3].candidates_eliminated, set(candidates_for_ids(['E'])))
+        self.assertFalse(results.election_rounds[3].random_tiebreak_occurred)
+
     def test_bulk_elimination(self):
         """Tests a 4 candidate election for 2 seats.
 
@@ -1327,5 +1506,1209 @@ class TestLargeElections(unittest.TestCase):
         self.assertEqual(expected_winners, results.candidates_elected)
 
 
+class TestTimings(unittest.TestCase):
+
+    def test_timings_not_recorded_by_default(self):
+        """Tests that no Timings are recorded unless requested."""
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        self.assertIsNone(results.timings)
+        for election_round in results.election_rounds:
+            self.assertIsNone(election_round.timings)
+
+    def test_timings_recorded(self):
+        """Tests the phases and counters recorded for a forward tiebreak.
+
+        Round 0 scans 12 ballots and transfers the surplus of A's 6 ballots.
+        Round 1 rescans only A's 6 ballots, advancing past A and exhausting
+        them, and requires a forward tiebreak between B and C.
+        """
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results(record_timings=True)
+        first_round = results.election_rounds[0].timings
+        second_round = results.election_rounds[1].timings
+        self.assertEqual(first_round.counters, {'ballots_scanned': 12,
+                                                'pointer_advances': 0,
+                                                'ballots_exhausted': 0,
+                                                'transfers': 6})
+        self.assertIn('surplus_transfer', first_round.durations)
+        self.assertEqual(second_round.counters['ballots_scanned'], 6)
+        self.assertEqual(second_round.counters['pointer_advances'], 6)
+        self.assertEqual(second_round.counters['ballots_exhausted'], 6)
+        self.assertIn('tiebreak_backward', second_round.durations)
+        self.assertIn('tiebreak_forward', second_round.durations)
+        self.assertNotIn('tiebreak_random', second_round.durations)
+        self.assertEqual(results.timings.counters['ballots_exhausted'], 6)
+        self.assertIn('total', results.timings.durations)
+        self.assertIn('Round 1:', results.timings_description())
+
+
+class TestElectionSummary(unittest.TestCase):
+
+    def test_summary_matches_results(self):
+        """Tests that an ElectionSummary matches the full ElectionResults."""
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        summary = election.compute_results(summary_only=True)
+        self.assertIsInstance(summary, ElectionSummary)
+        self.assertIsNone(summary.ballots)
+        self.assertEqual(summary.ballot_count, 12)
+        self.assertEqual(summary.ballots_hash, ballots_hash(ballots))
+        self.assertEqual(summary.candidates_elected, results.candidates_elected)
+        self.assertEqual(summary.description(), results.description())
+        self.assertNotIn('Ballot(', repr(summary))
+        self.assertIn('<3 rounds>', repr(summary))
+
+    def test_ballots_hash(self):
+        """Tests that the ballots hash ignores order but not rankings."""
+        ballots = (
+            ballots_for_ids(['A', 'B'], 2) +
+            ballots_for_ids(['B'], 1))
+        reordered_ballots = (
+            ballots_for_ids(['B'], 1) +
+            ballots_for_ids(['A', 'B'], 2))
+        changed_ballots = (
+            ballots_for_ids(['A', 'B'], 1) +
+            ballots_for_ids(['B'], 2))
+        self.assertEqual(ballots_hash(ballots), ballots_hash(reordered_ballots))
+        self.assertNotEqual(ballots_hash(ballots), ballots_hash(changed_ballots))
+
+
+class TestDescription(unittest.TestCase):
+
+    def test_write_description(self):
+        """Tests that the streamed description matches description()."""
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        description = io.StringIO()
+        results.write_description(description)
+        self.assertEqual(description.getvalue(), results.description())
+        self.assertIn('\nRound 1:\nElectionRound with threshold 4.0:\n'
+                      'VoteTracker for 6.0 votes:', results.description())
+        self.assertIn('\nCandidates eliminated in this round: '
+                      'gwashington (George Washington)\n', results.description())
+
+
+class TestSerialization(unittest.TestCase):
+
+    def test_as_dict(self):
+        """Tests the serializable representation of ElectionResults.
+
+        A's 6 ballots are worth (6-5)/6 each after A's surplus is transferred,
+        and are exhausted in round 1, so 1 vote is exhausted.
+        """
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results(summary_only=True).as_dict()
+        self.assertEqual(results['candidates_elected'], ['dgund', 'jadams'])
+        self.assertEqual(results['candidates']['jadams'], 'John Adams')
+        self.assertEqual(results['ballot_count'], 12)
+        self.assertEqual(results['rounds'][0], {
+            'threshold': 5.0,
+            'tallies': {'dgund': 6.0, 'gwashington': 3.0, 'jadams': 3.0},
+            'elected': ['dgund'],
+            'eliminated': [],
+            'random_tiebreak_occurred': False,
+            'votes_exhausted': 0.0,
+            'transfers': [],
+        })
+        self.assertEqual(results['rounds'][1]['eliminated'], ['gwashington'])
+        self.assertAlmostEqual(results['rounds'][1]['votes_exhausted'], 1.0)
+
+
+class TestIterRounds(unittest.TestCase):
+
+    def test_iter_rounds(self):
+        """Tests that iter_rounds yields the rounds of compute_results."""
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        election_rounds = list(election.iter_rounds())
+        self.assertEqual([election_round.description() for election_round in election_rounds],
+                         [election_round.description() for election_round in results.election_rounds])
+
+    def test_iter_rounds_stop_early(self):
+        """Tests stopping the election once a Candidate is eliminated."""
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+        candidate_b = candidates_for_ids(['B'])[0]
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        rounds_counted = 0
+        for election_round in election.iter_rounds():
+            rounds_counted += 1
+            if candidate_b in election_round.candidates_eliminated:
+                break
+        self.assertEqual(rounds_counted, 2)
+
+
+class TestTransfers(unittest.TestCase):
+
+    def test_transfers(self):
+        """Tests the vote transfers recorded in each round.
+
+        Round 0: A is elected with a surplus of 1 over 6 ballots.
+        Round 1: A's ballots are exhausted, transferring 1 vote to exhaustion,
+            and B is eliminated.
+        Round 2: B's 3 ballots are transferred to C.
+        """
+        # Setup
+        seats = 2
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['A'], 6) +
+            ballots_for_ids(['B', 'C'], 3) +
+            ballots_for_ids(['C'], 3))
+        candidate_a, candidate_b, candidate_c = candidates_for_ids(['A', 'B', 'C'])
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        first_round, second_round, third_round = results.election_rounds
+        self.assertEqual(first_round.transfers, {})
+        self.assertEqual(list(second_round.transfers[candidate_a]), [None])
+        self.assertAlmostEqual(second_round.transfers[candidate_a][None], 1.0)
+        self.assertEqual(third_round.transfers, {candidate_b: {candidate_c: 3.0}})
+        self.assertEqual(third_round.transfer_links(),
+                         [{'from': 'gwashington', 'to': 'jadams', 'votes': 3.0}])
+
+
+class TestPairwiseComparison(unittest.TestCase):
+
+    def test_pairwise_comparison(self):
+        """Tests head-to-head preferences and the Condorcet winner and loser.
+
+        Ballots:
+            4 * [A, B]
+            3 * [B, C, NC]
+            2 * [C, A]
+        Head-to-head:
+            A vs B: 6 - 3
+            A vs C: 4 - 5
+            A vs NC: 6 - 3
+            B vs C: 7 - 2
+            B vs NC: 7 - 0
+            C vs NC: 5 - 0
+        Result: A beats B, B beats C, and C beats A, so there is no Condorcet
+            winner. NC loses every comparison and is the Condorcet loser.
+        """
+        # Setup
+        ballots = (
+            ballots_for_ids(['A', 'B'], 4) +
+            ballots_for_ids(['B', 'C', 'NC'], 3) +
+            ballots_for_ids(['C', 'A'], 2))
+        candidate_a, candidate_b, candidate_c, no_confidence = candidates_for_ids(['A', 'B', 'C', 'NC'])
+
+        # Test
+        election = Election(seats=1, ballots=ballots)
+        comparison = election.pairwise_comparison()
+        self.assertEqual(set(comparison.candidates),
+                         {candidate_a, candidate_b, candidate_c, no_confidence})
+        self.assertEqual(comparison.preferences(candidate_a, candidate_b), 6.0)
+        self.assertEqual(comparison.preferences(candidate_b, candidate_a), 3.0)
+        self.assertEqual(comparison.preferences(candidate_a, candidate_c), 4.0)
+        self.assertEqual(comparison.preferences(candidate_c, candidate_a), 5.0)
+        self.assertEqual(comparison.preferences(candidate_c, no_confidence), 5.0)
+        self.assertEqual(comparison.preferences(no_confidence, candidate_c), 0.0)
+        self.assertEqual(comparison.preferences(no_confidence, candidate_a), 3.0)
+        self.assertIsNone(comparison.condorcet_winner())
+        self.assertEqual(comparison.condorcet_loser(), no_confidence)
+
+    def test_condorcet_winner(self):
+        """Tests a Condorcet winner who is not the first-preference leader.
+
+        Ballots:
+            4 * [A, B]
+            3 * [C, B]
+            2 * [B]
+        Result: B beats A 5 - 4 and C 6 - 3, so B is the Condorcet winner.
+        """
+        # Setup
+        ballots = (
+            ballots_for_ids(['A', 'B'], 4) +
+            ballots_for_ids(['C', 'B'], 3) +
+            ballots_for_ids(['B'], 2))
+
+        # Test
+        election = Election(seats=1, ballots=ballots)
+        comparison = election.pairwise_comparison()
+        self.assertEqual(comparison.condorcet_winner(), candidates_for_ids(['B'])[0])
+
+    @unittest.skipIf(run.numpy is None, 'numpy is not installed')
+    def test_pairwise_counts_numpy(self):
+        """Tests that counting pairs with NumPy, in chunks of any size, matches
+            the Python count."""
+        # Setup
+        rankings = [[0, 1, 2, 3], [2, 0], [], [3], [1, 3, 0], [3, 2, 1, 0], [0, 2]]
+        weights = [4.0, 3.0, 1.0, 2.5, 1.0, 0.5, 6.0]
+
+        # Test
+        for chunk_pairs in (1, 2, 1 << 22):
+            with unittest.mock.patch('election.PAIRWISE_CHUNK_PAIRS', chunk_pairs):
+                self.assertEqual(_pairwise_counts_numpy(rankings, weights, 4), _pairwise_counts(rankings, weights, 4))
+
+
+class TestShardedCount(unittest.TestCase):
+
+    def test_sharded_count_matches(self):
+        """Tests that counting in worker processes gives identical results."""
+        # Setup
+        seats = 6
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['G', 'F', 'H'], 14) +
+            ballots_for_ids(['J'], 12) +
+            ballots_for_ids(['F', 'G'], 11) +
+            ballots_for_ids(['A', 'B', 'C'], 11) +
+            ballots_for_ids(['D', 'E', 'A'], 8) +
+            ballots_for_ids(['D', 'E', 'A', 'B'], 8) +
+            ballots_for_ids(['D', 'E', 'C', 'F'], 8) +
+            ballots_for_ids(['E', 'D', 'F', 'G', 'H'], 8) +
+            ballots_for_ids(['E', 'D', 'G'], 8) +
+            ballots_for_ids(['D', 'E', 'NC'], 8) +
+            ballots_for_ids(['I', 'A', 'B', 'C'], 7) +
+            ballots_for_ids(['H', 'G'], 6) +
+            ballots_for_ids(['C', 'B', 'A'], 6) +
+            ballots_for_ids(['J', 'NC'], 6) +
+            ballots_for_ids(['B', 'A', 'C'], 3) +
+            ballots_for_ids(['I', 'A', 'C', 'B'], 3))
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results()
+        sharded_results = election.compute_results(processes=3)
+        self.assertEqual(sharded_results.candidates_elected, results.candidates_elected)
+        self.assertEqual(sharded_results.as_dict(), results.as_dict())
+
+
+class TestConcurrentCounts(unittest.TestCase):
+
+    def test_shared_election_across_threads(self):
+        """Tests that threads counting one Election at once give identical
+            results without modifying the Ballots."""
+        # Setup
+        seats = 3
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['G', 'F', 'H'], 14) +
+            ballots_for_ids(['J'], 12) +
+            ballots_for_ids(['F', 'G'], 11) +
+            ballots_for_ids(['A', 'B', 'C'], 11) +
+            ballots_for_ids(['D', 'E', 'A'], 8) +
+            ballots_for_ids(['E', 'D', 'F', 'G', 'H'], 8) +
+            ballots_for_ids(['J', 'NC'], 6) +
+            ballots_for_ids(['B', 'A', 'C'], 3))
+        ballot_reprs = [repr(ballot) for ballot in ballots]
+
+        # Test
+        election = Election(seats=seats,
+                            ballots=ballots,
+                            random_alphanumeric=tiebreak_alphanumeric)
+        results = election.compute_results(summary_only=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(election.compute_results, record_timings=(i % 2 == 0), summary_only=True)
+                       for i in range(8)]
+            concurrent_results = [future.result() for future in futures]
+        for other_results in concurrent_results:
+            self.assertEqual(other_results.candidates_elected, results.candidates_elected)
+            self.assertEqual([election_round.vote_tracker for election_round in other_results.election_rounds],
+                             [election_round.vote_tracker for election_round in results.election_rounds])
+        self.assertEqual([repr(ballot) for ballot in ballots], ballot_reprs)
+
+
+class TestSeatSweep(unittest.TestCase):
+
+    def test_seat_sweep_matches(self):
+        """Tests that a seat sweep gives the results of separate counts."""
+        # Setup
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+        ballots = (
+            ballots_for_ids(['G', 'F', 'H'], 14) +
+            ballots_for_ids(['J'], 12) +
+            ballots_for_ids(['F', 'G'], 11) +
+            ballots_for_ids(['A', 'B', 'C'], 11) +
+            ballots_for_ids(['D', 'E', 'A'], 8) +
+            ballots_for_ids(['E', 'D', 'G'], 8) +
+            ballots_for_ids(['D', 'E', 'NC'], 8) +
+            ballots_for_ids(['I', 'A', 'B', 'C'], 7) +
+            ballots_for_ids(['H', 'G'], 6) +
+            ballots_for_ids(['C', 'B', 'A'], 6) +
+            ballots_for_ids(['B', 'A', 'C'], 3))
+
+        # Test
+        election = Election(seats=1, ballots=ballots, random_alphanumeric=tiebreak_alphanumeric)
+        sweep = election.compute_seat_sweep(range(1, 6))
+        self.assertEqual(list(sweep.results_for_seats), [1, 2, 3, 4, 5])
+        self.assertEqual(sweep.shared_rounds, 3)
+        for seats, results in sweep.results_for_seats.items():
+            separate_results = Election(seats=seats, ballots=ballots,
+                                        random_alphanumeric=tiebreak_alphanumeric).compute_results(summary_only=True)
+            self.assertEqual(results.as_dict(), separate_results.as_dict())
+        self.assertEqual(sweep.as_dict()['results'][0]['candidates_elected'],
+                         sorted(candidate.uid for candidate in sweep.results_for_seats[1].candidates_elected))
+        self.assertEqual(election.compute_seat_sweep([2, 4], processes=2).as_dict()['results'],
+                         [result for result in sweep.as_dict()['results'] if result['seats'] in (2, 4)])
+
+
+class TestWithdrawal(unittest.TestCase):
+
+    def test_ballots_without_candidates(self):
+        """Tests withdrawing a Candidate from Ballots.
+
+        Ballots:
+            4 * [A, B]
+            3 * [B, A]
+            2 * [C, A]
+        Withdrawn: A
+        Result: B wins with 7 votes once A's votes move to B.
+        """
+        # Setup
+        ballots = (
+            ballots_for_ids(['A', 'B'], 4) +
+            ballots_for_ids(['B', 'A'], 3) +
+            ballots_for_ids(['C', 'A'], 2))
+        candidate_a, candidate_b = candidates_for_ids(['A', 'B'])
+
+        # Test
+        withdrawn_ballots = ballots_without_candidates(ballots, {candidate_a})
+        self.assertEqual(len(withdrawn_ballots), len(ballots))
+        self.assertTrue(all(candidate_a not in ballot.candidates for ballot in withdrawn_ballots))
+        self.assertEqual(ballots[0].candidates[0], candidate_a)
+        results = Election(seats=1, ballots=withdrawn_ballots).compute_results()
+        self.assertEqual(results.candidates_elected, {candidate_b})
+
+    def test_compute_withdrawals(self):
+        """Tests recounting with each Candidate withdrawn in turn.
+
+        Ballots:
+            4 * [A, B]
+            3 * [B, A]
+            2 * [C, B]
+        Result: C is eliminated, then A, and B wins. Withdrawing A or C
+            changes nothing, and withdrawing B elects A.
+        """
+        # Setup
+        ballots = (
+            ballots_for_ids(['A', 'B'], 4) +
+            ballots_for_ids(['B', 'A'], 3) +
+            ballots_for_ids(['C', 'B'], 2))
+        candidate_a, candidate_b, candidate_c = candidates_for_ids(['A', 'B', 'C'])
+
+        # Test
+        analysis = Election(seats=1, ballots=ballots).compute_withdrawals()
+        self.assertEqual(list(analysis.results_for_withdrawn), [candidate_a, candidate_b, candidate_c])
+        for candidate, results in analysis.results_for_withdrawn.items():
+            separate_results = Election(seats=1, ballots=ballots_without_candidates(ballots, {candidate})).compute_results()
+            self.assertEqual(results.candidates_elected, separate_results.candidates_elected)
+        self.assertEqual(analysis.results.candidates_elected, {candidate_b})
+        self.assertEqual(analysis.changes(candidate_a), (set(), set()))
+        self.assertEqual(analysis.changes(candidate_b), ({candidate_a}, set()))
+        self.assertEqual(analysis.withdrawals_changing_results(), [candidate_b])
+        parallel_analysis = Election(seats=1, ballots=ballots).compute_withdrawals(processes=2)
+        self.assertEqual({candidate: results.candidates_elected
+                          for candidate, results in parallel_analysis.results_for_withdrawn.items()},
+                         {candidate: results.candidates_elected
+                          for candidate, results in analysis.results_for_withdrawn.items()})
+
+
+class TestMargin(unittest.TestCase):
+
+    def test_compute_margin(self):
+        """Tests estimating the fewest changed Ballots that alter the results.
+
+        Ballots:
+            40 * [A]
+            10 * [B]
+            3 * [C]
+        Result: A wins in the first round, 12.5 votes above the threshold.
+            Changing 5 Ballots may move A to the threshold, and changing 15
+            Ballots from A to B ties A and B, and the tiebreak elects B.
+        """
+        # Setup
+        ballots = (
+            ballots_for_ids(['A'], 40) +
+            ballots_for_ids(['B'], 10) +
+            ballots_for_ids(['C'], 3))
+        candidate_a, candidate_b = candidates_for_ids(['A', 'B'])
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+
+        # Test
+        analysis = Election(seats=1, ballots=ballots, random_alphanumeric=tiebreak_alphanumeric).compute_margin()
+        self.assertEqual(analysis.results.candidates_elected, {candidate_a})
+        self.assertEqual(analysis.lower_bound, 5)
+        self.assertEqual(analysis.lower_bound_round, 0)
+        self.assertEqual(analysis.upper_bound, 15)
+        changed_ballots = list(ballots)
+        for ballot_index, ballot, changed_ballot in analysis.witness:
+            self.assertEqual(ballot.candidates, [candidate_a])
+            self.assertEqual(changed_ballot.candidates, [candidate_b])
+            changed_ballots[ballot_index] = changed_ballot
+        results = Election(seats=1, ballots=changed_ballots, random_alphanumeric=tiebreak_alphanumeric).compute_results()
+        self.assertEqual(results.candidates_elected, {candidate_b})
+        self.assertEqual(analysis.witness_results.candidates_elected, {candidate_b})
+
+    def test_compute_margin_close_eliminations(self):
+        """Tests that close eliminations that cannot change the results are
+            not counted in the lower bound.
+
+        Ballots:
+            40 * [A, B]
+            35 * [B, A]
+            30 * [C]
+            6 * [D, C]
+            5 * [E, C]
+        Result: E and D are eliminated one vote apart, but both transfer to C
+            in either order without reaching the threshold, so 1 changed Ballot
+            cannot alter the results. Changing 3 Ballots from [A, B] to [B, A]
+            eliminates A instead of B, and B is elected.
+        """
+        # Setup
+        ballots = (
+            ballots_for_ids(['A', 'B'], 40) +
+            ballots_for_ids(['B', 'A'], 35) +
+            ballots_for_ids(['C'], 30) +
+            ballots_for_ids(['D', 'C'], 6) +
+            ballots_for_ids(['E', 'C'], 5))
+        candidate_a, candidate_b = candidates_for_ids(['A', 'B'])
+        tiebreak_alphanumeric = 'abcdefghijklmnopqrstuvwxyz'
+
+        # Test
+        analysis = Election(seats=1, ballots=ballots, random_alphanumeric=tiebreak_alphanumeric).compute_margin()
+        self.assertEqual(analysis.results.candidates_elected, {candidate_a})
+        self.assertEqual(analysis.lower_bound, 3)
+        self.assertEqual(analysis.lower_bound_round, 2)
+        self.assertEqual(analysis.upper_bound, 3)
+        self.assertEqual(analysis.witness_results.candidates_elected, {candidate_b})
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        """Creates Ballots with each issue.
+
+        Ballots:
+            2 * [A, B, A]
+            3 * [B, NC, C]
+            1 * [A, D]
+            1 * []
+            4 * [C, B]
+        Candidates: A, B, C
+        """
+        self.ballots = (
+            ballots_for_ids(['A', 'B', 'A'], 2) +
+            ballots_for_ids(['B', 'NC', 'C'], 3) +
+            ballots_for_ids(['A', 'D'], 1) +
+            ballots_for_ids([], 1) +
+            ballots_for_ids(['C', 'B'], 4))
+        self.known_candidates = set(candidates_for_ids(['A', 'B', 'C']))
+
+    def test_report(self):
+        """Tests that issues are counted and Ballots are kept by default."""
+        # Test
+        ballots, report = validation.validate_ballots(self.ballots, known_candidates=self.known_candidates)
+        self.assertEqual(ballots, self.ballots)
+        self.assertEqual(report.ballot_count, 11)
+        self.assertEqual(report.issue_counts, {validation.DUPLICATE_CANDIDATE: 2,
+                                               validation.RANKED_AFTER_NO_CONFIDENCE: 3,
+                                               validation.UNKNOWN_CANDIDATE: 1,
+                                               validation.EMPTY_BALLOT: 1})
+        self.assertEqual((report.repaired_count, report.rejected_count), (0, 0))
+
+    def test_repair_and_reject(self):
+        """Tests repairing every issue except duplicates, which are rejected."""
+        # Setup
+        policy_for_issue = validation.policy_for_issue_from_specs(['repair', 'duplicate=reject'])
+
+        # Test
+        ballots, report = validation.validate_ballots(self.ballots, known_candidates=self.known_candidates,
+                                                      policy_for_issue=policy_for_issue)
+        self.assertEqual(ballots, (ballots_for_ids(['B', 'NC'], 3) +
+                                   ballots_for_ids(['A'], 1) +
+                                   ballots_for_ids(['C', 'B'], 4)))
+        self.assertEqual((report.repaired_count, report.rejected_count), (4, 3))
+
+    def test_invalid_policy(self):
+        """Tests that unknown issues and policies are rejected."""
+        with self.assertRaises(ValueError):
+            validation.policy_for_issue_from_specs(['discard'])
+        with self.assertRaises(ValueError):
+            validation.policy_for_issue_from_specs(['misspelled=repair'])
+
+
+class TestBallotsFromFile(unittest.TestCase):
+
+    def setUp(self):
+        """Creates a temporary directory for ballot files."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.csv = 'A (Alice),B,C\nB,NC,\nC,A,\n'
+        self.ballots = run.ballots_from_csv_stream(io.StringIO(self.csv))
+
+    def tearDown(self):
+        """Removes the temporary directory."""
+        self.directory.cleanup()
+
+    def test_compressed_ballot_files(self):
+        """Tests that compressed ballot files are decompressed while parsed."""
+        for extension, compress in [('', bytes), ('.gz', gzip.compress), ('.bz2', bz2.compress), ('.xz', lzma.compress)]:
+            # Setup
+            filename = os.path.join(self.directory.name, 'ballots.csv' + extension)
+            with open(filename, 'wb') as f:
+                f.write(compress(self.csv.encode('utf-8')))
+
+            # Test
+            self.assertEqual(run.ballots_from_file(filename, use_sidecar=False), self.ballots)
+
+    def test_ballots_sidecar(self):
+        """Tests that the sidecar file is used until the ballot file changes."""
+        # Setup
+        filename = os.path.join(self.directory.name, 'ballots.txt')
+        with open(filename, 'w') as f:
+            f.write(self.csv)
+
+        # Test
+        self.assertEqual(run.ballots_from_file(filename), self.ballots)
+        self.assertFalse(os.path.exists(filename + run.SIDECAR_SUFFIX))
+        self.assertEqual(run.ballots_from_file(filename, use_sidecar=True), self.ballots)
+        self.assertTrue(os.path.exists(filename + run.SIDECAR_SUFFIX))
+        self.assertEqual(run.ballots_from_file(filename, use_sidecar=True), self.ballots)
+        self.assertEqual(run.ballots_from_sidecar(filename + run.SIDECAR_SUFFIX, dict(run.file_signature(filename), delimiter=None)),
+                         self.ballots)
+        with open(filename, 'a') as f:
+            f.write('A\n')
+        self.assertIsNone(run.ballots_from_sidecar(filename + run.SIDECAR_SUFFIX, dict(run.file_signature(filename), delimiter=None)))
+        self.assertEqual(len(run.ballots_from_file(filename, use_sidecar=True)), len(self.ballots) + 1)
+
+    def test_csv_dialects(self):
+        """Tests that split, quoted, and explicitly delimited CSV rows parse
+            alike, and that Candidates are shared between Ballots."""
+        # Setup
+        quoted_csv = '"A (Alice)",B,C\nB,"NC",\nC,A,\n'
+        semicolon_csv = self.csv.replace(',', ';')
+
+        # Test
+        self.assertEqual(run.ballots_from_csv_stream(io.StringIO(quoted_csv)), self.ballots)
+        self.assertEqual(run.ballots_from_csv_stream(io.StringIO(semicolon_csv), delimiter=';'), self.ballots)
+        self.assertEqual(run.ballots_from_txt_stream(io.StringIO(self.csv.replace(',', ' , '))), self.ballots)
+        self.assertEqual(self.ballots[0].candidates[0].name, 'Alice')
+        self.assertIs(self.ballots[1].candidates[0], self.ballots[0].candidates[1])
+
+    def test_rank_matrix(self):
+        """Tests reading a rank matrix, with one column per Candidate, under
+            each tie rule."""
+        # Setup
+        matrix_csv = 'A (Alice),B,C,NC\n2,1,,\n1,1,2,\n,3,1,\n2,1,,\n'
+        filename = os.path.join(self.directory.name, 'matrix.csv')
+        with open(filename, 'w') as f:
+            f.write(matrix_csv)
+
+        # Test
+        ballots = run.ballots_from_file(filename, use_sidecar=True, rank_matrix_ties=run.TIES_TRUNCATE)
+        self.assertEqual(ballots, run.ballots_from_csv_stream(io.StringIO('B,A (Alice)\n\nC,B\nB,A (Alice)\n')))
+        self.assertIs(ballots[0].candidates, ballots[3].candidates)
+        self.assertEqual(ballots_hash(run.ballots_from_file(filename, use_sidecar=True, rank_matrix_ties=run.TIES_TRUNCATE)),
+                         ballots_hash(ballots))
+        self.assertEqual([len(ballot.candidates) for ballot in
+                          run.ballots_from_rank_matrix_stream(io.StringIO(matrix_csv), ties=run.TIES_SKIP)], [2, 1, 2, 2])
+        self.assertEqual([[candidate.uid for candidate in ballot.candidates] for ballot in
+                          run.ballots_from_rank_matrix_stream(io.StringIO(matrix_csv), ties=run.TIES_COLUMN)],
+                         [['B', 'A'], ['A', 'B', 'C'], ['C', 'B'], ['B', 'A']])
+        with self.assertRaises(ValueError):
+            run.ballots_from_rank_matrix_stream(io.StringIO('A,B\n1,first\n'), delimiter=',')
+
+    def test_blt_and_weighted_csv(self):
+        """Tests writing and reading BLT and weighted CSV ballots, which count
+            like the Ballots they combine."""
+        # Setup
+        blt = '3 1\n-3\n2 1 2 0\n(b2) 1 3 2 0\n0\n"A (Alice)"\n"B"\n"C"\n"Title"\n'
+        ballots = self.ballots + self.ballots[:1]
+        filename = os.path.join(self.directory.name, 'ballots.blt')
+
+        # Test
+        blt_ballots, seats, title = run.blt_from_stream(io.StringIO(blt))
+        self.assertEqual((seats, title), (1, 'Title'))
+        self.assertEqual([ballot.vote_value for ballot in blt_ballots], [2.0, 1.0])
+        self.assertEqual([[candidate.uid for candidate in ballot.candidates] for ballot in blt_ballots], [['A', 'B'], ['B']])
+        with open(filename, 'w') as f:
+            run.write_blt(f, ballots, 1, title='Title')
+        self.assertEqual([ballot.vote_value for ballot in run.ballots_from_file(filename)], [2.0, 1.0, 1.0])
+        weighted_csv = io.StringIO()
+        run.write_weighted_csv(weighted_csv, ballots)
+        self.assertEqual(weighted_csv.getvalue(), '2,A (Alice),B,C\n1,B,No Confidence\n1,C,A (Alice)\n')
+        for weighted_ballots in (run.ballots_from_file(filename),
+                                 run.ballots_from_weighted_csv_stream(io.StringIO(weighted_csv.getvalue()))):
+            results = Election(weighted_ballots, 1, random_alphanumeric='ABC').compute_results()
+            expected_results = Election(ballots, 1, random_alphanumeric='ABC').compute_results()
+            self.assertEqual([election_round.vote_tracker for election_round in results.election_rounds],
+                             [election_round.vote_tracker for election_round in expected_results.election_rounds])
+        with self.assertRaises(ValueError):
+            run.blt_from_stream(io.StringIO('3 1\n2 1 4 0\n0\n'))
+
+    @unittest.skipIf(run.numpy is None, 'numpy is not installed')
+    def test_numpy_ballot_files(self):
+        """Tests writing and reading NumPy ranking matrices, which count like
+            the Ballots they combine."""
+        # Setup
+        ballots = self.ballots + self.ballots[:1]
+        npy_filename = os.path.join(self.directory.name, 'ballots.npy')
+        npz_filename = os.path.join(self.directory.name, 'ballots.npz')
+        run.numpy.save(npy_filename, run.numpy.array([[1, 0, -1], [2, -1, -1], [1, 0, -1]]))
+
+        # Test
+        npy_ballots = run.ballots_from_file(npy_filename)
+        self.assertEqual(npy_ballots, run.ballots_from_csv_stream(io.StringIO('2,1\n3\n2,1\n'), delimiter=','))
+        self.assertIs(npy_ballots[0].candidates, npy_ballots[2].candidates)
+        with open(npz_filename, 'wb') as f:
+            run.write_numpy(f, ballots)
+        npz_ballots = run.ballots_from_file(npz_filename)
+        self.assertEqual(sorted(ballot.vote_value for ballot in npz_ballots), [1.0, 1.0, 2.0])
+        results = Election(npz_ballots, 1, random_alphanumeric='ABC').compute_results()
+        expected_results = Election(ballots, 1, random_alphanumeric='ABC').compute_results()
+        self.assertEqual([election_round.vote_tracker for election_round in results.election_rounds],
+                         [election_round.vote_tracker for election_round in expected_results.election_rounds])
+        run.numpy.savez(npz_filename, rankings=run.numpy.array([[0, 3]]), candidates=run.numpy.array(['A', 'B']))
+        with self.assertRaises(ValueError):
+            run.ballots_from_file(npz_filename)
+
+    def test_races_from_csv(self):
+        """Tests reading the Ballots of several races from groups of columns in
+            one pass, and counting the races in parallel."""
+        # Setup
+        races_csv = 'P1,P2,S1,S2,S3\nA (Alice),B,C,D,E\nB,,,,\n,,E,D,\n'
+        filename = os.path.join(self.directory.name, 'races.csv.gz')
+        with open(filename, 'wb') as f:
+            f.write(gzip.compress(races_csv.encode('utf-8')))
+        columns_for_race = run.races_from_input(['President:1=1-2', 'Senate=3-5'], 2)
+
+        # Test
+        self.assertEqual(columns_for_race, {'President': (1, [0, 1]), 'Senate': (2, [2, 3, 4])})
+        ballots_for_race = run.ballots_for_races_from_file(
+            filename, {race: columns for race, (_, columns) in columns_for_race.items()}, skip_header=True)
+        self.assertEqual(ballots_for_race['President'],
+                         run.ballots_from_csv_stream(io.StringIO('A (Alice),B\nB,\n')))
+        self.assertEqual(ballots_for_race['Senate'],
+                         run.ballots_from_csv_stream(io.StringIO('C,D,E\nE,D,\n')))
+        elections = [Election(ballots_for_race[race], seats, name=race, random_alphanumeric='ABCDE')
+                     for race, (seats, _) in columns_for_race.items()]
+        results = run.compute_races_results(elections, processes=2)
+        self.assertEqual([race_results.as_dict() for race_results in results],
+                         [election.compute_results(summary_only=True).as_dict() for election in elections])
+        with self.assertRaises(ValueError):
+            run.races_from_input(['Senate'], 2)
+
+    def test_invalid_filetype(self):
+        """Tests that files that are not CSV or TXT are rejected, and that races
+            are read only from CSV files."""
+        with self.assertRaises(ValueError):
+            run.ballots_from_file('ballots.json.gz')
+        for filename in ('ballots.npy', 'ballots.npz', 'ballots.txt.gz'):
+            with self.assertRaises(ValueError):
+                run.ballots_for_races_from_file(filename, {'President': [0, 1]})
+
+
+class BallotFileHandler(http.server.BaseHTTPRequestHandler):
+    """Serves a ballot file with range requests, optionally interrupting the
+        first responses partway through the body.
+
+    Attributes (of the server):
+        body: Bytes of the served file.
+        content_encoding: String Content-Encoding of the body, or None.
+        interruptions: Integer number of responses still to interrupt.
+        ranges: List of the Range headers of the requests.
+    """
+
+    def do_GET(self):
+        """Serves the ballot file, or the requested range of it."""
+        body = self.server.body
+        start = 0
+        range_header = self.headers.get('Range')
+        self.server.ranges.append(range_header)
+        if range_header is not None:
+            start = int(range_header[len('bytes='):-len('-')])
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, len(body) - 1, len(body)))
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.send_header('ETag', '"ballots"')
+        if self.server.content_encoding is not None:
+            self.send_header('Content-Encoding', self.server.content_encoding)
+        self.end_headers()
+
+        if self.server.interruptions > 0:
+            self.server.interruptions -= 1
+            self.wfile.write(body[start:start + (len(body) - start) // 2])
+        else:
+            self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        """Silences request logging."""
+        pass
+
+
+class TestBallotsFromURL(unittest.TestCase):
+
+    def setUp(self):
+        """Starts a local server for a ballot file of 3000 ballots."""
+        self.csv = ''.join('{},{},{}\n'.format(*ids) for ids in [('A', 'B', 'C'), ('B', 'NC', ''), ('C', 'A', '')] * 1000)
+        self.server = http.server.HTTPServer(('127.0.0.1', 0), BallotFileHandler)
+        self.server.body = self.csv.encode('utf-8')
+        self.server.content_encoding = None
+        self.server.interruptions = 0
+        self.server.ranges = list()
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:{}/ballots.csv'.format(self.server.server_address[1])
+
+    def tearDown(self):
+        """Stops the local server."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_ballots_from_url(self):
+        """Tests that downloaded ballots match the parsed file and progress is
+            reported up to the whole body."""
+        # Setup
+        progress = list()
+
+        # Test
+        ballots = run.ballots_from_url(self.url, progress=lambda position, length: progress.append((position, length)))
+        self.assertEqual(ballots, run.ballots_from_csv_stream(io.StringIO(self.csv)))
+        self.assertEqual(len(ballots), 3000)
+        self.assertEqual(progress[-1], (len(self.server.body), len(self.server.body)))
+
+    def test_ballots_from_url_gzip(self):
+        """Tests that a gzip-encoded download is decompressed."""
+        # Setup
+        self.server.body = gzip.compress(self.csv.encode('utf-8'))
+        self.server.content_encoding = 'gzip'
+
+        # Test
+        ballots = run.ballots_from_url(self.url)
+        self.assertEqual(ballots, run.ballots_from_csv_stream(io.StringIO(self.csv)))
+
+    def test_ballots_from_url_resume(self):
+        """Tests that an interrupted download is resumed with range requests."""
+        # Setup
+        self.server.interruptions = 2
+        length = len(self.server.body)
+
+        # Test
+        ballots = run.ballots_from_url(self.url)
+        self.assertEqual(ballots, run.ballots_from_csv_stream(io.StringIO(self.csv)))
+        self.assertEqual(self.server.ranges, [None,
+                                              'bytes={}-'.format(length // 2),
+                                              'bytes={}-'.format(length // 2 + (length - length // 2) // 2)])
+
+    def test_service_ballots_from_input(self):
+        """Tests that the service names ballot sets without splitting URLs at
+            an '=' in their query string."""
+        # Setup
+        url = self.url + '?token=abc&format=csv'
+        expected_ballots = run.ballots_from_csv_stream(io.StringIO(self.csv))
+
+        # Test
+        self.assertEqual(service.ballots_from_input(url), ('ballots', expected_ballots))
+        self.assertEqual(service.ballots_from_input('senate=' + url), ('senate', expected_ballots))
+
+
+class TestElectionService(unittest.TestCase):
+
+    def setUp(self):
+        """Creates an event loop and a service for one ballot set.
+
+        Ballots:
+            4 * [A, B]
+            3 * [B, A]
+            2 * [C, B]
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.ballots = (
+            ballots_for_ids(['A', 'B'], 4) +
+            ballots_for_ids(['B', 'A'], 3) +
+            ballots_for_ids(['C', 'B'], 2))
+        self.service = service.ElectionService(max_workers=2, max_results=2)
+        self.service.add_ballots('senate', self.ballots)
+        self.query = 'seats=1&alphanumeric=abcdefghijklmnopqrstuvwxyz'
+
+    def tearDown(self):
+        """Stops the service and closes the event loop."""
+        self.service._executor.shutdown()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def respond(self, target, headers=None, method='GET'):
+        """Returns the status, headers, and body answering a request."""
+        return self.loop.run_until_complete(self.service.respond(method, target, headers or dict()))
+
+    def exchange(self, request):
+        """Returns the status and decoded body answering a raw request sent
+            over a connection to the service."""
+        async def send_request():
+            server = await self.service.start(port=0)
+            try:
+                reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+                writer.write(request)
+                response = await reader.read()
+                writer.close()
+                return response
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        head, _, body = self.loop.run_until_complete(send_request()).partition(b'\r\n\r\n')
+        return int(head.split()[1]), json.loads(body.decode('utf-8')) if body else None
+
+    def test_respond(self):
+        """Tests the results, round, withdrawal, and conditional endpoints."""
+        # Setup
+        expected_results = Election(self.ballots, 1, name='senate', random_alphanumeric='abcdefghijklmnopqrstuvwxyz')
+        expected_results = expected_results.compute_results(summary_only=True).as_dict()
+        candidate_b = candidates_for_ids(['B'])[0]
+
+        # Test
+        status, _, body = self.respond('/elections')
+        self.assertEqual((status, body), (200, [{'name': 'senate', 'ballot_count': 9,
+                                                 'ballots_hash': ballots_hash(self.ballots)}]))
+        status, headers, body = self.respond('/elections/senate?' + self.query)
+        self.assertEqual((status, body), (200, expected_results))
+        self.assertEqual(self.respond('/elections/senate?' + self.query, {'if-none-match': headers['ETag']})[::2],
+                         (304, None))
+        status, _, body = self.respond('/elections/senate/rounds/0?' + self.query)
+        self.assertEqual((status, body), (200, expected_results['rounds'][0]))
+        status, _, body = self.respond('/elections/senate?withdraw=gwashington&' + self.query)
+        withdrawn_results = Election(ballots_without_candidates(self.ballots, {candidate_b}), 1).compute_results()
+        self.assertEqual(body['candidates_elected'], sorted(candidate.uid for candidate in withdrawn_results.candidates_elected))
+        self.assertEqual(len(self.service._results), 2)
+
+    def test_respond_errors(self):
+        """Tests that invalid requests are answered with error statuses."""
+        for method, target, status in [('GET', '/elections/house?seats=1', 404),
+                                       ('GET', '/elections/senate', 400),
+                                       ('GET', '/elections/senate/votes/0?seats=1', 404),
+                                       ('GET', '/elections/senate/rounds/9?seats=1', 404),
+                                       ('POST', '/elections', 405)]:
+            with self.assertRaises(service.HTTPError) as context:
+                self.respond(target, method=method)
+            self.assertEqual(context.exception.status, status)
+
+    def test_connection(self):
+        """Tests answering requests over a connection, including requests that
+            are malformed or fail unexpectedly."""
+        # Setup
+        def fail(name, configuration):
+            raise RuntimeError('count failed')
+
+        # Test
+        status, body = self.exchange('GET /elections/senate?{} HTTP/1.1\r\nHost: localhost\r\n\r\n'
+                                     .format(self.query).encode('latin-1'))
+        self.assertEqual((status, body['candidates_elected']), (200, ['gwashington']))
+        self.assertEqual(self.exchange(b'GET\r\n\r\n'), (400, {'error': 'Malformed request line'}))
+        self.service._compute_results = fail
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            status, body = self.exchange(b'GET /elections/senate?seats=2 HTTP/1.1\r\n\r\n')
+        self.assertEqual((status, body), (500, {'error': 'Internal Server Error'}))
+        self.assertIn('count failed', stderr.getvalue())
+        self.assertEqual(len(self.service._results), 1)
+
+
+class TestResultsCache(unittest.TestCase):
+
+    def setUp(self):
+        """Creates a cache in a temporary directory and results to store.
+
+        Ballots:
+            4 * [A, B]
+            3 * [B, A]
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = results_cache.ResultsCache(os.path.join(self.directory.name, 'cache'))
+        self.ballots = ballots_for_ids(['A', 'B'], 4) + ballots_for_ids(['B', 'A'], 3)
+        self.results = Election(self.ballots, 1, random_alphanumeric='abc').compute_results(summary_only=True)
+
+    def tearDown(self):
+        """Removes the temporary directory."""
+        self.directory.cleanup()
+
+    def test_key(self):
+        """Tests that keys ignore the order of the Ballots but not the
+            configuration."""
+        key = results_cache.ResultsCache.key(self.ballots, 1, random_alphanumeric='abc')
+        self.assertEqual(key, results_cache.ResultsCache.key(self.ballots[::-1], 1, random_alphanumeric='abc'))
+        self.assertNotEqual(key, results_cache.ResultsCache.key(self.ballots, 2, random_alphanumeric='abc'))
+        self.assertNotEqual(key, results_cache.ResultsCache.key(self.ballots, 1, random_alphanumeric='abc',
+                                                                can_random_tiebreak=False))
+
+    def test_get_and_put(self):
+        """Tests storing results, and that missing or corrupt entries are
+            misses."""
+        # Setup
+        key = results_cache.ResultsCache.key(self.ballots, 1, random_alphanumeric='abc')
+
+        # Test
+        self.assertIsNone(self.cache.get(key))
+        self.cache.put(key, self.results)
+        self.assertEqual(self.cache.get(key).as_dict(), self.results.as_dict())
+        with open(self.cache._path(key), 'wb') as f:
+            f.write(b'corrupt')
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(os.listdir(self.cache.directory), [key + results_cache.CACHE_EXTENSION])
+
+    def test_evict(self):
+        """Tests that the least recently used entries are evicted beyond the
+            maximum size."""
+        # Setup
+        for index in range(3):
+            self.cache.put(str(index), self.results)
+            os.utime(self.cache._path(str(index)), (index, index))
+        self.cache.get('0')
+        entry_size = os.path.getsize(self.cache._path('0'))
+
+        # Test
+        self.cache.max_size = 2 * entry_size
+        self.cache.evict()
+        self.assertEqual(sorted(os.listdir(self.cache.directory)),
+                         ['0' + results_cache.CACHE_EXTENSION, '2' + results_cache.CACHE_EXTENSION])
+
+
+class TestCommandLine(unittest.TestCase):
+
+    def setUp(self):
+        """Writes a ballot file to a temporary directory.
+
+        Ballots:
+            3 * [A, B]
+            2 * [B, A]
+            1 * [C, A]
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.directory.name, 'ballots.csv')
+        with open(self.filename, 'w') as f:
+            f.write('A,B\nA,B\nA,B\nB,A\nB,A\nC,A\n')
+
+    def tearDown(self):
+        """Removes the temporary directory."""
+        self.directory.cleanup()
+
+    def run_arguments(self, argv):
+        """Returns what run.py prints to stdout and stderr for a list of
+            arguments."""
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            run.process_args(run.parse_args(argv))
+        return stdout.getvalue(), stderr.getvalue()
+
+    def run_command(self, *argv):
+        """Returns what run.py prints to stdout and stderr for arguments, given
+            the ballot file and one seat."""
+        return self.run_arguments(['-s', '1', '-a', 'ABC', '-d', ',', '-b', self.filename] + list(argv))
+
+    def test_timings(self):
+        """Tests that timings are printed to stderr, leaving JSON output
+            intact."""
+        stdout, stderr = self.run_command('--format', 'json', '--timings')
+        self.assertEqual(json.loads(stdout)['candidates_elected'], ['A'])
+        self.assertIn('Timings for election', stderr)
+
+    def test_pairwise(self):
+        """Tests that the pairwise comparison is printed with text results,
+            and to stderr with JSON results."""
+        stdout, _ = self.run_command('--pairwise')
+        self.assertEqual(stdout.splitlines()[:2], ['A (A)', 'Condorcet winner: A (A)'])
+        stdout, stderr = self.run_command('--format', 'ndjson', '--pairwise')
+        self.assertEqual(json.loads(stdout.splitlines()[-1])['candidates_elected'], ['A'])
+        self.assertTrue(stderr.startswith('Condorcet winner: A (A)'))
+
+    def test_sweep(self):
+        """Tests that the seat sweep is printed to stderr with JSON results, and
+            breaks ties with the alphanumeric generated for the results."""
+        # Setup
+        filename = os.path.join(self.directory.name, 'tie.csv')
+        with open(filename, 'w') as f:
+            f.write('A\nB\n')
+        alphanumerics = [list(string.printable), list(reversed(string.printable))]
+
+        # Test
+        with unittest.mock.patch('election.random.sample', side_effect=alphanumerics):
+            stdout, stderr = self.run_arguments(['-s', '1', '-d', ',', '-b', filename, '--format', 'json', '--sweep', '1'])
+        candidate_elected = json.loads(stdout)['candidates_elected'][0]
+        self.assertIn([candidate_elected, '({})'.format(candidate_elected), 'X'], [line.split() for line in stderr.splitlines()])
+
+    def test_withdrawals(self):
+        """Tests that the withdrawal report is printed with text results, and
+            to stderr with JSON results."""
+        text_stdout, _ = self.run_command('--withdrawals')
+        stdout, stderr = self.run_command('--format', 'json', '--withdrawals')
+        self.assertEqual(json.loads(stdout)['candidates_elected'], ['A'])
+        self.assertTrue(stderr)
+        self.assertEqual(text_stdout, 'A (A)\n' + stderr)
+
+    def test_margin(self):
+        """Tests that the margin estimate is printed with text results, and to
+            stderr with NDJSON results."""
+        text_stdout, _ = self.run_command('--margin')
+        stdout, stderr = self.run_command('--format', 'ndjson', '--margin')
+        self.assertEqual(json.loads(stdout.splitlines()[-1])['candidates_elected'], ['A'])
+        self.assertTrue(stderr)
+        self.assertEqual(text_stdout, 'A (A)\n' + stderr)
+
+    def test_ballots_sidecar(self):
+        """Tests that the command line caches parsed ballots in a sidecar file
+            unless asked not to."""
+        self.run_command('--no-ballot-cache')
+        self.assertFalse(os.path.exists(self.filename + run.SIDECAR_SUFFIX))
+        self.run_command()
+        self.assertTrue(os.path.exists(self.filename + run.SIDECAR_SUFFIX))
+
+    def test_manual_input(self):
+        """Tests entering ballots at the prompt, with undo and help."""
+        # Setup
+        inputs = ['A, B', 'C', 'undo', 'help', 'B, A', 'A', '']
+
+        # Test
+        with unittest.mock.patch('builtins.input', side_effect=inputs):
+            stdout, _ = self.run_arguments(['-s', '1', '-a', 'ABC'])
+        self.assertEqual(stdout.count('Instructions:'), 2)
+        self.assertTrue(stdout.endswith('A (A)\n'))
+
+    def test_output_files(self):
+        """Tests validating ballots and writing the verbose results, transfers,
+            and ballots."""
+        # Setup
+        transfers_filename = os.path.join(self.directory.name, 'transfers.csv')
+        ballots_filename = os.path.join(self.directory.name, 'ballots.blt')
+
+        # Test
+        stdout, stderr = self.run_command('-v', '--candidates', 'A,B', '--validate', 'unknown=reject',
+                                          '--transfers', transfers_filename, '--write-ballots', ballots_filename)
+        self.assertIn('A (A)', stdout)
+        self.assertIn('Validated 6 ballots', stderr)
+        self.assertIn('Repaired: 0, rejected: 1', stderr)
+        with open(transfers_filename) as f:
+            self.assertTrue(f.readline().startswith('round,'))
+        self.assertEqual(len(run.ballots_from_file(ballots_filename)), 2)
+
+    def test_races(self):
+        """Tests counting several races of one ballot file."""
+        # Setup
+        with open(self.filename, 'w') as f:
+            f.write('P1,P2,S1,S2\nA,B,C,D\nA,,D,C\nB,A,D,\n')
+
+        # Test
+        stdout, _ = self.run_command('--header', '--race', 'President=1-2', '--race', 'Senate:1=3-4', '-a', 'ABCD')
+        self.assertEqual(stdout, 'President:\nA (A)\nSenate:\nD (D)\n')
+        stdout, _ = self.run_command('--header', '--race', 'President=1-2', '-a', 'ABCD', '-f', 'json')
+        self.assertEqual(json.loads(stdout)['President']['candidates_elected'], ['A'])
+        with self.assertRaises(ValueError):
+            self.run_arguments(['-s', '1', '--race', 'President=1-2'])
+
+    def test_results_cache(self):
+        """Tests that results cached by one run are reused by the next, without
+            counting again."""
+        # Setup
+        cache_directory = os.path.join(self.directory.name, 'cache')
+        stdout, _ = self.run_command('--format', 'ndjson', '--cache', cache_directory)
+
+        # Test
+        with unittest.mock.patch.object(Election, 'iter_rounds', side_effect=AssertionError('counted again')):
+            cached_stdout, _ = self.run_command('--format', 'ndjson', '--cache', cache_directory)
+            self.assertEqual(cached_stdout, stdout)
+            self.assertEqual(self.run_command('--cache', cache_directory)[0], 'A (A)\n')
+        self.assertEqual(len(os.listdir(cache_directory)), 1)
+
+    def test_profiles(self):
+        """Tests that time and memory profiles are written for ingestion and
+            counting."""
+        # Setup
+        prefix = os.path.join(self.directory.name, 'profile')
+
+        # Test
+        stdout, _ = self.run_command('--profile', prefix, '--memory-profile', prefix)
+        self.assertEqual(stdout, 'A (A)\n')
+        for stage, function_name in [('ingest', 'ballots_from_file'), ('count', '_iter_rounds')]:
+            stats = pstats.Stats('{}.{}.prof'.format(prefix, stage))
+            self.assertIn(function_name, [function for _, _, function in stats.stats])
+            with open('{}.{}.txt'.format(prefix, stage)) as f:
+                self.assertTrue(f.readline().startswith('Current: '))
+
+
 if __name__ == '__main__':
     unittest.main()
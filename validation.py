@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+"""Validates ballots against the ranking rules of the bylaws."""
+
+from election import Ballot, NoConfidence
+
+__author__ = "Devin Gund"
+__copyright__ = "Copyright 2017, Carnegie Mellon University Undergraduate Student Senate"
+__credits__ = ["Sushain Cherivirala"]
+__license__ = "GPLv3"
+__status__ = "Production"
+
+# Issue of a Candidate ranked more than once (bylaws 2.1)
+DUPLICATE_CANDIDATE = 'duplicate'
+
+# Issue of a Candidate ranked after No Confidence (bylaws 2.3)
+RANKED_AFTER_NO_CONFIDENCE = 'after-nc'
+
+# Issue of a Candidate not standing in the election
+UNKNOWN_CANDIDATE = 'unknown'
+
+# Issue of a Ballot ranking no Candidates
+EMPTY_BALLOT = 'empty'
+
+# Issues in the order they are checked and reported
+ISSUES = [DUPLICATE_CANDIDATE, RANKED_AFTER_NO_CONFIDENCE, UNKNOWN_CANDIDATE, EMPTY_BALLOT]
+
+# Policy of counting a Ballot with the issue unchanged
+REPORT = 'report'
+
+# Policy of removing the offending rankings from a Ballot with the issue, or
+# removing an empty Ballot
+REPAIR = 'repair'
+
+# Policy of removing a Ballot with the issue
+REJECT = 'reject'
+
+# Policies for handling an issue
+POLICIES = [REPORT, REPAIR, REJECT]
+
+
+class ValidationReport:
+    """Summary of the issues found while validating Ballots.
+
+    Attributes:
+        ballot_count: Integer number of Ballots validated.
+        issue_counts: Dict mapping each issue to the integer number of Ballots
+            with the issue.
+        repaired_count: Integer number of Ballots repaired.
+        rejected_count: Integer number of Ballots rejected.
+        policy_for_issue: Dict mapping each issue to its policy.
+    """
+
+    def __init__(self, policy_for_issue):
+        """Initializes ValidationReport without any Ballots validated.
+
+        Args:
+            policy_for_issue: Dict mapping each issue to its policy.
+        """
+        self.ballot_count = 0
+        self.issue_counts = {issue: 0 for issue in ISSUES}
+        self.repaired_count = 0
+        self.rejected_count = 0
+        self.policy_for_issue = policy_for_issue
+
+    def __repr__(self):
+        """Returns a printable system representation of the ValidationReport.
+
+        Returns:
+            String containing the printable representation of the
+                ValidationReport.
+        """
+        return ('ValidationReport(ballot_count={!r}, issue_counts={!r}, repaired_count={!r}, '
+                'rejected_count={!r})'.format(self.ballot_count, self.issue_counts,
+                                              self.repaired_count, self.rejected_count))
+
+    def description(self):
+        """Returns a printable long-form user representation of the
+            ValidationReport.
+
+        Returns:
+            String containing the printable representation of the
+                ValidationReport.
+        """
+        description = 'Validated {} ballots:'.format(self.ballot_count)
+        for issue in ISSUES:
+            description += '\n\t{}: {} ({})'.format(issue, self.issue_counts[issue], self.policy_for_issue[issue])
+        description += '\nRepaired: {}, rejected: {}'.format(self.repaired_count, self.rejected_count)
+        return description
+
+
+def policy_for_issue_from_specs(specs):
+    """Returns the policy for each issue from policy specifications.
+
+    Args:
+        specs: List of Strings, each either a policy applied to every issue or
+            'issue=policy' for a single issue. Later specifications override
+            earlier ones.
+
+    Returns:
+        Dict mapping each issue to its policy.
+
+    Raises:
+        ValueError: A specification names an unknown issue or policy.
+    """
+    policy_for_issue = {issue: REPORT for issue in ISSUES}
+    for spec in specs:
+        issue, _, policy = spec.rpartition('=')
+        if policy not in POLICIES:
+            raise ValueError('Invalid validation policy {}. Accepts {}.'.format(policy, ', '.join(POLICIES)))
+        if not issue:
+            policy_for_issue = {issue: policy for issue in ISSUES}
+        elif issue in ISSUES:
+            policy_for_issue[issue] = policy
+        else:
+            raise ValueError('Invalid ballot issue {}. Accepts {}.'.format(issue, ', '.join(ISSUES)))
+    return policy_for_issue
+
+
+def validate_ranking(candidates, known_candidates=None, policy_for_issue=None):
+    """Finds the issues of a ranking of Candidates and applies their policies.
+
+    Args:
+        candidates: Tuple of Candidates ordered by preferred rank.
+        known_candidates: Set of Candidates standing in the election, or None
+            to allow any Candidate. No Confidence is always allowed.
+        policy_for_issue: Dict mapping each issue to its policy. Defaults to
+            reporting every issue.
+
+    Returns:
+        Tuple of the set of issues found, and the tuple of Candidates to rank
+            instead (the given tuple if unchanged), or None if the ranking is
+            rejected.
+    """
+    if policy_for_issue is None:
+        policy_for_issue = {issue: REPORT for issue in ISSUES}
+
+    issues = set()
+    repaired_candidates = list()
+    ranked_candidates = set()
+    no_confidence_ranked = False
+    for candidate in candidates:
+        if candidate in ranked_candidates:
+            issue = DUPLICATE_CANDIDATE
+        elif no_confidence_ranked:
+            issue = RANKED_AFTER_NO_CONFIDENCE
+        elif (known_candidates is not None and candidate not in known_candidates and
+              not isinstance(candidate, NoConfidence)):
+            issue = UNKNOWN_CANDIDATE
+        else:
+            issue = None
+
+        if issue is not None:
+            issues.add(issue)
+            if policy_for_issue[issue] == REJECT:
+                return issues, None
+            elif policy_for_issue[issue] == REPAIR:
+                continue
+        ranked_candidates.add(candidate)
+        no_confidence_ranked = no_confidence_ranked or isinstance(candidate, NoConfidence)
+        repaired_candidates.append(candidate)
+
+    if not repaired_candidates:
+        issues.add(EMPTY_BALLOT)
+        if policy_for_issue[EMPTY_BALLOT] != REPORT:
+            return issues, None
+    if len(repaired_candidates) == len(candidates):
+        return issues, candidates
+    return issues, tuple(repaired_candidates)
+
+
+def validate_ballots(ballots, known_candidates=None, policy_for_issue=None):
+    """Validates Ballots against the ranking rules of the bylaws.
+
+    Each distinct ranking is validated once, and its outcome is applied to
+    every Ballot with that ranking. Rankings are told apart by the identity of
+    their Candidates, which ballots_from_file shares between Ballots.
+
+    Args:
+        ballots: List of Ballots.
+        known_candidates: Set of Candidates standing in the election, or None
+            to allow any Candidate. No Confidence is always allowed.
+        policy_for_issue: Dict mapping each issue to its policy. Defaults to
+            reporting every issue.
+
+    Returns:
+        Tuple of the list of valid (and repaired) Ballots, and the
+            ValidationReport.
+    """
+    if policy_for_issue is None:
+        policy_for_issue = {issue: REPORT for issue in ISSUES}
+
+    report = ValidationReport(policy_for_issue)
+    outcome_for_ranking = dict()
+    valid_ballots = list()
+    for ballot in ballots:
+        ranking_key = tuple(map(id, ballot.candidates))
+        if ranking_key not in outcome_for_ranking:
+            outcome_for_ranking[ranking_key] = validate_ranking(tuple(ballot.candidates), known_candidates,
+                                                                policy_for_issue)
+        issues, repaired_ranking = outcome_for_ranking[ranking_key]
+
+        report.ballot_count += 1
+        for issue in issues:
+            report.issue_counts[issue] += 1
+        if repaired_ranking is None:
+            report.rejected_count += 1
+        elif len(repaired_ranking) == len(ballot.candidates):
+            valid_ballots.append(ballot)
+        else:
+            report.repaired_count += 1
+            valid_ballots.append(Ballot(candidates=list(repaired_ranking), vote_value=ballot.vote_value))
+    return valid_ballots, report